@@ -0,0 +1,334 @@
+"""
+Attack maps for both sides, carried in the search state and updated
+incrementally by apply_move.
+
+For every square and side the maps keep how many pieces of each type
+attack it, packed into one int (four bits per type, see TYPE_SHIFT), so
+"is it attacked", "how many times" and "by what" are all lookups. Every
+occupied square also remembers the set of squares its piece attacks (a
+64-bit mask, square = row * 8 + col, a8 = 0). A move only changes the
+attacks of the pieces standing on the squares it empties or fills and of
+the sliders whose rays reach one of those squares; just those are
+recomputed instead of the whole board.
+
+    maps = compute_attacks(board)
+    state = dict(state, attacks=maps)        # apply_move keeps it up to date
+    maps.in_check('white'), maps.count(sq, 'black'), maps.hanging(board, 'white')
+"""
+from move_application import PROMOTION, PROMOTION_PIECES
+
+PIECE_TYPES = 'PNBRQK'
+TYPE_SHIFT = {piece: 4 * i for i, piece in enumerate(PIECE_TYPES)}
+TYPE_SHIFT.update({piece.lower(): shift for piece, shift in TYPE_SHIFT.items()})
+STEP = {piece: 1 << shift for piece, shift in TYPE_SHIFT.items()}
+NIBBLE = 0xF
+PIECE_VALUES = {'P': 100, 'N': 320, 'B': 330, 'R': 500, 'Q': 900, 'K': 20000}
+SIDE_INDEX = {'white': 0, 'black': 1}
+
+
+def _on_board(r, c):
+    return 0 <= r < 8 and 0 <= c < 8
+
+def _leaper_masks(deltas):
+    masks = []
+    for sq in range(64):
+        r, c = divmod(sq, 8)
+        mask = 0
+        for dr, dc in deltas:
+            if _on_board(r + dr, c + dc):
+                mask |= 1 << ((r + dr) * 8 + c + dc)
+        masks.append(mask)
+    return masks
+
+def _ray_masks(dr, dc):
+    masks = []
+    for sq in range(64):
+        r, c = divmod(sq, 8)
+        mask = 0
+        r, c = r + dr, c + dc
+        while _on_board(r, c):
+            mask |= 1 << (r * 8 + c)
+            r, c = r + dr, c + dc
+        masks.append(mask)
+    return masks
+
+KNIGHT_ATTACKS = _leaper_masks([(-2, -1), (-2, 1), (-1, -2), (-1, 2), (1, -2), (1, 2), (2, -1), (2, 1)])
+KING_ATTACKS = _leaper_masks([(dr, dc) for dr in (-1, 0, 1) for dc in (-1, 0, 1) if dr or dc])
+WHITE_PAWN_ATTACKS = _leaper_masks([(-1, -1), (-1, 1)])
+BLACK_PAWN_ATTACKS = _leaper_masks([(1, -1), (1, 1)])
+LEAPER_ATTACKS = {'N': KNIGHT_ATTACKS, 'n': KNIGHT_ATTACKS, 'K': KING_ATTACKS, 'k': KING_ATTACKS,
+                  'P': WHITE_PAWN_ATTACKS, 'p': BLACK_PAWN_ATTACKS}
+
+# Rays as (masks per square, increasing?): along an increasing ray the
+# nearest blocker is the lowest set bit, along a decreasing one the highest
+DIAGONAL_RAYS = [(_ray_masks(dr, dc), dr > 0) for dr, dc in [(-1, -1), (-1, 1), (1, -1), (1, 1)]]
+ORTHOGONAL_RAYS = [(_ray_masks(dr, dc), dr > 0 or (dr == 0 and dc > 0))
+                   for dr, dc in [(-1, 0), (1, 0), (0, -1), (0, 1)]]
+SLIDER_RAYS = {'B': DIAGONAL_RAYS, 'R': ORTHOGONAL_RAYS, 'Q': DIAGONAL_RAYS + ORTHOGONAL_RAYS}
+SLIDER_RAYS.update({piece.lower(): rays for piece, rays in SLIDER_RAYS.items()})
+
+
+def slider_attacks(piece, sq, occupied):
+    """Mask of the squares a bishop, rook or queen on sq attacks, given the occupied mask."""
+    attacked = 0
+    for masks, increasing in SLIDER_RAYS[piece]:
+        ray = masks[sq]
+        blockers = ray & occupied
+        if blockers:
+            nearest = (blockers & -blockers).bit_length() - 1 if increasing else blockers.bit_length() - 1
+            ray ^= masks[nearest]
+        attacked |= ray
+    return attacked
+
+def occupancy(board):
+    """Mask of the occupied squares."""
+    occupied = 0
+    for sq in range(64):
+        if board[sq >> 3][sq & 7] != '.':
+            occupied |= 1 << sq
+    return occupied
+
+def _squares(mask):
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+def changed_squares(board, move):
+    """Squares whose contents a move changes (board is before the move)."""
+    (fr, fc), (tr, tc) = move[0], move[1]
+    piece = board[fr][fc]
+    squares = [fr * 8 + fc, tr * 8 + tc]
+    if piece in 'Pp' and fc != tc and board[tr][tc] == '.':
+        squares.append(fr * 8 + tc)  # the pawn taken en passant
+    elif piece in 'Kk' and abs(tc - fc) == 2:
+        squares += [fr * 8 + 7, fr * 8 + 5] if tc == 6 else [fr * 8, fr * 8 + 3]
+    return squares
+
+
+class AttackMaps:
+    """
+    Attack maps of one position. Treated as immutable: after_move returns
+    new maps, so copies of a state can share them.
+
+    words[side * 64 + sq]  attackers of sq by side, four bits per piece type
+    sources[sq]            mask of the squares the piece on sq attacks (0 if empty)
+    kings                  (white king square, black king square), None if absent
+    sliders                mask of the squares holding bishops, rooks and queens
+    occupied               mask of the occupied squares
+    """
+    __slots__ = ('words', 'sources', 'kings', 'sliders', 'occupied')
+
+    def __init__(self, words, sources, kings, sliders, occupied):
+        self.words = words
+        self.sources = sources
+        self.kings = kings
+        self.sliders = sliders
+        self.occupied = occupied
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def after_move(self, board, new_board, move):
+        """Maps for new_board, the position after move is made on board."""
+        words = self.words[:]
+        sources = self.sources[:]
+        changed = changed_squares(board, move)
+        mask = 0
+        for sq in changed:
+            mask |= 1 << sq
+        # Whatever stands on a changed square, plus the sliders whose rays reach one
+        touched = changed + [sq for sq in _squares(self.sliders & ~mask) if sources[sq] & mask]
+        sliders = self.sliders & ~mask
+        occupied = self.occupied & ~mask
+        for sq in changed:
+            if new_board[sq >> 3][sq & 7] != '.':
+                occupied |= 1 << sq
+        for sq in touched:
+            old = board[sq >> 3][sq & 7]
+            new = new_board[sq >> 3][sq & 7]
+            old_mask = sources[sq]
+            if new == '.':
+                new_mask = 0
+            elif new in 'BRQbrq':
+                new_mask = slider_attacks(new, sq, occupied)
+                sliders |= 1 << sq
+            else:
+                new_mask = LEAPER_ATTACKS[new][sq]
+            sources[sq] = new_mask
+            if old == new:
+                # Same piece: only the squares its rays gained or lost change
+                old_mask, new_mask = old_mask & ~new_mask, new_mask & ~old_mask
+            if old_mask and old != '.':
+                step = STEP[old]
+                base = 0 if old < 'a' else 64
+                while old_mask:
+                    low = old_mask & -old_mask
+                    words[base + low.bit_length() - 1] -= step
+                    old_mask ^= low
+            if new_mask:
+                step = STEP[new]
+                base = 0 if new < 'a' else 64
+                while new_mask:
+                    low = new_mask & -new_mask
+                    words[base + low.bit_length() - 1] += step
+                    new_mask ^= low
+        kings = self.kings
+        (fr, fc), (tr, tc) = move[0], move[1]
+        piece = board[fr][fc]
+        if piece == 'K':
+            kings = (tr * 8 + tc, kings[1])
+        elif piece == 'k':
+            kings = (kings[0], tr * 8 + tc)
+        if board[tr][tc] in 'Kk':
+            kings = (None, kings[1]) if board[tr][tc] == 'K' else (kings[0], None)
+        return AttackMaps(words, sources, kings, sliders, occupied)
+
+    def attackers(self, sq, side):
+        """Packed per-type attacker counts of sq by side (0 if not attacked)."""
+        return self.words[SIDE_INDEX[side] * 64 + sq]
+
+    def attacked(self, sq, side):
+        return self.words[SIDE_INDEX[side] * 64 + sq] != 0
+
+    def count(self, sq, side):
+        """How many of side's pieces attack sq."""
+        word = self.words[SIDE_INDEX[side] * 64 + sq]
+        total = 0
+        while word:
+            total += word & NIBBLE
+            word >>= 4
+        return total
+
+    def attacked_by(self, sq, side, piece_type):
+        """How many of side's pieces of piece_type ('P'..'K') attack sq."""
+        return self.words[SIDE_INDEX[side] * 64 + sq] >> TYPE_SHIFT[piece_type] & NIBBLE
+
+    def cheapest_attacker(self, sq, side):
+        """Type ('P'..'K') of the least valuable piece of side attacking sq, or None."""
+        word = self.words[SIDE_INDEX[side] * 64 + sq]
+        for piece_type in PIECE_TYPES:
+            if word >> TYPE_SHIFT[piece_type] & NIBBLE:
+                return piece_type
+        return None
+
+    def king_square(self, side):
+        """Square of side's king, None if it has been captured."""
+        return self.kings[SIDE_INDEX[side]]
+
+    def in_check(self, side):
+        king = self.kings[SIDE_INDEX[side]]
+        if king is None:
+            return True  # as is_in_check: a missing king counts as mated
+        enemy = 64 if side == 'white' else 0
+        return self.words[enemy + king] != 0
+
+    def king_zone_attacks(self, side):
+        """Enemy attacks on side's king square and the squares around it."""
+        king = self.kings[SIDE_INDEX[side]]
+        if king is None:
+            return 0
+        enemy = 'black' if side == 'white' else 'white'
+        return sum(self.count(sq, enemy) for sq in _squares(KING_ATTACKS[king] | 1 << king))
+
+    def gives_check(self, board, move):
+        """
+        Whether move (a tuple or move code, on board, the position these
+        maps describe) attacks the enemy king, without making it: the moved
+        piece from its new square, or a slider of the mover's whose ray the
+        move opens.
+        """
+        if move.__class__ is int:
+            frm, to = move >> 6 & 63, move & 63
+            fr, fc, tr, tc = frm >> 3, frm & 7, to >> 3, to & 7
+            promotion = PROMOTION_PIECES[move >> 12 & 3] if move & 0xC000 == PROMOTION else None
+        else:
+            (fr, fc), (tr, tc) = move[0], move[1]
+            promotion = move[2] if len(move) == 3 else None
+        piece = board[fr][fc]
+        white = piece < 'a'
+        king = self.kings[1 if white else 0]
+        if king is None:
+            return True  # as is_in_check: a missing king counts as mated
+        king_bit = 1 << king
+        vacated = 1 << (fr * 8 + fc)
+        occupied = (self.occupied & ~vacated) | 1 << (tr * 8 + tc)
+        moved = promotion or piece
+        if piece in 'Pp' and fc != tc and board[tr][tc] == '.':
+            vacated |= 1 << (fr * 8 + tc)  # the pawn taken en passant
+            occupied &= ~vacated
+        elif piece in 'Kk' and abs(tc - fc) == 2:
+            rook_from, rook_to = (fr * 8 + 7, fr * 8 + 5) if tc == 6 else (fr * 8, fr * 8 + 3)
+            vacated |= 1 << rook_from
+            occupied = (occupied & ~(1 << rook_from)) | 1 << rook_to
+            if slider_attacks('R', rook_to, occupied) & king_bit:
+                return True
+        if moved in 'BRQbrq':
+            if slider_attacks(moved, tr * 8 + tc, occupied) & king_bit:
+                return True
+        elif LEAPER_ATTACKS[moved][tr * 8 + tc] & king_bit:
+            return True
+        sources = self.sources
+        for sq in _squares(self.sliders & ~vacated):
+            if sources[sq] & vacated:
+                slider = board[sq >> 3][sq & 7]
+                if (slider < 'a') == white and slider_attacks(slider, sq, occupied) & king_bit:
+                    return True
+        if self.words[(0 if white else 64) + king]:
+            # The king is attacked already (the pseudo-legal search reaches
+            # such positions): does an attacker other than the mover still see it?
+            for sq in range(64):
+                if sources[sq] & king_bit and not vacated >> sq & 1:
+                    other = board[sq >> 3][sq & 7]
+                    if (other < 'a') == white and (
+                            other not in 'BRQbrq' or slider_attacks(other, sq, occupied) & king_bit):
+                        return True
+        return False
+
+    def hanging(self, board, side):
+        """
+        Squares of side's pieces (king excluded) that are attacked and either
+        undefended or attacked by a cheaper piece.
+        """
+        enemy = 'black' if side == 'white' else 'white'
+        own = str.isupper if side == 'white' else str.islower
+        result = []
+        for sq in range(64):
+            piece = board[sq >> 3][sq & 7]
+            if piece == '.' or piece in 'Kk' or not own(piece) or not self.attacked(sq, enemy):
+                continue
+            if (not self.attacked(sq, side) or
+                    PIECE_VALUES[self.cheapest_attacker(sq, enemy)] < PIECE_VALUES[piece.upper()]):
+                result.append(sq)
+        return result
+
+
+def compute_attacks(board):
+    """Attack maps of a position from scratch."""
+    words = [0] * 128
+    sources = [0] * 64
+    kings = [None, None]
+    sliders = 0
+    occupied = occupancy(board)
+    for sq in range(64):
+        piece = board[sq >> 3][sq & 7]
+        if piece == '.':
+            continue
+        if piece in 'Kk':
+            kings[piece == 'k'] = sq
+        elif piece in 'BRQbrq':
+            sliders |= 1 << sq
+        if piece in 'BRQbrq':
+            attacked = slider_attacks(piece, sq, occupied)
+        else:
+            attacked = LEAPER_ATTACKS[piece][sq]
+        sources[sq] = attacked
+        step = 1 << TYPE_SHIFT[piece]
+        base = 0 if piece.isupper() else 64
+        for t in _squares(attacked):
+            words[base + t] += step
+    return AttackMaps(words, sources, tuple(kings), sliders, occupied)
+
+def attach(board, state):
+    """Copy of state carrying fresh attack maps for board."""
+    return dict(state, attacks=compute_attacks(board))
@@ -0,0 +1,262 @@
+"""
+NumPy batch evaluation: advanced_evaluate for many positions at once.
+
+Positions are encoded as an (N, 64) int8 array of piece codes (square
+index r*8+c, row 0 = rank 8; 1..6 = white P N B R Q K, -1..-6 = black)
+plus per-position side to move, castling rights and en passant square.
+evaluate_batch then computes every advanced_evaluate term (material,
+piece-square tables, centre control, pawn structure, mobility and king
+safety) with vector operations and returns exactly the same scores,
+from the side to move's point of view.
+
+Mobility is the pseudo-legal move count of generate_all_moves, including
+its quirks (castling only checks rights and empty squares, en passant
+only the capturing pawn's square).
+
+Usage:
+    python batch_eval.py [--sizes 1000 10000 100000 1000000]
+"""
+import argparse
+import time
+
+import numpy as np
+
+import main
+from benchmark import BENCH_POSITIONS
+
+PIECE_CODES = {'.': 0, 'P': 1, 'N': 2, 'B': 3, 'R': 4, 'Q': 5, 'K': 6,
+               'p': -1, 'n': -2, 'b': -3, 'r': -4, 'q': -5, 'k': -6}
+PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING = 1, 2, 3, 4, 5, 6
+
+CHUNK_SIZE = 8192  # positions evaluated per vectorized pass (bounds memory)
+
+_CODE_LUT = np.zeros(256, dtype=np.int8)
+for _piece, _code in PIECE_CODES.items():
+    _CODE_LUT[ord(_piece)] = _code
+
+# Vertical mirror of the square index (used to view black to move as white)
+MIRROR = np.array([(7 - sq // 8) * 8 + sq % 8 for sq in range(64)])
+OFF_BOARD = 64  # padding column for ray stepping
+
+
+def _step_matrix(deltas):
+    m = np.zeros((64, 64), dtype=np.float32)
+    for sq in range(64):
+        r, c = divmod(sq, 8)
+        for dr, dc in deltas:
+            if 0 <= r + dr < 8 and 0 <= c + dc < 8:
+                m[sq, (r + dr) * 8 + c + dc] = 1
+    return m
+
+KNIGHT_STEPS = _step_matrix([(-2, -1), (-2, 1), (-1, -2), (-1, 2), (1, -2), (1, 2), (2, -1), (2, 1)])
+KING_STEPS = _step_matrix([(-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)])
+# 3x3 block around each square, the square itself included (as king_safety scans it)
+KING_ZONE = KING_STEPS + np.eye(64, dtype=np.float32)
+
+def _ray_steps(dr, dc):
+    """RAY[k-1][sq] = square k steps from sq in direction (dr, dc), or OFF_BOARD."""
+    steps = np.full((7, 64), OFF_BOARD)
+    for sq in range(64):
+        r, c = divmod(sq, 8)
+        for k in range(1, 8):
+            if 0 <= r + k * dr < 8 and 0 <= c + k * dc < 8:
+                steps[k - 1, sq] = (r + k * dr) * 8 + c + k * dc
+    return steps
+
+ORTHOGONAL_RAYS = [_ray_steps(dr, dc) for dr, dc in [(-1, 0), (1, 0), (0, -1), (0, 1)]]
+DIAGONAL_RAYS = [_ray_steps(dr, dc) for dr, dc in [(-1, -1), (-1, 1), (1, -1), (1, 1)]]
+
+CENTER = np.array([r * 8 + c for r, c in main.center_squares])
+
+
+def encode_positions(positions):
+    """
+    Encode an iterable of (board, state) pairs. Returns a dict of arrays:
+    squares (N, 64) int8, white_to_move (N,) bool, castling (N, 4) bool in
+    KQkq order and en_passant (N,) int8 square index or -1.
+    """
+    text, white, castling, ep = [], [], [], []
+    for board, state in positions:
+        text.append(''.join(''.join(row) for row in board))
+        white.append(state['side_to_move'] == 'white')
+        cr = state.get('castling_rights', {})
+        castling.append([cr.get(k, False) for k in 'KQkq'])
+        sq = state.get('en_passant')
+        ep.append(-1 if sq is None else sq[0] * 8 + sq[1])
+    raw = np.frombuffer(''.join(text).encode('ascii'), dtype=np.uint8)
+    return {
+        'squares': _CODE_LUT[raw].reshape(-1, 64),
+        'white_to_move': np.array(white, dtype=bool),
+        'castling': np.array(castling, dtype=bool).reshape(-1, 4),
+        'en_passant': np.array(ep, dtype=np.int8),
+    }
+
+def encode_fens(fens):
+    return encode_positions(main.fen_to_board(fen) for fen in fens)
+
+
+def _square_value_table():
+    """(13, 64) material + PST from white's view, indexed [code + 6, sq]."""
+    tables = {'P': main.pawn_table, 'N': main.knight_table, 'B': main.bishop_table,
+              'R': main.rook_table, 'Q': main.queen_table, 'K': main.king_table}
+    values = np.zeros((13, 64), dtype=np.float32)
+    for piece, code in PIECE_CODES.items():
+        if piece == '.':
+            continue
+        for sq in range(64):
+            r, c = divmod(sq, 8)
+            if piece.isupper():
+                pst = tables[piece][r][c]
+            else:
+                pst = -tables[piece.upper()][7 - r][c]
+            values[code + 6, sq] = main.piece_values[piece] + pst
+    return values
+
+def _pawn_structure(pawns):
+    """evaluate_pawn_structure for a square-major (64, N) pawn mask."""
+    per_file = pawns.reshape(8, 8, -1).sum(axis=0)
+    has = per_file > 0
+    neighbours = np.zeros_like(has)
+    neighbours[1:] |= has[:-1]
+    neighbours[:-1] |= has[1:]
+    doubled = np.maximum(per_file - 1, 0).sum(axis=0)
+    isolated = np.where(has & ~neighbours, per_file, 0).sum(axis=0)
+    return -30 * doubled - 20 * isolated
+
+def _mobility(rel, castling, ep_rel):
+    """
+    Pseudo-legal move count for the side to move. rel is the board seen
+    from the side to move, square-major (64, N): its pieces positive,
+    moving towards row 0.
+    """
+    n = rel.shape[1]
+    # One padding row (OFF_BOARD) that is neither empty nor capturable
+    padded = np.concatenate([rel, np.full((1, n), KING, dtype=rel.dtype)])
+    not_own = padded <= 0
+    empty = padded == 0
+    enemy = rel < 0
+    count = np.zeros(n, dtype=np.int64)
+
+    pawns = rel == PAWN
+    col = (np.arange(64) % 8)[:, None]
+    # Ordinary pawn moves from rows 2-7
+    body = pawns[16:]
+    count += (body & empty[8:56]).sum(axis=0)
+    count += (pawns[48:56] & empty[40:48] & empty[32:40]).sum(axis=0)
+    count += (body & enemy[7:55] & (col[16:] > 0)).sum(axis=0)
+    count += (body & enemy[9:57] & (col[16:] < 7)).sum(axis=0)
+    # Promotions from row 1, four moves each
+    eve = pawns[8:16]
+    promos = (eve & empty[0:8]).sum(axis=0)
+    promos += (eve[1:] & enemy[0:7]).sum(axis=0)
+    promos += (eve[:7] & enemy[1:8]).sum(axis=0)
+    count += 4 * promos
+
+    for piece, steps in ((KNIGHT, KNIGHT_STEPS), (KING, KING_STEPS)):
+        reach = steps.T @ (rel == piece).astype(np.float32)
+        count += (reach * not_own[:64]).sum(axis=0).astype(np.int64)
+
+    # Sliders: walk every ray one step at a time, square-major so that each
+    # step is a row gather
+    reached = np.zeros((64, n), dtype=np.uint8)
+    queens = rel == QUEEN
+    for sliders, rays in ((queens | (rel == ROOK), ORTHOGONAL_RAYS),
+                          (queens | (rel == BISHOP), DIAGONAL_RAYS)):
+        for steps in rays:
+            frontier = sliders
+            for targets in steps:
+                reached += frontier & not_own[targets]
+                frontier = frontier & empty[targets]
+    count += reached.sum(axis=0, dtype=np.int64)
+
+    # Castling: rights plus empty squares between king and rook
+    count += castling[:, 0] & empty[61] & empty[62]
+    count += castling[:, 1] & empty[57] & empty[58] & empty[59]
+    # En passant: pawns beside the target on row 3
+    ep_col = ep_rel % 8
+    on_row = ep_rel // 8 == 2
+    for dc in (-1, 1):
+        c = ep_col + dc
+        ok = on_row & (c >= 0) & (c < 8)
+        count += ok & pawns[24 + np.clip(c, 0, 7), np.arange(n)]
+    return count
+
+def _evaluate_chunk(enc, values):
+    # Square-major (64, N) layout: per-square steps become row operations
+    squares = np.ascontiguousarray(enc['squares'].T)
+    white = enc['white_to_move']
+    n = squares.shape[1]
+
+    material = np.zeros(n, dtype=np.float32)
+    for code in range(-KING, KING + 1):
+        if code:
+            material += values[code + 6] @ (squares == code).astype(np.float32)
+    score = np.where(white, 1, -1) * material.astype(np.int64)
+
+    # Everything else is side-relative: flip black-to-move boards so the
+    # side to move is positive and plays up the board
+    rel = np.where(white, squares, -squares[MIRROR])
+    score += main.center_bonus_value * np.sign(rel[CENTER]).sum(axis=0, dtype=np.int64)
+    score += _pawn_structure(rel == PAWN) - _pawn_structure(rel == -PAWN)
+
+    castling = np.where(white[:, None], enc['castling'][:, :2], enc['castling'][:, 2:])
+    ep = enc['en_passant'].astype(np.int64)
+    ep_rel = np.where((ep >= 0) & ~white, MIRROR[np.maximum(ep, 0)], ep)
+    score += 10 * _mobility(rel, castling, ep_rel)
+
+    kings = rel == KING
+    has_king = kings.any(axis=0)
+    # find_king scans in board order; for black that is the mirrored order
+    first = np.where(white, kings.argmax(axis=0), MIRROR[kings[MIRROR].argmax(axis=0)])
+    zone_enemies = KING_ZONE @ (rel < 0).astype(np.float32)
+    danger = zone_enemies[first, np.arange(n)].astype(np.int64)
+    score += np.where(has_king, -50 * danger, -100000)
+    return score
+
+def evaluate_batch(encoded):
+    """advanced_evaluate for every encoded position; returns an int64 array."""
+    values = _square_value_table()
+    n = len(encoded['squares'])
+    scores = np.empty(n, dtype=np.int64)
+    for start in range(0, n, CHUNK_SIZE):
+        chunk = {key: arr[start:start + CHUNK_SIZE] for key, arr in encoded.items()}
+        scores[start:start + CHUNK_SIZE] = _evaluate_chunk(chunk, values)
+    return scores
+
+
+def bench_batch_eval(sizes=(1000, 10000, 100000, 1000000), verbose=True):
+    """
+    Time evaluate_batch on the bench positions repeated to each size, next
+    to advanced_evaluate one position at a time. Returns {size: seconds}.
+    """
+    positions = [main.fen_to_board(fen) for fen in BENCH_POSITIONS]
+    start = time.perf_counter()
+    for board, state in positions:
+        main.advanced_evaluate(board, state)
+    scalar = (time.perf_counter() - start) / len(positions)
+    base = encode_positions(positions)
+    results = {}
+    if verbose:
+        print(f"advanced_evaluate: {1 / scalar:,.0f} positions/s")
+    for size in sizes:
+        reps = -(-size // len(positions))
+        encoded = {key: np.concatenate([arr] * reps)[:size] for key, arr in base.items()}
+        start = time.perf_counter()
+        evaluate_batch(encoded)
+        elapsed = time.perf_counter() - start
+        results[size] = elapsed
+        if verbose:
+            print(f"batch {size:>9,}: {elapsed:8.3f}s  {size / elapsed:>12,.0f} positions/s  "
+                  f"({scalar * size / elapsed:,.0f}x)")
+    return results
+
+
+def cli():
+    parser = argparse.ArgumentParser(description="Benchmark NumPy batch evaluation")
+    parser.add_argument('--sizes', type=int, nargs='*', default=[1000, 10000, 100000, 1000000])
+    args = parser.parse_args()
+    bench_batch_eval(args.sizes)
+
+
+if __name__ == '__main__':
+    cli()
@@ -0,0 +1,145 @@
+"""
+EPD test-suite runner (WAC, ECM, STS and the like).
+
+Every position is searched from a cleared search state with
+iterative_deepening_pvs under the same limits. A position is solved when the
+final move is one of its 'bm' (best move) operands and none of its 'am'
+(avoid move) operands. The time-to-solution is taken from the iteration at
+which the engine switched to a correct move for the last time: the depth,
+time and node count from which the answer appeared and stayed. This is what
+shows whether a speedup finds tactics sooner, not just how many are found.
+
+Positions with an STS-style 'c0' operand ("f4=10, Be5+=3") also score
+points for the move played.
+
+Usage:
+    python epd_suite.py wac.epd --movetime 5
+    python epd_suite.py wac.epd --depth 6 --json wac-results.json
+"""
+import argparse
+import json
+
+import main
+from main import (fen_to_board, iterative_deepening_pvs, reset_search_state, parse_epd,
+                  san_to_move, uci_to_move, move_to_san)
+
+
+def read_suite(path):
+    """[(fen, operations)] for the positions in an EPD file (blank lines and ';' comments skipped)."""
+    with open(path) as f:
+        return [parse_epd(line) for line in f if line.strip() and not line.startswith(';')]
+
+
+def parse_suite_move(board, state, text):
+    """A bm/am/c0 move in SAN (or, failing that, UCI) notation."""
+    try:
+        return san_to_move(board, state, text)
+    except ValueError:
+        return uci_to_move(board, state, text)
+
+
+def move_points(board, state, operations):
+    """move -> points from an STS-style c0 operand, e.g. 'f4=10, Be5+=3'."""
+    points = {}
+    for item in ' '.join(operations.get('c0', [])).split(','):
+        san, _, value = item.strip().partition('=')
+        if san and value:
+            points[parse_suite_move(board, state, san)] = int(value)
+    return points
+
+
+def solve_position(fen, operations, max_time=5.0, max_depth=None, max_nodes=None):
+    """Search one position and return its result dict (see the module docstring)."""
+    board, state = fen_to_board(fen)
+    best = [parse_suite_move(board, state, m) for m in operations.get('bm', [])]
+    avoid = [parse_suite_move(board, state, m) for m in operations.get('am', [])]
+    points = move_points(board, state, operations)
+
+    def correct(move):
+        return move is not None and (not best or move in best) and move not in avoid
+
+    solution = []  # [depth, time, nodes] of the iteration the correct move last appeared at
+    last = [0, 0.0]  # depth and time of the last completed iteration
+    def record(info):
+        if not correct(info['move']):
+            solution[:] = []
+        elif not solution:
+            solution[:] = [info['depth'], info['time'], info['nodes']]
+        last[:] = [info['depth'], info['time']]
+
+    reset_search_state()
+    move = iterative_deepening_pvs(board, state, max_time, max_depth, max_nodes, on_iteration=record)
+    solved = correct(move) and bool(solution)
+    return {
+        'id': (operations.get('id') or [fen])[0],
+        'fen': fen,
+        'bm': operations.get('bm', []), 'am': operations.get('am', []),
+        'move': move_to_san(board, state, move) if move is not None else None,
+        'solved': solved,
+        'solution_depth': solution[0] if solved else None,
+        'solution_time': solution[1] if solved else None,
+        'solution_nodes': solution[2] if solved else None,
+        'points': points.get(move, 0) if points else None,
+        'max_points': max(points.values()) if points else None,
+        'depth': last[0], 'time': last[1], 'nodes': main.search_stats['nodes'],
+    }
+
+
+def summarize(results):
+    """Solved count, mean time-to-solution (over solved positions) and totals."""
+    solved = [r for r in results if r['solved']]
+    scored = [r for r in results if r['points'] is not None]
+    return {
+        'positions': len(results),
+        'solved': len(solved),
+        'mean_solution_time': sum(r['solution_time'] for r in solved) / len(solved) if solved else None,
+        'mean_solution_depth': sum(r['solution_depth'] for r in solved) / len(solved) if solved else None,
+        'total_nodes': sum(r['nodes'] for r in results),
+        'total_time': sum(r['time'] for r in results),
+        'points': sum(r['points'] for r in scored) if scored else None,
+        'max_points': sum(r['max_points'] for r in scored) if scored else None,
+    }
+
+
+def run_suite(positions, max_time=5.0, max_depth=None, max_nodes=None, on_result=None):
+    """Solve every (fen, operations) position. Returns (results, summary)."""
+    results = []
+    for fen, operations in positions:
+        result = solve_position(fen, operations, max_time, max_depth, max_nodes)
+        results.append(result)
+        if on_result is not None:
+            on_result(result)
+    return results, summarize(results)
+
+
+def cli():
+    parser = argparse.ArgumentParser(description="Run an EPD test suite")
+    parser.add_argument('path', help="EPD file with bm/am (or c0) operations")
+    parser.add_argument('--movetime', type=float, default=5.0, help="seconds per position")
+    parser.add_argument('--depth', type=int, help="maximum depth per position")
+    parser.add_argument('--nodes', type=int, help="maximum nodes per position")
+    parser.add_argument('--json', help="write the results and summary to this file")
+    args = parser.parse_args()
+
+    def report(r):
+        status = (f"solved at depth {r['solution_depth']} in {r['solution_time']:.2f}s "
+                  f"({r['solution_nodes']} nodes)" if r['solved'] else "not solved")
+        expected = ' '.join(r['bm']) or 'not ' + ' '.join(r['am'])
+        print(f"{r['id']}: {r['move']} (expected {expected}) {status}", flush=True)
+
+    results, summary = run_suite(read_suite(args.path), args.movetime, args.depth, args.nodes,
+                                 on_result=report)
+    print(f"\nSolved {summary['solved']}/{summary['positions']}", end='')
+    if summary['solved']:
+        print(f", mean time-to-solution {summary['mean_solution_time']:.2f}s "
+              f"(depth {summary['mean_solution_depth']:.1f})", end='')
+    if summary['points'] is not None:
+        print(f", {summary['points']}/{summary['max_points']} points", end='')
+    print(f", {summary['total_nodes']} nodes in {summary['total_time']:.1f}s")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'summary': summary, 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    cli()
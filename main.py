@@ -1,7 +1,15 @@
-import chess
-from move_generation import generate_all_moves
-from move_application import apply_move
-from copy import deepcopy
+from move_generation import generate_move_codes, generate_legal_moves, find_king, is_in_check
+from move_generation import MOVE_NONE, PROMOTION, encode_move, decode_move
+from move_application import apply_move, position_key
+from polyglot import open_book, close_book, book_move
+from tablebase import load_tablebases, close_tablebases, probe_dtm, tablebase_move
+import attacks
+from array import array
+import json
+import os
+import re
+import sys
+import threading
 import time
 
 # Piece-square tables reward/penalize pieces by position (white's perspective)
@@ -86,18 +94,378 @@ piece_importance = {
     '.': 0
 }
 
+# Killer move (16-bit code, see move_generation.encode_move) per remaining depth
 killer_moves = {}
 
-history_heuristic = {}
+# History scores indexed by side * 4096 + from * 64 + to (the low 12 bits of a move code)
+HISTORY_SIZE = 2 * 64 * 64
+HISTORY_MAX = 1 << 24  # all scores are halved once one passes this
+history_heuristic = array('i', bytes(4 * HISTORY_SIZE))
 
-transposition_table = {}
+# Transposition table: TT_BUCKET_SIZE-way buckets of packed entries in two
+# preallocated arrays (TT_ENTRY_BYTES per entry; see set_hash_size). An entry
+# is one 64-bit word plus its score:
+#   bits 0-1 bound (flag + 1; 0 = empty slot)   bits 2-7 age (search generation)
+#   bits 8-15 depth   bits 16-31 move code   bits 32-63 key check (key >> 32)
+# and the bucket is chosen by the low key bits. Entries survive from move to
+# move; tt_generation counts searches so that entries left over from earlier
+# ones can be told apart and are replaced first.
+TT_BUCKET_SIZE = 4
+TT_ENTRY_BYTES = 16
+TT_AGE_MASK = 63
+tt_words = array('Q')
+tt_scores = array('d')
+tt_mask = 0  # bucket count - 1 (a power of two)
+tt_generation = 0
+
+# Transposition table entry flags
+TT_EXACT, TT_LOWER, TT_UPPER = 0, 1, 2
+
+# Snapshot files (save_transposition_table): a header, then the table's word
+# and score arrays.
+TT_FILE_HEADER = '<4sB3xI'  # struct format: magic, version, entry count
+TT_FILE_GEOMETRY = '<I'  # bucket count
+TT_FILE_MAGIC = b'PYTT'
+TT_FILE_VERSION = 2
+
+# Search statistics. 'nodes', 'qnodes' and 'seldepth' (the deepest ply
+# reached in the current iteration) are always counted; everything else is
+# only collected while STATS_ENABLED (see enable_search_stats).
+search_stats = {
+    'nodes': 0, 'qnodes': 0, 'seldepth': 0,
+    'tt_probes': 0, 'tt_hits': 0, 'tt_cutoffs': 0,
+    'beta_cutoffs': 0, 'first_move_cutoffs': 0,
+    'eval_calls': 0, 'movegen_time': 0.0, 'eval_time': 0.0,
+    'make_time': 0.0, 'ordering_time': 0.0,
+    'futility_prunes': 0, 'reverse_futility_cutoffs': 0, 'razor_cutoffs': 0
+}
+
+STATS_ENABLED = False
+STATS_LOG_PATH = None  # JSON-lines file that engine_move appends per-move stats to
 
 MAX_QUIESCENCE_DEPTH = 4  # Limit quiescence recursion depth to prevent infinite loops
 
-def board_hash(board, state):
-    """Create a hashable key for transposition table caching."""
-    board_str = ''.join(''.join(row) for row in board) + state['side_to_move']
-    return hash(board_str)
+# Polyglot book consulted by engine_move before searching (see set_opening_book)
+opening_book = None
+BOOK_MODE = 'weighted'
+
+# Endgame tables probed by the search and engine_move (see set_tablebase_path)
+tablebases = {}
+TB_WIN = 90000  # tablebase wins score TB_WIN - plies, below real mate scores
+
+# NNUE network used by evaluate when set_evaluator('nnue') is active
+nnue_network = None
+
+# Carry incrementally updated attack maps (attacks.py) through the search, so
+# check tests and the quiescence check filter are lookups
+use_attack_maps = True
+
+# Set from another thread (e.g. the UCI 'stop' command) to abort the running search.
+# Whoever sets it clears it again before starting the next search.
+search_stop = threading.Event()
+
+# Hard limits checked inside the search; set by iterative_deepening_pvs.
+search_limits = {'deadline': None, 'max_nodes': None}
+
+# Frontier pruning switches (for A/B testing) and their depth-indexed margins.
+# All of it applies only at null-window nodes that are not in check and whose
+# window is clear of mate and tablebase scores.
+pruning = {'futility': True, 'reverse_futility': True, 'razoring': True}
+FUTILITY_MARGINS = [0, 200, 300, 500]         # quiet moves skipped if eval + margin <= alpha
+REVERSE_FUTILITY_MARGINS = [0, 120, 240, 360]  # node cut if eval - margin >= beta
+RAZOR_MARGINS = [0, 300, 500]                  # drop into quiescence if eval + margin <= alpha
+MATE_BOUND = TB_WIN - 1000
+
+class SearchAborted(Exception):
+    """Raised inside the search when it is stopped or runs out of time/nodes."""
+
+def reset_search_stats():
+    for key in search_stats:
+        search_stats[key] = 0.0 if key.endswith('_time') else 0
+
+def reset_search_state():
+    """Clear killers, history, transposition table and node counts (new game)."""
+    global tt_generation
+    killer_moves.clear()
+    history_heuristic[:] = array('i', bytes(4 * HISTORY_SIZE))
+    tt_words[:] = array('Q', bytes(8 * len(tt_words)))
+    tt_scores[:] = array('d', bytes(8 * len(tt_scores)))
+    tt_generation = 0
+    reset_search_stats()
+
+def tt_probe(key):
+    """The entry stored for key as (depth, score, flag, move, age), or None."""
+    check = key >> 32
+    base = (key & tt_mask) * TT_BUCKET_SIZE
+    for slot in range(base, base + TT_BUCKET_SIZE):
+        word = tt_words[slot]
+        if word >> 32 == check and word & 3:
+            score = tt_scores[slot]
+            if score.is_integer():
+                score = int(score)
+            return ((word >> 8) & 255, score, (word & 3) - 1,
+                    (word >> 16) & 0xFFFF, (word >> 2) & TT_AGE_MASK)
+    return None
+
+def tt_store(key, depth, score, flag, move):
+    """
+    Store a search result. An entry written by the current search is only
+    replaced by one at least as deep (or exact). Otherwise the bucket's
+    empty slot, or its least valuable entry (shallow, from older searches)
+    is overwritten.
+    """
+    check = key >> 32
+    base = (key & tt_mask) * TT_BUCKET_SIZE
+    age = tt_generation & TT_AGE_MASK
+    victim, worst = base, None
+    for slot in range(base, base + TT_BUCKET_SIZE):
+        word = tt_words[slot]
+        if not word & 3:
+            if worst is None or worst > -1000:
+                victim, worst = slot, -1000
+            continue
+        if word >> 32 == check:
+            if (word >> 2) & TT_AGE_MASK == age and (word >> 8) & 255 > depth and flag != TT_EXACT:
+                return
+            if move == MOVE_NONE:
+                move = (word >> 16) & 0xFFFF
+            victim = slot
+            break
+        value = ((word >> 8) & 255) - 8 * ((age - (word >> 2)) & TT_AGE_MASK)
+        if worst is None or value < worst:
+            victim, worst = slot, value
+    tt_words[victim] = (check << 32 | move << 16 | min(max(depth, 0), 255) << 8
+                        | age << 2 | flag + 1)
+    tt_scores[victim] = score
+
+def tt_count():
+    """Number of occupied entries."""
+    return sum(1 for word in tt_words if word & 3)
+
+def tt_hashfull():
+    """Permille of the first 1000 entries written by the current search (UCI hashfull)."""
+    age = tt_generation & TT_AGE_MASK
+    sample = tt_words[:1000]
+    used = sum(1 for word in sample if word & 3 and (word >> 2) & TT_AGE_MASK == age)
+    return used * 1000 // len(sample)
+
+def save_transposition_table(path):
+    """Write the transposition table to a binary snapshot file through mmap."""
+    import mmap
+    import struct
+    header = struct.calcsize(TT_FILE_HEADER) + struct.calcsize(TT_FILE_GEOMETRY)
+    size = header + 16 * len(tt_words)
+    count = tt_count()
+    with open(path, 'w+b') as f:
+        f.truncate(size)
+        with mmap.mmap(f.fileno(), size) as mm:
+            struct.pack_into(TT_FILE_HEADER, mm, 0, TT_FILE_MAGIC, TT_FILE_VERSION, count)
+            struct.pack_into(TT_FILE_GEOMETRY, mm, struct.calcsize(TT_FILE_HEADER), tt_mask + 1)
+            mm[header:header + 8 * len(tt_words)] = tt_words.tobytes()
+            mm[header + 8 * len(tt_words):] = tt_scores.tobytes()
+    return count
+
+def load_transposition_table(path):
+    """
+    Merge a snapshot written by save_transposition_table into the table
+    through the usual replacement. The entries join the current generation,
+    so the next search treats them as its predecessor's. Returns the number
+    of entries read. A snapshot keeps only each entry's key check bits and
+    bucket index, so one saved from a table of another size is skipped
+    (returns 0): its entries' buckets there are unknown.
+    """
+    import mmap
+    import struct
+    with open(path, 'rb') as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            magic, version, count = struct.unpack_from(TT_FILE_HEADER, mm, 0)
+            if magic != TT_FILE_MAGIC or version != TT_FILE_VERSION:
+                raise ValueError(f"{path} is not a transposition table snapshot")
+            buckets, = struct.unpack_from(TT_FILE_GEOMETRY, mm, struct.calcsize(TT_FILE_HEADER))
+            if buckets != tt_mask + 1:
+                return 0
+            start = struct.calcsize(TT_FILE_HEADER) + struct.calcsize(TT_FILE_GEOMETRY)
+            slots = buckets * TT_BUCKET_SIZE
+            words, scores = array('Q'), array('d')
+            words.frombytes(mm[start:start + 8 * slots])
+            scores.frombytes(mm[start + 8 * slots:start + 16 * slots])
+    for slot, word in enumerate(words):
+        if word & 3:
+            key = (word >> 32) << 32 | slot // TT_BUCKET_SIZE
+            tt_store(key, (word >> 8) & 255, scores[slot], (word & 3) - 1, (word >> 16) & 0xFFFF)
+    return count
+
+def set_hash_size(mb):
+    """Reallocate the (emptied) transposition table in about mb megabytes."""
+    global tt_words, tt_scores, tt_mask
+    buckets = 1
+    while buckets * 2 * TT_BUCKET_SIZE * TT_ENTRY_BYTES <= mb * 1024 * 1024:
+        buckets *= 2
+    tt_words = array('Q', bytes(8 * buckets * TT_BUCKET_SIZE))
+    tt_scores = array('d', bytes(8 * buckets * TT_BUCKET_SIZE))
+    tt_mask = buckets - 1
+
+set_hash_size(16)
+
+def set_opening_book(path, mode='weighted'):
+    """Open a Polyglot book for engine_move to use; path=None disables it."""
+    global opening_book, BOOK_MODE
+    if opening_book is not None:
+        close_book(opening_book)
+    opening_book = open_book(path) if path else None
+    BOOK_MODE = mode
+
+def probe_book(board, state):
+    """Return a move from the opening book, or None when out of book."""
+    if opening_book is None:
+        return None
+    return book_move(opening_book, board, state, BOOK_MODE)
+
+def set_evaluator(name='classic', weights_path=None):
+    """
+    Select the static evaluation used by the search: 'classic'
+    (advanced_evaluate) or 'nnue' (weights from weights_path, default the
+    reference net). numpy is only needed for 'nnue'.
+    """
+    global evaluate, nnue_network
+    if name == 'nnue':
+        import nnue
+        nnue_network = nnue.load_network(weights_path or nnue.REFERENCE_NETWORK)
+        fn = nnue_network.evaluate
+    elif name == 'classic':
+        nnue_network = None
+        fn = advanced_evaluate
+    else:
+        raise ValueError(f"Unknown evaluator: {name}")
+    evaluate = _timed(fn, 'eval_time', 'eval_calls') if STATS_ENABLED else fn
+
+def load_eval_params(path):
+    """Load piece values and piece-square tables from a JSON file (see texel.py)."""
+    with open(path) as f:
+        params = json.load(f)
+    for kind, value in params.get('piece_values', {}).items():
+        piece_values[kind.upper()] = value
+        piece_values[kind.lower()] = -value
+    for name in ('pawn_table', 'knight_table', 'bishop_table', 'rook_table', 'queen_table', 'king_table'):
+        if name in params:
+            globals()[name][:] = [list(row) for row in params[name]]
+
+def set_tablebase_path(path):
+    """Load the generated endgame tables in path; path=None unloads them."""
+    close_tablebases(tablebases)
+    if path:
+        tablebases.update(load_tablebases(path))
+
+def tablebase_score(dtm):
+    """Turn a probe_dtm result (signed plies) into a search score."""
+    if dtm > 0:
+        return TB_WIN - dtm
+    if dtm < 0:
+        return -TB_WIN + int(-dtm)
+    return 0
+
+def limits_exceeded():
+    """True once the search deadline or node budget has been used up."""
+    deadline = search_limits['deadline']
+    if deadline is not None and time.time() >= deadline:
+        return True
+    max_nodes = search_limits['max_nodes']
+    return max_nodes is not None and search_stats['nodes'] >= max_nodes
+
+def _timed(fn, time_key, count_key=None):
+    """Wrap fn so its wall time (and optionally call count) lands in search_stats."""
+    def wrapper(*args, **kwargs):
+        if count_key:
+            search_stats[count_key] += 1
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            search_stats[time_key] += time.perf_counter() - start
+    wrapper.__wrapped__ = fn
+    return wrapper
+
+# Hot-path functions swapped for timed wrappers while stats are enabled, so
+# the disabled search runs the plain functions with no timing overhead.
+_TIMED_FUNCTIONS = [
+    ('generate_move_codes', 'movegen_time', None),
+    ('apply_move', 'make_time', None),
+    ('evaluate', 'eval_time', 'eval_calls'),
+    ('move_ordering', 'ordering_time', None),
+]
+
+def enable_search_stats(enabled=True, log_path=None):
+    """
+    Turn detailed search statistics on or off.
+    When enabled, engine_move appends one JSON record per move to log_path
+    (if given). Note that eval_time includes the move generation done by
+    mobility_score, which is also counted in movegen_time.
+    """
+    global STATS_ENABLED, STATS_LOG_PATH
+    g = globals()
+    if enabled and not STATS_ENABLED:
+        for name, time_key, count_key in _TIMED_FUNCTIONS:
+            g[name] = _timed(g[name], time_key, count_key)
+    elif not enabled and STATS_ENABLED:
+        for name, _, _ in _TIMED_FUNCTIONS:
+            g[name] = g[name].__wrapped__
+    STATS_ENABLED = enabled
+    STATS_LOG_PATH = log_path if enabled else None
+
+def search_stats_report():
+    """Return the raw counters plus derived rates as a JSON-serialisable dict."""
+    report = dict(search_stats)
+    nodes = search_stats['nodes']
+    cutoffs = search_stats['beta_cutoffs']
+    probes = search_stats['tt_probes']
+    report['qnode_share'] = search_stats['qnodes'] / nodes if nodes else 0.0
+    report['first_move_cutoff_rate'] = search_stats['first_move_cutoffs'] / cutoffs if cutoffs else 0.0
+    report['tt_hit_rate'] = search_stats['tt_hits'] / probes if probes else 0.0
+    return report
+
+def dump_search_stats(path, **extra):
+    """Append the current search_stats_report (plus extra fields) as one JSON line."""
+    record = dict(extra)
+    record.update(search_stats_report())
+    with open(path, 'a') as f:
+        f.write(json.dumps(record) + '\n')
+
+# Key for transposition table caching; apply_move records the same keys for repetitions
+board_hash = position_key
+
+def is_rule_draw(board, state, key):
+    """
+    Fifty-move rule, or the position (key) already occurred since the last
+    capture or pawn move. A checkmate on the hundredth ply still counts.
+    """
+    if state.get('halfmove_clock', 0) >= 100:
+        return not (is_in_check(board, state, state['side_to_move'])
+                    and not generate_legal_moves(board, state))
+    return key in state.get('history', ())
+
+def repetition_count(board, state):
+    """How many times the current position has occurred before (for claiming draws)."""
+    return state.get('history', ()).count(board_hash(board, state))
+
+def insufficient_material(board):
+    """Bare kings, or a single knight or bishop against a bare king."""
+    pieces = [p for row in board for p in row if p not in '.Kk']
+    return not pieces or (len(pieces) == 1 and pieces[0] in 'NBnb')
+
+def game_result(board, state):
+    """(result, reason) once the game is over, else None."""
+    side = state['side_to_move']
+    if not generate_legal_moves(board, state):
+        if is_in_check(board, state, side):
+            return ('0-1' if side == 'white' else '1-0'), 'checkmate'
+        return '1/2-1/2', 'stalemate'
+    if repetition_count(board, state) >= 2:
+        return '1/2-1/2', 'repetition'
+    if state.get('halfmove_clock', 0) >= 100:
+        return '1/2-1/2', 'fifty-move'
+    if insufficient_material(board):
+        return '1/2-1/2', 'insufficient-material'
+    return None
 
 def get_piece_square_value(piece, r, c):
     """Get positional value from piece-square tables, adjusted for color."""
@@ -115,94 +483,8 @@ def get_piece_square_value(piece, r, c):
     val = table_map.get(piece.upper(), [[0]*8]*8)[row][col]
     return val if is_white else -val
 
-def find_king(board, side):
-    """Locate the king position for a side."""
-    king_char = 'K' if side == 'white' else 'k'
-    for r in range(8):
-        for c in range(8):
-            if board[r][c] == king_char:
-                return r, c
-    return None
-
-def is_attacked(board, r, c, attacker_side):
-    """Check if square (r,c) is attacked by attacker_side pieces."""
-    directions = {
-        'N': [(-2, -1), (-2, 1), (-1, -2), (-1, 2),
-              (1, -2), (1, 2), (2, -1), (2, 1)],
-        'B': [(-1, -1), (-1, 1), (1, -1), (1, 1)],
-        'R': [(-1, 0), (1, 0), (0, -1), (0, 1)],
-        'Q': [(-1, -1), (-1, 1), (1, -1), (1, 1),
-              (-1, 0), (1, 0), (0, -1), (0, 1)],
-        'K': [(-1, -1), (-1, 0), (-1, 1),
-              (0, -1),           (0, 1),
-              (1, -1),  (1, 0),  (1, 1)]
-    }
-
-    enemy_pawns = ['p'] if attacker_side == 'black' else ['P']
-    enemy_knights = ['n'] if attacker_side == 'black' else ['N']
-    enemy_bishops = ['b'] if attacker_side == 'black' else ['B']
-    enemy_rooks = ['r'] if attacker_side == 'black' else ['R']
-    enemy_queens = ['q'] if attacker_side == 'black' else ['Q']
-    enemy_kings = ['k'] if attacker_side == 'black' else ['K']
-
-    def on_board(x, y):
-        return 0 <= x < 8 and 0 <= y < 8
-
-    # Pawn diagonal attacks
-    pawn_dir = 1 if attacker_side == 'white' else -1
-    for dc in [-1, 1]:
-        nr, nc = r + pawn_dir, c + dc
-        if on_board(nr, nc) and board[nr][nc] in enemy_pawns:
-            return True
-
-    # Knight attacks
-    for dr, dc in directions['N']:
-        nr, nc = r + dr, c + dc
-        if on_board(nr, nc) and board[nr][nc] in enemy_knights:
-            return True
-
-    # Bishop & queen diagonal attacks
-    for dr, dc in directions['B']:
-        nr, nc = r + dr, c + dc
-        while on_board(nr, nc):
-            sq = board[nr][nc]
-            if sq != '.':
-                if sq in enemy_bishops or sq in enemy_queens:
-                    return True
-                break
-            nr += dr
-            nc += dc
-
-    # Rook & queen orthogonal attacks
-    for dr, dc in directions['R']:
-        nr, nc = r + dr, c + dc
-        while on_board(nr, nc):
-            sq = board[nr][nc]
-            if sq != '.':
-                if sq in enemy_rooks or sq in enemy_queens:
-                    return True
-                break
-            nr += dr
-            nc += dc
-
-    # King attacks
-    for dr, dc in directions['K']:
-        nr, nc = r + dr, c + dc
-        if on_board(nr, nc) and board[nr][nc] in enemy_kings:
-            return True
-
-    return False
-
-def is_in_check(board, state, side):
-    king_pos = find_king(board, side)
-    if king_pos is None:
-        return True  # King missing means checkmate technically
-    r, c = king_pos
-    attacker_side = 'black' if side == 'white' else 'white'
-    return is_attacked(board, r, c, attacker_side)
-
 def mobility_score(board, state, side):
-    moves = generate_all_moves(board, state)
+    moves = generate_move_codes(board, state)
     count = sum(1 for m in moves if state['side_to_move'] == side)
     return count * 10
 
@@ -230,9 +512,10 @@ def evaluate_pawn_structure(board, side):
     return score
 
 def king_safety(board, side):
+    """Penalty for enemy pieces next to side's king, from side's point of view."""
     king_pos = find_king(board, side)
     if king_pos is None:
-        return -100000 if side == 'white' else 100000
+        return -100000
     kr, kc = king_pos
     danger_squares = [(kr + dr, kc + dc) for dr in range(-1, 2) for dc in range(-1, 2)
                       if 0 <= kr + dr < 8 and 0 <= kc + dc < 8]
@@ -242,9 +525,10 @@ def king_safety(board, side):
         sq = board[r][c]
         if sq != '.' and ((opponent_side == 'white' and sq.isupper()) or (opponent_side == 'black' and sq.islower())):
             danger_count += 1
-    return -50 * danger_count if side == 'white' else 50 * danger_count
+    return -50 * danger_count
 
 def advanced_evaluate(board, state):
+    """Static evaluation from the side to move's point of view (negamax convention)."""
     score = 0
     side = state['side_to_move']
     for r in range(8):
@@ -252,6 +536,8 @@ def advanced_evaluate(board, state):
             piece = board[r][c]
             score += piece_values.get(piece, 0)
             score += get_piece_square_value(piece, r, c)
+    if side == 'black':
+        score = -score  # material and PST are summed from white's point of view
     for r, c in center_squares:
         sq = board[r][c]
         if side == 'white':
@@ -273,26 +559,49 @@ def advanced_evaluate(board, state):
     score += king_safety(board, side)
     return score
 
+# Static evaluation called by the search (see set_evaluator)
+evaluate = advanced_evaluate
+
 def is_capture_move(board, move):
-    from_sq, to_sq = move[0], move[1]
-    return board[to_sq[0]][to_sq[1]] != '.'
+    """Whether a move code lands on a piece (en passant does not count)."""
+    to = move & 63
+    return board[to >> 3][to & 7] != '.'
 
-def quiescence_search(board, state, alpha, beta, side_to_move, depth=0):
+def quiescence_search(board, state, alpha, beta, side_to_move, depth=0, ply=0):
+    search_stats['nodes'] += 1
+    search_stats['qnodes'] += 1
+    if ply > search_stats['seldepth']:
+        search_stats['seldepth'] = ply
+    if search_stop.is_set() or (search_stats['nodes'] & 63 == 0 and limits_exceeded()):
+        raise SearchAborted()
+    # The pseudo-legal search can capture a king; the side without one has lost
+    attack_maps = state.get('attacks')
+    if attack_maps is not None:
+        king = attack_maps.king_square(side_to_move)
+    else:
+        king = find_king(board, side_to_move)
+    if king is None:
+        return -100000
     if depth >= MAX_QUIESCENCE_DEPTH:
-        return advanced_evaluate(board, state)
+        return evaluate(board, state)
 
-    stand_pat = advanced_evaluate(board, state)
+    stand_pat = evaluate(board, state)
     if stand_pat >= beta:
         return beta
     if alpha < stand_pat:
         alpha = stand_pat
 
     candidate_moves = []
-    all_moves = generate_all_moves(board, state)
+    all_moves = generate_move_codes(board, state)
+    if attack_maps is not None and None in attack_maps.kings:
+        attack_maps = None  # a king was captured: keep the plain test for these odd nodes
 
     for m in all_moves:
         if is_capture_move(board, m):
             candidate_moves.append(m)
+        elif attack_maps is not None:
+            if attack_maps.gives_check(board, m):
+                candidate_moves.append(m)
         else:
             nb, ns = apply_move(board, m, state)
             if is_in_check(nb, ns, 'black' if side_to_move == 'white' else 'white'):
@@ -302,91 +611,437 @@ def quiescence_search(board, state, alpha, beta, side_to_move, depth=0):
         nb, ns = apply_move(board, move, state)
         score = -quiescence_search(nb, ns, -beta, -alpha,
                                    'black' if side_to_move == 'white' else 'white',
-                                   depth + 1)
+                                   depth + 1, ply + 1)
         if score >= beta:
             return beta
         if score > alpha:
             alpha = score
     return alpha
 
-def mvv_lva_value(board, move):
-    from_sq, to_sq = move[0], move[1]
-    attacker = board[from_sq[0]][from_sq[1]]
-    victim = board[to_sq[0]][to_sq[1]]
-    victim_val = piece_importance.get(victim, 0)
-    attacker_val = piece_importance.get(attacker, 0)
-    return victim_val * 10 - attacker_val
-
 def move_ordering(board, moves, depth):
+    """Sort move codes: MVV-LVA captures, then the killer at depth, then by history."""
+    killer = killer_moves.get(depth, MOVE_NONE)
     def score_move(move):
-        score = 0
-        if is_capture_move(board, move):
-            score += 10000 + mvv_lva_value(board, move)
-        if killer_moves.get(depth) == move:
+        frm, to = move >> 6 & 63, move & 63
+        piece = board[frm >> 3][frm & 7]
+        victim = board[to >> 3][to & 7]
+        from_to = move & 0xFFF
+        score = history_heuristic[from_to if piece.isupper() else 4096 + from_to]
+        if victim != '.':  # MVV-LVA
+            score += 10000 + piece_importance[victim] * 10 - piece_importance[piece]
+        # A killer matches on its squares, except that promotions must match the piece too
+        if from_to == killer & 0xFFF and (move & 0xC000 != PROMOTION or move == killer):
             score += 8000
-        score += history_heuristic.get(move, 0)
         return score
     return sorted(moves, key=score_move, reverse=True)
 
-def alphabeta_pvs(board, state, depth, alpha, beta, maximizing,
-                  generate_moves_fn, apply_move_fn):
+def update_history(board, move, depth):
+    """Record a beta cutoff: move (a code) becomes the killer at depth and gains history."""
+    killer_moves[depth] = move
+    frm = move >> 6 & 63
+    index = (move & 0xFFF) + (0 if board[frm >> 3][frm & 7].isupper() else 4096)
+    history_heuristic[index] += depth * depth
+    if history_heuristic[index] > HISTORY_MAX:
+        for i in range(HISTORY_SIZE):
+            history_heuristic[i] >>= 1
 
+def alphabeta_pvs(board, state, depth, alpha, beta, maximizing,
+                  generate_moves_fn, apply_move_fn, root_moves=None, ply=0):
+    """
+    Negamax alpha-beta with principal variation search over move codes
+    (generate_moves_fn is generate_move_codes). Returns (score, best move
+    code or None). root_moves (codes), when given, marks this call as the
+    root: those moves are searched instead of generating them and the TT
+    is not allowed to cut. ply is the distance from the root.
+    """
     if depth == 0:
-        return quiescence_search(board, state, alpha, beta, state['side_to_move'], depth=0), None
+        return quiescence_search(board, state, alpha, beta, state['side_to_move'], 0, ply), None
+
+    search_stats['nodes'] += 1
+    if ply > search_stats['seldepth']:
+        search_stats['seldepth'] = ply
+    if search_stop.is_set() or (search_stats['nodes'] & 63 == 0 and limits_exceeded()):
+        raise SearchAborted()
+    key = board_hash(board, state)
+    if root_moves is None and is_rule_draw(board, state, key):
+        return 0, None
+    if tablebases and root_moves is None:
+        dtm = probe_dtm(tablebases, board, state)
+        if dtm is not None:
+            return tablebase_score(dtm), None
+    alpha_orig = alpha
+    entry = tt_probe(key)
+    tt_move = MOVE_NONE
+    if STATS_ENABLED:
+        search_stats['tt_probes'] += 1
+    if entry is not None:
+        tt_depth, tt_score, tt_flag, tt_move, _ = entry
+        if STATS_ENABLED:
+            search_stats['tt_hits'] += 1
+        if tt_depth >= depth and root_moves is None:
+            if tt_flag == TT_EXACT:
+                cutoff = True
+            elif tt_flag == TT_LOWER:
+                cutoff = tt_score >= beta
+            else:
+                cutoff = tt_score <= alpha
+            if cutoff:
+                if STATS_ENABLED:
+                    search_stats['tt_cutoffs'] += 1
+                return tt_score, tt_move or None
 
-    moves = generate_moves_fn(board, state)
+    futile = False
+    if (root_moves is None and depth < len(FUTILITY_MARGINS) and beta - alpha == 1
+            and -MATE_BOUND < alpha and beta < MATE_BOUND
+            and not is_in_check(board, state, state['side_to_move'])):
+        static_eval = evaluate(board, state)
+        if pruning['reverse_futility'] and static_eval - REVERSE_FUTILITY_MARGINS[depth] >= beta:
+            if STATS_ENABLED:
+                search_stats['reverse_futility_cutoffs'] += 1
+            return beta, None
+        if (pruning['razoring'] and depth < len(RAZOR_MARGINS)
+                and static_eval + RAZOR_MARGINS[depth] <= alpha):
+            score = quiescence_search(board, state, alpha, beta, state['side_to_move'], 0, ply)
+            if depth == 1 or score <= alpha:
+                if STATS_ENABLED:
+                    search_stats['razor_cutoffs'] += 1
+                return score, None
+        futile = pruning['futility'] and static_eval + FUTILITY_MARGINS[depth] <= alpha
+
+    moves = generate_moves_fn(board, state) if root_moves is None else root_moves
     moves = move_ordering(board, moves, depth)
 
     if not moves:
         if is_in_check(board, state, state['side_to_move']):
-            return (-100000 if maximizing else 100000), None
+            return -100000, None
         else:
             return 0, None
 
     best_move = None
     first_move = True
-    for move in moves:
+    # With attack maps a futile quiet move is tested for check before it is made
+    attack_maps = state.get('attacks') if futile else None
+    if attack_maps is not None and None in attack_maps.kings:
+        attack_maps = None
+    for index, move in enumerate(moves):
+        quiet = (futile and not first_move and move & 0xC000 != PROMOTION
+                 and not is_capture_move(board, move))
+        if quiet and attack_maps is not None and not attack_maps.gives_check(board, move):
+            if STATS_ENABLED:
+                search_stats['futility_prunes'] += 1
+            continue
         nb, ns = apply_move_fn(board, move, state)
+        if quiet and attack_maps is None and not is_in_check(nb, ns, ns['side_to_move']):
+            if STATS_ENABLED:
+                search_stats['futility_prunes'] += 1
+            continue
         if first_move:
             score, _ = alphabeta_pvs(nb, ns, depth-1, -beta, -alpha, not maximizing,
-                                     generate_moves_fn, apply_move_fn)
+                                     generate_moves_fn, apply_move_fn, ply=ply + 1)
             first_move = False
+            score = -score
         else:
+            # Null-window probe; re-search with the full window if it lands inside it
             score, _ = alphabeta_pvs(nb, ns, depth-1, -alpha-1, -alpha, not maximizing,
-                                     generate_moves_fn, apply_move_fn)
+                                     generate_moves_fn, apply_move_fn, ply=ply + 1)
+            score = -score
             if alpha < score < beta:
-                score, _ = alphabeta_pvs(nb, ns, depth-1, -beta, -score, not maximizing,
-                                         generate_moves_fn, apply_move_fn)
+                score, _ = alphabeta_pvs(nb, ns, depth-1, -beta, -alpha, not maximizing,
+                                         generate_moves_fn, apply_move_fn, ply=ply + 1)
+                score = -score
 
-        score = -score
         if score > alpha:
             alpha = score
             best_move = move
         if alpha >= beta:
-            killer_moves[depth] = move
-            history_heuristic[move] = history_heuristic.get(move, 0) + depth*depth
+            update_history(board, move, depth)
+            if STATS_ENABLED:
+                search_stats['beta_cutoffs'] += 1
+                if index == 0:
+                    search_stats['first_move_cutoffs'] += 1
             break
 
+    if alpha <= alpha_orig:
+        flag = TT_UPPER
+    elif alpha >= beta:
+        flag = TT_LOWER
+    else:
+        flag = TT_EXACT
+    tt_store(key, depth, alpha, flag, best_move or tt_move)
     return alpha, best_move
 
-def iterative_deepening_pvs(board, state, max_time=4.0):
+def search_root_lines(board, state, depth, root_moves, count):
+    """
+    Rank the best count root moves at depth in one pass, searching
+    root_moves in the order given. The first count moves get full windows;
+    every later move is a null-window probe against the count-th best
+    score so far and only re-searched for an exact score when it beats it.
+    Returns [(score, pv)] best first and leaves the root TT entry pointing
+    at the best line.
+    """
+    search_stats['nodes'] += 1
+    maximizing = state['side_to_move'] == 'white'
+    ranked = []  # (score, move), best first, exact scores
+    for move in root_moves:
+        nb, ns = apply_move(board, move, state)
+        if len(ranked) < count:
+            score = -alphabeta_pvs(nb, ns, depth - 1, float('-inf'), float('inf'), not maximizing,
+                                   generate_move_codes, apply_move, ply=1)[0]
+        else:
+            floor = ranked[-1][0]
+            score = -alphabeta_pvs(nb, ns, depth - 1, -floor - 1, -floor, not maximizing,
+                                   generate_move_codes, apply_move, ply=1)[0]
+            if score <= floor:
+                continue
+            score = -alphabeta_pvs(nb, ns, depth - 1, float('-inf'), -floor, not maximizing,
+                                   generate_move_codes, apply_move, ply=1)[0]
+            if score <= floor:
+                continue
+        index = next((i for i, (s, _) in enumerate(ranked) if score > s), len(ranked))
+        ranked.insert(index, (score, move))
+        del ranked[count:]
+    lines = []
+    for score, move in ranked:
+        nb, ns = apply_move(board, move, state)
+        lines.append((score, [decode_move(move)] + extract_pv(nb, ns, depth - 1)))
+    tt_store(board_hash(board, state), depth, ranked[0][0], TT_EXACT, ranked[0][1])
+    return lines
+
+def iterative_deepening_pvs(board, state, max_time=4.0, max_depth=None, max_nodes=None,
+                            on_iteration=None, multipv=1):
+    """
+    Search with increasing depth until max_time, max_depth or max_nodes is
+    reached, or search_stop is set. Once depth 1 has completed, the time
+    limit also aborts the current iteration. on_iteration, if given, is
+    called with an info dict after every completed depth. With multipv > 1
+    every depth ranks that many root moves (search_root_lines), the info
+    dict carries them as 'lines' and the next depth searches them first,
+    in rank order, ahead of the other root moves.
+    """
+    global tt_generation
     start_time = time.time()
     depth = 1
     best_move = None
-    while True:
-        if time.time() - start_time > max_time:
-            break
-        score, move = alphabeta_pvs(board, state, depth, float('-inf'), float('inf'),
-                                  maximizing=(state['side_to_move'] == 'white'),
-                                  generate_moves_fn=generate_all_moves,
-                                  apply_move_fn=apply_move)
-        if move is not None:
-            best_move = move
-        depth += 1
+    root_moves = [encode_move(board, move) for move in generate_legal_moves(board, state)]
+    if not root_moves:
+        return None
+    tt_generation += 1  # the table is kept; what earlier searches stored ages
+    if nnue_network is not None:
+        state = nnue_network.attach(board, state)
+    if use_attack_maps:
+        state = attacks.attach(board, state)
+    if multipv > 1:
+        root_moves = move_ordering(board, root_moves, depth)  # later depths put the last lines first
+    search_limits['deadline'] = None
+    search_limits['max_nodes'] = max_nodes
+    try:
+        while True:
+            if time.time() - start_time > max_time:
+                break
+            if max_depth is not None and depth > max_depth:
+                break
+            lines = None
+            search_stats['seldepth'] = 0
+            if multipv > 1:
+                lines = search_root_lines(board, state, depth, root_moves, multipv)
+                score, move = lines[0][0], lines[0][1][0]
+                ranked = [encode_move(board, pv[0]) for _, pv in lines]
+                root_moves = ranked + [m for m in root_moves if m not in ranked]
+            else:
+                score, code = alphabeta_pvs(board, state, depth, float('-inf'), float('inf'),
+                                          maximizing=(state['side_to_move'] == 'white'),
+                                          generate_moves_fn=generate_move_codes,
+                                          apply_move_fn=apply_move,
+                                          root_moves=root_moves)
+                move = decode_move(code) if code is not None else None
+            if move is not None:
+                best_move = move
+            if on_iteration is not None:
+                info = {'depth': depth, 'score': score, 'move': move,
+                        'nodes': search_stats['nodes'],
+                        'seldepth': search_stats['seldepth'],
+                        'time': time.time() - start_time, 'hashfull': tt_hashfull()}
+                if lines is not None:
+                    info['lines'] = lines
+                on_iteration(info)
+            if depth == 1:
+                search_limits['deadline'] = start_time + max_time
+            depth += 1
+    except SearchAborted:
+        pass
+    finally:
+        search_limits['deadline'] = None
+        search_limits['max_nodes'] = None
+    if best_move is None:
+        best_move = decode_move(move_ordering(board, root_moves, depth)[0])
     return best_move
 
+def multipv_search(board, state, multipv=3, max_time=4.0, max_depth=None, max_nodes=None):
+    """
+    The best multipv moves as [(score, pv), ...] from the last completed
+    depth (scores from the side to move's point of view).
+    """
+    result = []
+    def record(info):
+        result[:] = info.get('lines') or [(info['score'], extract_pv(board, state, info['depth']))]
+    iterative_deepening_pvs(board, state, max_time, max_depth, max_nodes,
+                            on_iteration=record, multipv=multipv)
+    return result
+
+def extract_pv(board, state, max_length=20):
+    """Follow best moves stored in the transposition table to build a PV."""
+    pv = []
+    seen = set()
+    while len(pv) < max_length:
+        key = board_hash(board, state)
+        entry = tt_probe(key)
+        if entry is None or entry[3] == MOVE_NONE or key in seen:
+            break
+        move = decode_move(entry[3])
+        if move not in generate_legal_moves(board, state):
+            break
+        seen.add(key)
+        pv.append(move)
+        board, state = apply_move(board, move, state)
+    return pv
+
 def engine_move(board, state, max_time=4.0):
-    return iterative_deepening_pvs(board, state, max_time)
+    move = probe_book(board, state)
+    if move is not None:
+        return move
+    if tablebases:
+        tb = tablebase_move(tablebases, board, state, generate_legal_moves, apply_move)
+        if tb is not None:
+            return tb[0]
+    reset_search_stats()
+    start = time.perf_counter()
+    best = iterative_deepening_pvs(board, state, max_time)
+    if STATS_LOG_PATH:
+        dump_search_stats(STATS_LOG_PATH, fen=board_to_fen(board, state),
+                          move=best, elapsed=time.perf_counter() - start)
+    return best
+
+def start_ponder(board, state, ponder_move=None):
+    """
+    Start searching on the opponent's time in a background thread.
+    board/state is the position with the opponent to move. With ponder_move
+    (the expected reply, usually the second PV move) the position after that
+    reply is searched; otherwise the current position itself is searched to
+    warm the transposition table.
+    """
+    if ponder_move is not None:
+        board, state = apply_move(board, ponder_move, state)
+    result = {'best': None}
+
+    def run():
+        result['best'] = iterative_deepening_pvs(board, state, max_time=float('inf'))
+
+    search_stop.clear()
+    reset_search_stats()
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return {'thread': thread, 'move': ponder_move, 'result': result}
+
+def finish_ponder(ponder, opponent_move, max_time=4.0):
+    """
+    Resolve a ponder search once the opponent has moved.
+    On a ponder hit the running search simply continues for max_time more
+    seconds and its best move is returned, so the thinking time already
+    spent carries over. On a miss the search is stopped, the tables it
+    warmed for the wrong position are cleared, and None is returned so the
+    caller searches normally.
+    """
+    thread = ponder['thread']
+    hit = ponder['move'] is not None and opponent_move == ponder['move']
+    if hit:
+        thread.join(timeout=max_time)
+    search_stop.set()
+    thread.join()
+    search_stop.clear()
+    if hit:
+        return ponder['result']['best']
+    if ponder['move'] is not None:
+        reset_search_state()
+    return None
+
+def _start_analysis(board, state, limits, emit):
+    """
+    Run iterative_deepening_pvs with limits on a thread. emit('info', record)
+    is called after every completed depth, then emit('done', best move) or
+    emit('error', exception).
+    """
+    def on_iteration(info):
+        record = dict(info, nps=int(info['nodes'] / info['time']) if info['time'] > 0 else 0)
+        if 'lines' in info:
+            record['pv'] = info['lines'][0][1]
+        else:
+            pv = extract_pv(board, state, info['depth'])
+            record['pv'] = pv if pv and pv[0] == info['move'] else [info['move']]
+        emit('info', record)
+
+    def run():
+        try:
+            emit('done', iterative_deepening_pvs(board, state, on_iteration=on_iteration, **limits))
+        except Exception as e:
+            emit('error', e)
+
+    search_stop.clear()
+    reset_search_stats()
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread
+
+def _stop_analysis(thread):
+    search_stop.set()
+    thread.join()
+    search_stop.clear()
+
+def analyse(board, state, limits=None):
+    """
+    Search in the background and yield an info dict per completed depth:
+    depth, seldepth, score (side to move's view), move, pv, nodes, nps,
+    hashfull, time (plus 'lines' with multipv). limits are
+    iterative_deepening_pvs keywords (max_time, max_depth, max_nodes,
+    multipv); without any the search runs until the caller stops. Closing
+    the generator (break plus close(), or leaving a with closing(...)
+    block) stops the search before it returns. The generator's return
+    value is the best move.
+    """
+    import queue
+    results = queue.Queue()
+    thread = _start_analysis(board, state, dict({'max_time': float('inf')}, **(limits or {})),
+                             lambda kind, value: results.put((kind, value)))
+    try:
+        while True:
+            kind, value = results.get()
+            if kind == 'error':
+                raise value
+            if kind == 'done':
+                return value
+            yield value
+    finally:
+        _stop_analysis(thread)
+
+async def analyse_async(board, state, limits=None):
+    """analyse as an async generator; cancelling the consumer or aclose() stops the search."""
+    import asyncio
+    loop = asyncio.get_running_loop()
+    results = asyncio.Queue()
+    thread = _start_analysis(board, state, dict({'max_time': float('inf')}, **(limits or {})),
+                             lambda kind, value: loop.call_soon_threadsafe(results.put_nowait, (kind, value)))
+    try:
+        while True:
+            kind, value = await results.get()
+            if kind == 'error':
+                raise value
+            if kind == 'done':
+                return
+            yield value
+    finally:
+        # Wait for the search thread off the event loop so it keeps running meanwhile
+        search_stop.set()
+        await loop.run_in_executor(None, thread.join)
+        search_stop.clear()
 
 def board_to_fen(board, state):
     fen_rows = []
@@ -420,28 +1075,147 @@ def board_to_fen(board, state):
     else:
         ep_str = '-'
     stm = 'w' if state.get('side_to_move', 'white') == 'white' else 'b'
-    halfmove_clock = '0'
-    fullmove_number = '1'
+    halfmove_clock = state.get('halfmove_clock', 0)
+    fullmove_number = state.get('fullmove_number', 1)
     return f"{fen_position} {stm} {cr_str} {ep_str} {halfmove_clock} {fullmove_number}"
 
+def square_name(sq):
+    """Convert a (row, col) square to algebraic notation, e.g. (6, 4) -> 'e2'."""
+    r, c = sq
+    return chr(ord('a') + c) + str(8 - r)
+
+def move_to_uci(move):
+    """Convert an engine move tuple to UCI long algebraic notation."""
+    uci = square_name(move[0]) + square_name(move[1])
+    if len(move) == 3:
+        uci += move[2].lower()
+    return uci
+
+def uci_to_move(board, state, uci):
+    """Match a UCI move string (e.g. 'e7e8q') against the legal moves."""
+    for move in generate_legal_moves(board, state):
+        if move_to_uci(move) == uci.lower():
+            return move
+    raise ValueError(f"Illegal move: {uci}")
+
+def fen_to_board(fen):
+    """Parse a FEN string into the engine's (board, state) representation."""
+    fields = fen.split()
+    if len(fields) < 4:
+        raise ValueError(f"Invalid FEN: {fen}")
+    rows = fields[0].split('/')
+    if len(rows) != 8:
+        raise ValueError(f"Invalid FEN: {fen}")
+    board = []
+    for fen_row in rows:
+        row = []
+        for ch in fen_row:
+            if ch.isdigit():
+                row.extend(['.'] * int(ch))
+            elif ch in 'PNBRQKpnbrqk':
+                row.append(ch)
+            else:
+                raise ValueError(f"Invalid FEN: {fen}")
+        if len(row) != 8:
+            raise ValueError(f"Invalid FEN: {fen}")
+        board.append(row)
+    cr = fields[2]
+    ep = fields[3]
+    state = {
+        'castling_rights': {k: k in cr for k in 'KQkq'},
+        'en_passant': None if ep == '-' else (8 - int(ep[1]), ord(ep[0]) - ord('a')),
+        'side_to_move': 'white' if fields[1] == 'w' else 'black',
+        'halfmove_clock': int(fields[4]) if len(fields) > 4 else 0,
+        'fullmove_number': int(fields[5]) if len(fields) > 5 else 1,
+        'history': ()
+    }
+    return board, state
+
+EPD_OPERATION = re.compile(r'\s*([A-Za-z]\w*)((?:\s*(?:"[^"]*"|[^\s;"]+))*)\s*;')
+
+def parse_epd(line):
+    """
+    Split an EPD line into a FEN (the four position fields plus the hmvc and
+    fmvn operations, or '0 1') and a dict of operations, opcode -> list of
+    operands with quotes removed, e.g. {'bm': ['Nf3'], 'id': ['WAC.001']}.
+    """
+    fields = line.split(None, 4)
+    if len(fields) < 4:
+        raise ValueError(f"Invalid EPD: {line}")
+    operations = {}
+    for opcode, operands in EPD_OPERATION.findall(fields[4] if len(fields) > 4 else ''):
+        operations[opcode] = [op.strip('"') for op in re.findall(r'"[^"]*"|[^\s"]+', operands)]
+    clocks = operations.get('hmvc', ['0'])[0], operations.get('fmvn', ['1'])[0]
+    return ' '.join(fields[:4] + list(clocks)), operations
+
+SAN_PATTERN = re.compile(r'^([NBRQK])?([a-h])?([1-8])?(x)?([a-h][1-8])(?:=?([NBRQnbrq]))?$')
+
 def san_to_move(board, state, san):
-    fen = board_to_fen(board, state)
-    board_obj = chess.Board(fen)
-    try:
-        move = board_obj.parse_san(san)
-    except ValueError:
+    """Match a SAN move (e.g. 'Nbd7', 'exd8=Q+', 'O-O') against the legal moves."""
+    text = san.strip().rstrip('+#!?')
+    legal = generate_legal_moves(board, state)
+    if text in ('O-O', '0-0', 'O-O-O', '0-0-0'):
+        col = 6 if len(text) == 3 else 2
+        for move in legal:
+            (fr, fc), (tr, tc) = move[0], move[1]
+            if board[fr][fc] in 'Kk' and fc == 4 and tc == col:
+                return move
+        raise ValueError(f"Illegal move: {san}")
+    m = SAN_PATTERN.match(text)
+    if not m:
         raise ValueError(f"Invalid SAN: {san}")
-    from_sq = move.from_square
-    to_sq = move.to_square
-    promotion = move.promotion
-    from_row = 7 - chess.square_rank(from_sq)
-    from_col = chess.square_file(from_sq)
-    to_row = 7 - chess.square_rank(to_sq)
-    to_col = chess.square_file(to_sq)
-    if promotion:
-        promo_piece = chess.piece_symbol(promotion).upper()
-        return ((from_row, from_col), (to_row, to_col), promo_piece)
-    return ((from_row, from_col), (to_row, to_col))
+    piece, from_file, from_rank, _, target, promo = m.groups()
+    piece = piece or 'P'
+    to_sq = (8 - int(target[1]), ord(target[0]) - ord('a'))
+    if piece == 'P' and from_file is None:
+        from_file = target[0]  # pawn captures must name their file
+    matches = []
+    for move in legal:
+        (fr, fc), to = move[0], move[1]
+        if to != to_sq or board[fr][fc].upper() != piece:
+            continue
+        if from_file and fc != ord(from_file) - ord('a'):
+            continue
+        if from_rank and fr != 8 - int(from_rank):
+            continue
+        if (move[2].upper() if len(move) == 3 else None) != (promo.upper() if promo else None):
+            continue
+        matches.append(move)
+    if len(matches) > 1:
+        raise ValueError(f"Ambiguous SAN: {san}")
+    if not matches:
+        raise ValueError(f"Illegal move: {san}")
+    return matches[0]
+
+def move_to_san(board, state, move, legal_moves=None):
+    """Standard algebraic notation of a legal move, with a +/# suffix."""
+    (fr, fc), (tr, tc) = move[0], move[1]
+    piece = board[fr][fc]
+    if piece in 'Kk' and abs(tc - fc) == 2:
+        san = 'O-O' if tc == 6 else 'O-O-O'
+    elif piece in 'Pp':
+        san = square_name(move[1])
+        if fc != tc:
+            san = chr(ord('a') + fc) + 'x' + san
+        if len(move) == 3:
+            san += '=' + move[2].upper()
+    else:
+        if legal_moves is None:
+            legal_moves = generate_legal_moves(board, state)
+        rivals = [m[0] for m in legal_moves
+                  if m[1] == move[1] and m[0] != move[0] and board[m[0][0]][m[0][1]] == piece]
+        origin = square_name(move[0])
+        if not rivals:
+            origin = ''
+        elif all(c != fc for _, c in rivals):
+            origin = origin[0]
+        elif all(r != fr for r, _ in rivals):
+            origin = origin[1]
+        san = piece.upper() + origin + ('x' if board[tr][tc] != '.' else '') + square_name(move[1])
+    new_board, new_state = apply_move(board, move, state)
+    if is_in_check(new_board, new_state, new_state['side_to_move']):
+        san += '+' if generate_legal_moves(new_board, new_state) else '#'
+    return san
 
 def print_board(board):
     print("  a b c d e f g h")
@@ -449,7 +1223,7 @@ def print_board(board):
         print(8 - i, ' '.join(row))
     print()
 
-def play_game():
+def play_game(ponder=False):
     board = [
         ['r','n','b','q','k','b','n','r'],
         ['p','p','p','p','p','p','p','p'],
@@ -463,7 +1237,10 @@ def play_game():
     state = {
         'castling_rights': {'K': True, 'Q': True, 'k': True, 'q': True},
         'en_passant': None,
-        'side_to_move': 'white'
+        'side_to_move': 'white',
+        'halfmove_clock': 0,
+        'fullmove_number': 1,
+        'history': ()
     }
     user_side = None
     while True:
@@ -474,9 +1251,20 @@ def play_game():
         else:
             print("Invalid input, please enter 'white' or 'black'")
 
+    pondering = None
+    ponder_move = None
+    ponder_best = None
     while True:
         print_board(board)
+        if repetition_count(board, state) >= 2:
+            print("Draw by threefold repetition!")
+            break
+        if state['halfmove_clock'] >= 100 and generate_legal_moves(board, state):
+            print("Draw by the fifty-move rule!")
+            break
         if state['side_to_move'] == user_side:
+            if ponder and pondering is None:
+                pondering = start_ponder(board, state, ponder_move)
             san = input("Your move (SAN): ")
             try:
                 move = san_to_move(board, state, san.strip())
@@ -484,14 +1272,41 @@ def play_game():
                 print("Invalid move:", e)
                 continue
             board, state = apply_move(board, move, state)
+            if pondering is not None:
+                ponder_best = finish_ponder(pondering, move, max_time=1.0)
+                pondering = None
         else:
             print("AI thinking...")
-            best = engine_move(board, state, max_time=1.0)
+            if ponder_best is not None:
+                best, ponder_best = ponder_best, None
+            else:
+                best = engine_move(board, state, max_time=1.0)
             if best is None:
                 print("Game over!")
                 break
+            pv = extract_pv(board, state, 2)
+            ponder_move = pv[1] if len(pv) == 2 and pv[0] == best else None
+            print(f"AI plays: {move_to_san(board, state, best)}")
             board, state = apply_move(board, best, state)
-            print(f"AI plays: {best}")
 
 if __name__ == '__main__':
-    play_game()
+    if len(sys.argv) > 1 and sys.argv[1] == 'bench':
+        from benchmark import bench
+        bench(int(sys.argv[2]) if len(sys.argv) > 2 else None)
+    else:
+        if '--book' in sys.argv:
+            set_opening_book(sys.argv[sys.argv.index('--book') + 1])
+        if '--params' in sys.argv:
+            load_eval_params(sys.argv[sys.argv.index('--params') + 1])
+        if '--nnue' in sys.argv:
+            set_evaluator('nnue', sys.argv[sys.argv.index('--nnue') + 1])
+        if '--tb' in sys.argv:
+            set_tablebase_path(sys.argv[sys.argv.index('--tb') + 1])
+        hash_file = sys.argv[sys.argv.index('--hash-file') + 1] if '--hash-file' in sys.argv else None
+        if hash_file and os.path.exists(hash_file):
+            print(f"Loaded {load_transposition_table(hash_file)} hash entries from {hash_file}")
+        try:
+            play_game(ponder='--ponder' in sys.argv)
+        finally:
+            if hash_file:
+                save_transposition_table(hash_file)
@@ -0,0 +1,376 @@
+"""
+Self-play matches between two engine configurations or code versions, to
+tell whether a change made the engine stronger.
+
+Each engine is a UCI process: by default this checkout's uci.py, and
+--engine1 / --engine2 can point at another checkout's uci.py to compare
+code versions. Configurations are UCI options (--option1 / --option2
+NAME=VALUE, e.g. Futility=false or Hash=64). Every position of the
+openings EPD file is played twice with colours reversed, at a fixed time
+or node count per move. Up to --concurrency games run at once, each
+driving its own pair of engine processes.
+
+Games end by the rules (main.game_result) or by adjudication: a win once
+both engines have scored one side at least RESIGN_SCORE ahead for
+RESIGN_MOVES moves each, a draw once, after DRAW_MOVE_NUMBER moves, the
+score has stayed within DRAW_SCORE for DRAW_PLIES plies, and a draw at
+MAX_PLIES. Every game is appended to the PGN file.
+
+After each game the Elo difference (engine1 - engine2) with its 95% error
+and the SPRT log-likelihood ratio of H1: elo = elo1 against H0: elo = elo0
+are updated. The match stops once the LLR leaves
+[log(beta / (1 - alpha)), log((1 - beta) / alpha)], or after --games games.
+
+Usage:
+    python match.py --option2 Futility=false --nodes 2000 --games 400 --pgn futility.pgn
+    python match.py --engine2 "python ../baseline/uci.py" --movetime 0.2 --elo1 10
+"""
+import argparse
+import datetime
+import math
+import os
+import shlex
+import subprocess
+import sys
+import threading
+
+from main import fen_to_board, apply_move, uci_to_move, move_to_san, game_result, parse_epd
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_ENGINE = [sys.executable, os.path.join(HERE, 'uci.py')]
+DEFAULT_OPENINGS = os.path.join(HERE, 'openings.epd')
+
+RESIGN_SCORE = 600     # centipawns
+RESIGN_MOVES = 3       # moves by each engine
+DRAW_MOVE_NUMBER = 40  # moves played from the opening position
+DRAW_SCORE = 10
+DRAW_PLIES = 8
+MAX_PLIES = 300
+MATE_SCORE = 100000
+
+TERMINATION_TAGS = {'adjudication': 'adjudication', 'max-length': 'adjudication',
+                    'illegal-move': 'rules infraction', 'engine-error': 'abandoned'}
+
+
+class EngineError(Exception):
+    """Raised when an engine process dies or stops answering."""
+
+
+# ---------- UCI engine processes ----------
+
+def send(engine, line):
+    try:
+        engine['proc'].stdin.write(line + '\n')
+        engine['proc'].stdin.flush()
+    except OSError as e:
+        raise EngineError(f"{engine['name']}: {e}") from e
+
+def read_until(engine, token):
+    """Lines from the engine up to and including the first starting with token."""
+    lines = []
+    while True:
+        line = engine['proc'].stdout.readline()
+        if not line:
+            raise EngineError(f"{engine['name']} exited")
+        lines.append(line.strip())
+        if line.split()[:1] == [token]:
+            return lines
+
+def start_engine(command=None, options=None, name='engine'):
+    """Start and configure a UCI engine process. Returns an engine handle (dict)."""
+    argv = shlex.split(command) if isinstance(command, str) else list(command or DEFAULT_ENGINE)
+    proc = subprocess.Popen(argv, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                            stderr=subprocess.DEVNULL, text=True, bufsize=1)
+    engine = {'proc': proc, 'name': name, 'command': command, 'options': dict(options or {})}
+    send(engine, 'uci')
+    read_until(engine, 'uciok')
+    for key, value in engine['options'].items():
+        send(engine, f"setoption name {key} value {value}")
+    send(engine, 'isready')
+    read_until(engine, 'readyok')
+    return engine
+
+def stop_engine(engine):
+    try:
+        send(engine, 'quit')
+        engine['proc'].wait(timeout=5)
+    except (EngineError, subprocess.TimeoutExpired):
+        engine['proc'].kill()
+        engine['proc'].wait()
+
+def go_command(limits):
+    """'go' line for {'movetime': seconds} or {'nodes': n} (or 'depth')."""
+    if 'movetime' in limits:
+        return f"go movetime {max(1, int(limits['movetime'] * 1000))}"
+    if 'nodes' in limits:
+        return f"go nodes {limits['nodes']}"
+    return f"go depth {limits.get('depth', 1)}"
+
+def engine_go(engine, fen, moves, limits):
+    """The engine's move (UCI string) and last reported score (side to move's view, or None)."""
+    position = f"position fen {fen}" + (" moves " + ' '.join(moves) if moves else '')
+    send(engine, position)
+    send(engine, go_command(limits))
+    score = None
+    for line in read_until(engine, 'bestmove'):
+        tokens = line.split()
+        if tokens[0] == 'info' and 'score' in tokens:
+            i = tokens.index('score')
+            if tokens[i + 1] == 'cp':
+                score = int(tokens[i + 2])
+            elif tokens[i + 1] == 'mate':
+                score = MATE_SCORE if int(tokens[i + 2]) > 0 else -MATE_SCORE
+    return tokens[1], score
+
+
+# ---------- Games ----------
+
+def adjudicate(scores):
+    """(result, reason) from the engines' scores so far (white's view, one per ply), else None."""
+    recent = scores[-2 * RESIGN_MOVES:]
+    if len(recent) == 2 * RESIGN_MOVES and None not in recent:
+        if all(s >= RESIGN_SCORE for s in recent):
+            return '1-0', 'adjudication'
+        if all(s <= -RESIGN_SCORE for s in recent):
+            return '0-1', 'adjudication'
+    recent = scores[-DRAW_PLIES:]
+    if (len(scores) >= 2 * DRAW_MOVE_NUMBER and len(recent) == DRAW_PLIES and None not in recent
+            and all(abs(s) <= DRAW_SCORE for s in recent)):
+        return '1/2-1/2', 'adjudication'
+    if len(scores) >= MAX_PLIES:
+        return '1/2-1/2', 'max-length'
+    return None
+
+def play_game(white, black, fen, limits):
+    """Play one game between two engine handles from fen. Returns the game record (dict)."""
+    board, state = fen_to_board(fen)
+    engines = {'white': white, 'black': black}
+    for engine in (white, black):
+        send(engine, 'ucinewgame')
+        send(engine, 'isready')
+        read_until(engine, 'readyok')
+    moves, sans, scores = [], [], []
+    while True:
+        over = game_result(board, state) or adjudicate(scores)
+        if over is not None:
+            break
+        side = state['side_to_move']
+        loss = ('0-1' if side == 'white' else '1-0')
+        try:
+            uci, score = engine_go(engines[side], fen, moves, limits)
+            move = uci_to_move(board, state, uci)
+        except EngineError:
+            over = loss, 'engine-error'
+            break
+        except ValueError:
+            over = loss, 'illegal-move'
+            break
+        sans.append(move_to_san(board, state, move))
+        moves.append(uci)
+        scores.append(None if score is None else score if side == 'white' else -score)
+        board, state = apply_move(board, move, state)
+    return {'white': white['name'], 'black': black['name'], 'fen': fen, 'moves': sans,
+            'result': over[0], 'reason': over[1]}
+
+def format_pgn(game, event='Self-play match', round_number=1):
+    """The game record as PGN text."""
+    headers = [('Event', event), ('Site', 'local'),
+               ('Date', datetime.date.today().strftime('%Y.%m.%d')), ('Round', str(round_number)),
+               ('White', game['white']), ('Black', game['black']), ('Result', game['result']),
+               ('FEN', game['fen']), ('SetUp', '1'),
+               ('Termination', TERMINATION_TAGS.get(game['reason'], 'normal')),
+               ('PlyCount', str(len(game['moves'])))]
+    fields = game['fen'].split()
+    number = int(fields[5]) if len(fields) > 5 else 1
+    white_to_move = fields[1] == 'w'
+    tokens = []
+    for i, san in enumerate(game['moves']):
+        if white_to_move:
+            tokens.append(f"{number}.")
+        elif i == 0:
+            tokens.append(f"{number}...")
+        tokens.append(san)
+        if not white_to_move:
+            number += 1
+        white_to_move = not white_to_move
+    tokens += ['{' + game['reason'] + '}', game['result']]
+    lines, line = [], ''
+    for token in tokens:
+        if line and len(line) + 1 + len(token) > 79:
+            lines.append(line)
+            line = token
+        else:
+            line = f"{line} {token}" if line else token
+    lines.append(line)
+    return ''.join(f'[{key} "{value}"]\n' for key, value in headers) + '\n' + '\n'.join(lines) + '\n\n'
+
+def read_openings(path=DEFAULT_OPENINGS):
+    """FENs of the positions in an EPD file (blank lines and ';' comments skipped)."""
+    with open(path) as f:
+        return [parse_epd(line)[0] for line in f if line.strip() and not line.startswith(';')]
+
+
+# ---------- Statistics ----------
+
+def elo_from_score(score):
+    """Logistic Elo difference of an expected score."""
+    score = min(max(score, 1e-6), 1 - 1e-6)
+    return -400 * math.log10(1 / score - 1) + 0.0  # no -0.0
+
+def sprt_bounds(alpha=0.05, beta=0.05):
+    """(lower, upper) LLR bounds: below accepts H0, above accepts H1."""
+    return math.log(beta / (1 - alpha)), math.log((1 - beta) / alpha)
+
+def sprt_llr(wins, draws, losses, elo0=0.0, elo1=5.0):
+    """
+    Log-likelihood ratio of H1: elo = elo1 against H0: elo = elo0 from
+    win/draw/loss counts (generalised SPRT, normal approximation). 0 while
+    the results have no spread yet.
+    """
+    n = wins + draws + losses
+    if n == 0:
+        return 0.0
+    score = (wins + draws / 2) / n
+    variance = (wins * (1 - score) ** 2 + draws * (0.5 - score) ** 2 + losses * score ** 2) / n
+    if variance == 0:
+        return 0.0
+    s0, s1 = (1 / (1 + 10 ** (-elo / 400)) for elo in (elo0, elo1))
+    return n * (s1 - s0) * (2 * score - s0 - s1) / (2 * variance)
+
+def match_stats(wins, draws, losses, elo0=0.0, elo1=5.0, alpha=0.05, beta=0.05):
+    """Score, Elo estimate with 95% error margin, LLR and the SPRT verdict so far."""
+    n = wins + draws + losses
+    score = (wins + draws / 2) / n if n else 0.5
+    variance = (wins * (1 - score) ** 2 + draws * (0.5 - score) ** 2 + losses * score ** 2) / n if n else 0.0
+    margin = 1.96 * math.sqrt(variance / n) if n else 0.0
+    lower, upper = sprt_bounds(alpha, beta)
+    llr = sprt_llr(wins, draws, losses, elo0, elo1)
+    return {
+        'games': n, 'wins': wins, 'draws': draws, 'losses': losses,
+        'score': score,
+        'elo': elo_from_score(score),
+        'elo_error': (elo_from_score(score + margin) - elo_from_score(score - margin)) / 2,
+        'llr': llr, 'lower': lower, 'upper': upper,
+        'verdict': 'H1' if llr >= upper else 'H0' if llr <= lower else None,
+    }
+
+
+# ---------- Match ----------
+
+def run_match(engine1, engine2, openings, limits, games=200, concurrency=1, pgn_path=None,
+              elo0=0.0, elo1=5.0, alpha=0.05, beta=0.05, on_game=None):
+    """
+    Play up to games games between engine1 and engine2 (start_engine keyword
+    dicts: command, options, name), concurrency at a time, stopping early
+    once the SPRT reaches a verdict. on_game(game, stats) is called after
+    every game. Returns the final match_stats, from engine1's point of view.
+    """
+    record = {'wins': 0, 'draws': 0, 'losses': 0}
+    lock = threading.Lock()
+    next_index = [0]
+    stop = threading.Event()
+    errors = []
+    pgn = open(pgn_path, 'a') if pgn_path else None
+
+    def worker():
+        pair = []
+        try:
+            pair[:] = [start_engine(**engine1), start_engine(**engine2)]
+            while not stop.is_set():
+                with lock:
+                    index = next_index[0]
+                    if index >= games:
+                        return
+                    next_index[0] += 1
+                fen = openings[(index // 2) % len(openings)]
+                white, black = pair if index % 2 == 0 else pair[::-1]
+                game = play_game(white, black, fen, limits)
+                with lock:
+                    if game['result'] == '1/2-1/2':
+                        record['draws'] += 1
+                    elif (game['result'] == '1-0') == (white is pair[0]):
+                        record['wins'] += 1
+                    else:
+                        record['losses'] += 1
+                    if pgn is not None:
+                        pgn.write(format_pgn(game, round_number=index + 1))
+                        pgn.flush()
+                    stats = match_stats(record['wins'], record['draws'], record['losses'],
+                                        elo0, elo1, alpha, beta)
+                    if on_game is not None:
+                        on_game(game, stats)
+                    if stats['verdict'] is not None:
+                        stop.set()
+                for i, engine in enumerate(pair):
+                    if engine['proc'].poll() is not None:  # crashed: start a fresh one
+                        pair[i] = start_engine(**(engine1, engine2)[i])
+        except Exception as e:
+            errors.append(e)
+            stop.set()
+        finally:
+            for engine in pair:
+                stop_engine(engine)
+
+    threads = [threading.Thread(target=worker) for _ in range(max(1, min(concurrency, games)))]
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        if pgn is not None:
+            pgn.close()
+    if errors:
+        raise errors[0]
+    return match_stats(record['wins'], record['draws'], record['losses'], elo0, elo1, alpha, beta)
+
+
+def parse_options(pairs):
+    options = {}
+    for pair in pairs or []:
+        key, _, value = pair.partition('=')
+        options[key] = value
+    return options
+
+def cli():
+    parser = argparse.ArgumentParser(description="Engine-vs-engine match with SPRT")
+    for i in (1, 2):
+        parser.add_argument(f'--engine{i}', help="UCI engine command (default: this checkout's uci.py)")
+        parser.add_argument(f'--name{i}', default=f'engine{i}')
+        parser.add_argument(f'--option{i}', action='append', metavar='NAME=VALUE',
+                            help="UCI option (repeatable)")
+    parser.add_argument('--openings', default=DEFAULT_OPENINGS, help="EPD file of start positions")
+    limit = parser.add_mutually_exclusive_group()
+    limit.add_argument('--movetime', type=float, help="seconds per move")
+    limit.add_argument('--nodes', type=int, help="nodes per move")
+    parser.add_argument('--games', type=int, default=200, help="maximum number of games")
+    parser.add_argument('--concurrency', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--pgn', help="append the games to this PGN file")
+    parser.add_argument('--elo0', type=float, default=0.0)
+    parser.add_argument('--elo1', type=float, default=5.0)
+    parser.add_argument('--alpha', type=float, default=0.05)
+    parser.add_argument('--beta', type=float, default=0.05)
+    args = parser.parse_args()
+
+    limits = {'nodes': args.nodes} if args.nodes else {'movetime': args.movetime or 0.1}
+    engines = [{'command': getattr(args, f'engine{i}'), 'options': parse_options(getattr(args, f'option{i}')),
+                'name': getattr(args, f'name{i}')} for i in (1, 2)]
+
+    def report(game, stats):
+        print(f"Game {stats['games']}: {game['white']} - {game['black']} {game['result']} ({game['reason']})  "
+              f"+{stats['wins']} ={stats['draws']} -{stats['losses']}  "
+              f"Elo {stats['elo']:+.1f} +/- {stats['elo_error']:.1f}  "
+              f"LLR {stats['llr']:.2f} [{stats['lower']:.2f}, {stats['upper']:.2f}]", flush=True)
+
+    stats = run_match(engines[0], engines[1], read_openings(args.openings), limits, args.games,
+                      args.concurrency, args.pgn, args.elo0, args.elo1, args.alpha, args.beta,
+                      on_game=report)
+    verdict = {'H1': f"H1 accepted ({args.name1} is stronger by about {args.elo1:g} Elo or more)",
+               'H0': f"H0 accepted ({args.name1} is not stronger by {args.elo1:g} Elo)",
+               None: "no SPRT verdict yet"}[stats['verdict']]
+    print(f"{args.name1} vs {args.name2}: +{stats['wins']} ={stats['draws']} -{stats['losses']}, "
+          f"Elo {stats['elo']:+.1f} +/- {stats['elo_error']:.1f}, {verdict}")
+
+
+if __name__ == '__main__':
+    cli()
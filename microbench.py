@@ -0,0 +1,201 @@
+"""
+Micro-benchmarks for the engine's primitive operations.
+
+Times generate_all_moves, generate_move_codes, apply_move, apply_undo_move
+(a make/unmake pair: apply_move, then undo_move back to the position),
+is_attacked, is_in_check, advanced_evaluate, evaluate_pawn_structure,
+move_ordering, board_to_fen and san_to_move separately over a fixed corpus (the bench positions, with their
+legal moves, squares and SAN strings as arguments) and reports ns per call.
+Every operation gets warmup passes, then enough calls per run to last
+MIN_RUN_TIME, then REPEAT timed runs with the garbage collector off; ns/op is
+the fastest run (the least disturbed), with median, mean and stdev alongside.
+
+Results can be written as JSON and compared against a stored baseline; any
+operation slower than the baseline by more than the threshold is a
+regression, and the command exits with status 1 so it can gate a change.
+
+Usage:
+    python microbench.py --json baseline.json
+    python microbench.py --baseline baseline.json --threshold 0.10
+    python microbench.py --ops apply_move is_attacked --repeat 10
+"""
+import argparse
+import gc
+import json
+import platform
+import statistics
+import sys
+import time
+
+from benchmark import BENCH_POSITIONS
+from main import (fen_to_board, advanced_evaluate, evaluate_pawn_structure, move_ordering,
+                  board_to_fen, san_to_move, move_to_san, reset_search_state)
+from move_generation import (generate_all_moves, generate_move_codes, generate_legal_moves, is_attacked,
+                             is_in_check)
+from move_application import apply_move, undo_move
+
+REPEAT = 5
+WARMUP = 1
+MIN_RUN_TIME = 0.1  # seconds
+THRESHOLD = 0.10    # a regression is ns/op more than 10% above the baseline
+ORDERING_DEPTH = 3
+
+
+def apply_undo_move(board, move, state):
+    """Make move, then restore the position with undo_move."""
+    apply_move(board, move, state)
+    return undo_move(board, state)
+
+
+OPERATIONS = {
+    'generate_all_moves': generate_all_moves,
+    'generate_move_codes': generate_move_codes,
+    'apply_move': apply_move,
+    'apply_undo_move': apply_undo_move,
+    'is_attacked': is_attacked,
+    'is_in_check': is_in_check,
+    'advanced_evaluate': advanced_evaluate,
+    'evaluate_pawn_structure': evaluate_pawn_structure,
+    'move_ordering': move_ordering,
+    'board_to_fen': board_to_fen,
+    'san_to_move': san_to_move,
+}
+
+
+def build_cases(positions=None):
+    """Operation name -> list of argument tuples drawn from the positions."""
+    cases = {name: [] for name in OPERATIONS}
+    for fen in positions or BENCH_POSITIONS:
+        board, state = fen_to_board(fen)
+        side = state['side_to_move']
+        enemy = 'black' if side == 'white' else 'white'
+        codes = generate_move_codes(board, state)
+        legal = generate_legal_moves(board, state)
+        cases['generate_all_moves'].append((board, state))
+        cases['generate_move_codes'].append((board, state))
+        cases['apply_move'] += [(board, move, state) for move in legal]
+        cases['apply_undo_move'] += [(board, move, state) for move in legal]
+        cases['is_attacked'] += [(board, r, c, enemy) for r in range(8) for c in range(8)]
+        cases['is_in_check'] += [(board, state, side), (board, state, enemy)]
+        cases['advanced_evaluate'].append((board, state))
+        cases['evaluate_pawn_structure'] += [(board, 'white'), (board, 'black')]
+        cases['move_ordering'].append((board, codes, ORDERING_DEPTH))
+        cases['board_to_fen'].append((board, state))
+        cases['san_to_move'] += [(board, state, move_to_san(board, state, move, legal)) for move in legal]
+    return cases
+
+
+def _run(fn, cases, loops):
+    """Nanoseconds for loops passes over the cases, with the garbage collector off."""
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        start = time.perf_counter_ns()
+        for _ in range(loops):
+            for args in cases:
+                fn(*args)
+        return time.perf_counter_ns() - start
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def time_operation(fn, cases, repeat=REPEAT, warmup=WARMUP, min_time=MIN_RUN_TIME):
+    """ns/op statistics for calling fn on every argument tuple in cases."""
+    for _ in range(warmup):
+        _run(fn, cases, 1)
+    loops = 1
+    while _run(fn, cases, loops) < min_time * 1e9 and loops < 1 << 20:
+        loops *= 2
+    samples = [_run(fn, cases, loops) / (loops * len(cases)) for _ in range(repeat)]
+    return {
+        'ns_per_op': min(samples),
+        'median': statistics.median(samples),
+        'mean': statistics.fmean(samples),
+        'stdev': statistics.stdev(samples) if len(samples) > 1 else 0.0,
+        'calls': loops * len(cases),
+        'repeat': repeat,
+    }
+
+
+def run_microbench(operations=None, positions=None, repeat=REPEAT, warmup=WARMUP,
+                   min_time=MIN_RUN_TIME):
+    """Time the operations (default: all) and return the JSON-ready results."""
+    reset_search_state()  # move_ordering reads killers and history
+    cases = build_cases(positions)
+    results = {}
+    for name in operations or OPERATIONS:
+        results[name] = time_operation(OPERATIONS[name], cases[name], repeat, warmup, min_time)
+    return {
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'machine': platform.machine(),
+        'positions': len(positions or BENCH_POSITIONS),
+        'results': results,
+    }
+
+
+def compare(current, baseline, threshold=THRESHOLD):
+    """
+    Per-operation change against a baseline (both as returned by
+    run_microbench). Returns [(name, baseline ns, current ns, change)] for
+    the operations in both, and the names that regressed beyond threshold.
+    """
+    rows, regressions = [], []
+    for name, result in current['results'].items():
+        if name not in baseline['results']:
+            continue
+        before = baseline['results'][name]['ns_per_op']
+        change = result['ns_per_op'] / before - 1
+        rows.append((name, before, result['ns_per_op'], change))
+        if change > threshold:
+            regressions.append(name)
+    return rows, regressions
+
+
+def print_results(current, baseline=None, threshold=THRESHOLD):
+    rows = {}
+    regressions = []
+    if baseline is not None:
+        compared, regressions = compare(current, baseline, threshold)
+        rows = {name: (before, change) for name, before, _, change in compared}
+    print(f"{'operation':<24}{'ns/op':>12}{'median':>12}{'stdev':>10}{'calls':>10}"
+          + (f"{'baseline':>12}{'change':>9}" if baseline is not None else ''))
+    for name, result in current['results'].items():
+        line = (f"{name:<24}{result['ns_per_op']:>12.0f}{result['median']:>12.0f}"
+                f"{result['stdev']:>10.0f}{result['calls']:>10}")
+        if name in rows:
+            before, change = rows[name]
+            line += f"{before:>12.0f}{change:>+8.1%}" + (' REGRESSION' if name in regressions else '')
+        print(line)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmarks of the engine's primitive operations")
+    parser.add_argument('--ops', nargs='+', choices=list(OPERATIONS), help="operations to time (default: all)")
+    parser.add_argument('--repeat', type=int, default=REPEAT, help="timed runs per operation")
+    parser.add_argument('--warmup', type=int, default=WARMUP, help="untimed passes per operation")
+    parser.add_argument('--min-time', type=float, default=MIN_RUN_TIME, help="seconds per timed run")
+    parser.add_argument('--json', help="write the results to this file")
+    parser.add_argument('--baseline', help="compare against results written earlier with --json")
+    parser.add_argument('--threshold', type=float, default=THRESHOLD,
+                        help="relative slowdown counted as a regression")
+    args = parser.parse_args()
+
+    current = run_microbench(args.ops, repeat=args.repeat, warmup=args.warmup, min_time=args.min_time)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    regressions = print_results(current, baseline, args.threshold)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(current, f, indent=2)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) beyond {args.threshold:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,11 +1,61 @@
 from copy import deepcopy
+from hashlib import blake2b
+
+# ---------- Move encoding ----------
+# Moves are tuples at the API boundary; the search generates, orders and
+# stores them as 16-bit ints (move_generation.generate_move_codes), which
+# apply_move decodes. Bits 0-5 target square, 6-11 origin square (square =
+# row * 8 + col, a8 = 0), 12-13 promotion piece (N, B, R, Q), 14-15 flags.
+
+MOVE_NONE = 0
+NORMAL, PROMOTION, EN_PASSANT, CASTLING = 0, 1 << 14, 2 << 14, 3 << 14
+PROMOTION_PIECES = 'NBRQ'
+
+def encode_move(board, move):
+    """16-bit code of a move tuple (board is the position before the move)."""
+    (fr, fc), (tr, tc) = move[0], move[1]
+    code = (fr * 8 + fc) << 6 | (tr * 8 + tc)
+    if len(move) == 3:
+        return code | PROMOTION | PROMOTION_PIECES.index(move[2].upper()) << 12
+    piece = board[fr][fc]
+    if piece in 'Kk' and abs(tc - fc) == 2:
+        return code | CASTLING
+    if piece in 'Pp' and fc != tc and board[tr][tc] == '.':
+        return code | EN_PASSANT
+    return code
+
+def decode_move(code):
+    """Move tuple of a 16-bit code; promotions to rank 8 are white's."""
+    frm, to = code >> 6 & 63, code & 63
+    move = ((frm >> 3, frm & 7), (to >> 3, to & 7))
+    if code & 0xC000 == PROMOTION:
+        promo = PROMOTION_PIECES[code >> 12 & 3]
+        return move + (promo if to < 8 else promo.lower(),)
+    return move
+
+def position_key(board, state):
+    """
+    Key of a position (pieces, side to move, castling rights and en passant)
+    as an unsigned 64-bit int. Unlike hash() it is the same in every process,
+    so keys can be saved to disk (see main.save_transposition_table).
+    """
+    cr = state.get('castling_rights', {})
+    board_str = (''.join(''.join(row) for row in board) + state['side_to_move'] +
+                 ''.join(k for k in 'KQkq' if cr.get(k, False)) + str(state.get('en_passant')))
+    return int.from_bytes(blake2b(board_str.encode(), digest_size=8).digest(), 'little')
 
 def apply_move(board, move, state):
     """
     Returns a new board and updated state after applying a move.
     Supports normal moves, promotion, castling, and en passant.
     state: dict with 'castling_rights' (dict), 'en_passant' (tuple or None), 'side_to_move' ('white'/'black')
+    and optionally 'halfmove_clock', 'fullmove_number', 'history' (keys of the
+    positions since the last capture or pawn move, see position_key), an
+    NNUE 'accumulator' and 'attacks' maps (see attacks.py).
+    move is a tuple or a 16-bit move code (see encode_move).
     """
+    if move.__class__ is int:
+        move = decode_move(move)
     new_board = deepcopy(board)
     new_state = deepcopy(state)
     from_sq, to_sq = move[0], move[1]
@@ -65,9 +115,36 @@ def apply_move(board, move, state):
     elif moving_piece == 'r':
         disable_castle(from_sq[0], from_sq[1], 'black')
 
+    # Capturing a rook on its home corner removes that castling right
+    captured = board[to_sq[0]][to_sq[1]]
+    if captured == 'R':
+        disable_castle(to_sq[0], to_sq[1], 'white')
+    elif captured == 'r':
+        disable_castle(to_sq[0], to_sq[1], 'black')
+
+    # Fifty-move counter and the reversible-move window used for repetitions
+    if moving_piece.upper() == 'P' or captured != '.':
+        new_state['halfmove_clock'] = 0
+        new_state['history'] = ()
+    else:
+        new_state['halfmove_clock'] = state.get('halfmove_clock', 0) + 1
+        new_state['history'] = state.get('history', ()) + (position_key(board, state),)
+    if state['side_to_move'] == 'black':
+        new_state['fullmove_number'] = state.get('fullmove_number', 1) + 1
+
     # Change side to move
     new_state['side_to_move'] = 'black' if state['side_to_move'] == 'white' else 'white'
 
+    # Incrementally update an NNUE accumulator carried in the state (see nnue.py)
+    accumulator = state.get('accumulator')
+    if accumulator is not None:
+        new_state['accumulator'] = accumulator.after_move(board, move)
+
+    # Likewise for attack maps (see attacks.py)
+    attack_maps = state.get('attacks')
+    if attack_maps is not None:
+        new_state['attacks'] = attack_maps.after_move(board, new_board, move)
+
     return new_board, new_state
 
 def undo_move(prev_board, prev_state):
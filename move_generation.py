@@ -1,3 +1,6 @@
+from move_application import (apply_move, MOVE_NONE, NORMAL, PROMOTION, EN_PASSANT, CASTLING,
+                              PROMOTION_PIECES, encode_move, decode_move)
+
 # Define the board
 board = [
     ['r','n','b','q','k','b','n','r'],
@@ -18,9 +21,11 @@ def generate_white_pawn_moves(board):
     - Move forward by 1 square
     - Move forward by 2 squares if on starting rank and path is clear
     - Capture diagonally if opponent piece present
+    Pawns on the 7th rank are skipped; their moves are all promotions
+    (see generate_white_pawn_moves_with_promotion).
     """
     moves = []
-    for r in range(8):
+    for r in range(2, 8):
         for c in range(8):
             if board[r][c] == 'P':  # White pawn
                 # Forward 1 square
@@ -174,9 +179,11 @@ def generate_black_pawn_moves(board):
     - Move forward by 1 square
     - Move forward by 2 squares if on starting rank and path clear
     - Capture diagonally opponent pieces
+    Pawns on the 2nd rank are skipped; their moves are all promotions
+    (see generate_black_pawn_moves_with_promotion).
     """
     moves = []
-    for r in range(8):
+    for r in range(6):
         for c in range(8):
             if board[r][c] == 'p':  # Black pawn
                 # Forward 1 square
@@ -475,8 +482,6 @@ def generate_black_pawn_en_passant(board, en_passant_target):
                     moves.append(((r, c), (er, ec)))
     return moves
 
-# [Your existing move generation functions here]
-
 def generate_all_moves(board, state):
     """
     Generate all possible moves for the current player.
@@ -490,7 +495,7 @@ def generate_all_moves(board, state):
         moves.extend(generate_white_rook_moves(board))
         moves.extend(generate_white_queen_moves(board))
         moves.extend(generate_white_king_moves(board))
-        moves.extend(generate_white_pawn_moves_with_promotion(board))
+        moves.extend(m for m in generate_white_pawn_moves_with_promotion(board) if len(m) == 3)
         if 'castling_rights' in state:
             moves.extend(generate_white_castling_moves(board, state['castling_rights']))
         if 'en_passant' in state and state['en_passant'] is not None:
@@ -502,9 +507,262 @@ def generate_all_moves(board, state):
         moves.extend(generate_black_rook_moves(board))
         moves.extend(generate_black_queen_moves(board))
         moves.extend(generate_black_king_moves(board))
-        moves.extend(generate_black_pawn_moves_with_promotion(board))
+        moves.extend(m for m in generate_black_pawn_moves_with_promotion(board) if len(m) == 3)
         if 'castling_rights' in state:
             moves.extend(generate_black_castling_moves(board, state['castling_rights']))
         if 'en_passant' in state and state['en_passant'] is not None:
             moves.extend(generate_black_pawn_en_passant(board, state['en_passant']))
     return moves
+
+
+# ---------- Move generation as 16-bit codes ----------
+# Target squares per origin square (square = row * 8 + col), in the
+# direction order of the tuple generators above, so that generate_move_codes
+# yields the same moves in the same order.
+
+KNIGHT_DELTAS = [(-2, -1), (-2, 1), (-1, -2), (-1, 2), (1, -2), (1, 2), (2, -1), (2, 1)]
+BISHOP_DIRECTIONS = [(-1, -1), (-1, 1), (1, -1), (1, 1)]
+ROOK_DIRECTIONS = [(-1, 0), (1, 0), (0, -1), (0, 1)]
+QUEEN_DIRECTIONS = ROOK_DIRECTIONS + BISHOP_DIRECTIONS  # also the king's order
+
+def _step_targets(deltas):
+    targets = []
+    for sq in range(64):
+        r, c = divmod(sq, 8)
+        targets.append([(r + dr) * 8 + c + dc for dr, dc in deltas
+                        if 0 <= r + dr < 8 and 0 <= c + dc < 8])
+    return targets
+
+def _ray_targets(directions):
+    rays = []
+    for sq in range(64):
+        r, c = divmod(sq, 8)
+        square_rays = []
+        for dr, dc in directions:
+            ray = []
+            nr, nc = r + dr, c + dc
+            while 0 <= nr < 8 and 0 <= nc < 8:
+                ray.append(nr * 8 + nc)
+                nr += dr
+                nc += dc
+            square_rays.append(ray)
+        rays.append(square_rays)
+    return rays
+
+KNIGHT_TARGETS = _step_targets(KNIGHT_DELTAS)
+KING_TARGETS = _step_targets(QUEEN_DIRECTIONS)
+SLIDER_TARGETS = {'B': _ray_targets(BISHOP_DIRECTIONS), 'R': _ray_targets(ROOK_DIRECTIONS),
+                  'Q': _ray_targets(QUEEN_DIRECTIONS)}
+PROMOTION_CODES = [PROMOTION | PROMOTION_PIECES.index(p) << 12 for p in 'QRBN']
+
+def generate_move_codes(board, state):
+    """
+    generate_all_moves as 16-bit move codes (see encode_move): the same
+    moves in the same order, without building a tuple per move. The search
+    generates, orders and stores these; apply_move decodes them.
+    """
+    squares = board[0] + board[1] + board[2] + board[3] + board[4] + board[5] + board[6] + board[7]
+    white = state['side_to_move'] == 'white'
+    own = 'PNBRQK' if white else 'pnbrqk'
+    enemy = str.islower if white else str.isupper
+    pieces = {piece: [] for piece in own}
+    for sq in range(64):
+        if squares[sq] in pieces:
+            pieces[squares[sq]].append(sq)
+    pawn, knight, bishop, rook, queen, king = own
+    codes = []
+    append = codes.append
+
+    # Pawn pushes and captures, promotions left for last as in generate_all_moves
+    forward = -8 if white else 8
+    promoting = []
+    for sq in pieces[pawn]:
+        row, col = sq >> 3, sq & 7
+        if row == (1 if white else 6):
+            promoting.append(sq)
+            continue
+        if row == (0 if white else 7):
+            continue
+        base = sq << 6
+        to = sq + forward
+        if squares[to] == '.':
+            append(base | to)
+            if row == (6 if white else 1) and squares[to + forward] == '.':
+                append(base | (to + forward))
+        if col > 0 and enemy(squares[to - 1]):
+            append(base | (to - 1))
+        if col < 7 and enemy(squares[to + 1]):
+            append(base | (to + 1))
+
+    for piece, targets in ((knight, KNIGHT_TARGETS), (bishop, None), (rook, None),
+                           (queen, None), (king, KING_TARGETS)):
+        if targets is None:
+            rays = SLIDER_TARGETS[piece.upper()]
+            for sq in pieces[piece]:
+                base = sq << 6
+                for ray in rays[sq]:
+                    for to in ray:
+                        target = squares[to]
+                        if target == '.':
+                            append(base | to)
+                        else:
+                            if enemy(target):
+                                append(base | to)
+                            break
+        else:
+            for sq in pieces[piece]:
+                base = sq << 6
+                for to in targets[sq]:
+                    target = squares[to]
+                    if target == '.' or enemy(target):
+                        append(base | to)
+
+    for sq in promoting:
+        base = sq << 6
+        to = sq + forward
+        col = sq & 7
+        if squares[to] == '.':
+            codes.extend(base | to | flag for flag in PROMOTION_CODES)
+        if col > 0 and enemy(squares[to - 1]):
+            codes.extend(base | (to - 1) | flag for flag in PROMOTION_CODES)
+        if col < 7 and enemy(squares[to + 1]):
+            codes.extend(base | (to + 1) | flag for flag in PROMOTION_CODES)
+
+    rights = state.get('castling_rights')
+    if rights is not None:
+        home = 60 if white else 4
+        if rights.get('K' if white else 'k', False) and squares[home + 1] == '.' and squares[home + 2] == '.':
+            append(home << 6 | (home + 2) | CASTLING)
+        if (rights.get('Q' if white else 'q', False) and squares[home - 1] == '.'
+                and squares[home - 2] == '.' and squares[home - 3] == '.'):
+            append(home << 6 | (home - 2) | CASTLING)
+
+    en_passant = state.get('en_passant')
+    if en_passant is not None:
+        er, ec = en_passant
+        if er == (2 if white else 5):
+            for sq in pieces[pawn]:
+                if sq >> 3 == (3 if white else 4) and abs((sq & 7) - ec) == 1:
+                    append(sq << 6 | (er * 8 + ec) | EN_PASSANT)
+    return codes
+
+
+# ---------- Attack detection and legality ----------
+
+def find_king(board, side):
+    """Locate the king position for a side."""
+    king_char = 'K' if side == 'white' else 'k'
+    for r in range(8):
+        for c in range(8):
+            if board[r][c] == king_char:
+                return r, c
+    return None
+
+def is_attacked(board, r, c, attacker_side):
+    """Check if square (r,c) is attacked by attacker_side pieces."""
+    directions = {
+        'N': [(-2, -1), (-2, 1), (-1, -2), (-1, 2),
+              (1, -2), (1, 2), (2, -1), (2, 1)],
+        'B': [(-1, -1), (-1, 1), (1, -1), (1, 1)],
+        'R': [(-1, 0), (1, 0), (0, -1), (0, 1)],
+        'Q': [(-1, -1), (-1, 1), (1, -1), (1, 1),
+              (-1, 0), (1, 0), (0, -1), (0, 1)],
+        'K': [(-1, -1), (-1, 0), (-1, 1),
+              (0, -1),           (0, 1),
+              (1, -1),  (1, 0),  (1, 1)]
+    }
+
+    enemy_pawns = ['p'] if attacker_side == 'black' else ['P']
+    enemy_knights = ['n'] if attacker_side == 'black' else ['N']
+    enemy_bishops = ['b'] if attacker_side == 'black' else ['B']
+    enemy_rooks = ['r'] if attacker_side == 'black' else ['R']
+    enemy_queens = ['q'] if attacker_side == 'black' else ['Q']
+    enemy_kings = ['k'] if attacker_side == 'black' else ['K']
+
+    def on_board(x, y):
+        return 0 <= x < 8 and 0 <= y < 8
+
+    # Pawn diagonal attacks
+    pawn_dir = 1 if attacker_side == 'white' else -1
+    for dc in [-1, 1]:
+        nr, nc = r + pawn_dir, c + dc
+        if on_board(nr, nc) and board[nr][nc] in enemy_pawns:
+            return True
+
+    # Knight attacks
+    for dr, dc in directions['N']:
+        nr, nc = r + dr, c + dc
+        if on_board(nr, nc) and board[nr][nc] in enemy_knights:
+            return True
+
+    # Bishop & queen diagonal attacks
+    for dr, dc in directions['B']:
+        nr, nc = r + dr, c + dc
+        while on_board(nr, nc):
+            sq = board[nr][nc]
+            if sq != '.':
+                if sq in enemy_bishops or sq in enemy_queens:
+                    return True
+                break
+            nr += dr
+            nc += dc
+
+    # Rook & queen orthogonal attacks
+    for dr, dc in directions['R']:
+        nr, nc = r + dr, c + dc
+        while on_board(nr, nc):
+            sq = board[nr][nc]
+            if sq != '.':
+                if sq in enemy_rooks or sq in enemy_queens:
+                    return True
+                break
+            nr += dr
+            nc += dc
+
+    # King attacks
+    for dr, dc in directions['K']:
+        nr, nc = r + dr, c + dc
+        if on_board(nr, nc) and board[nr][nc] in enemy_kings:
+            return True
+
+    return False
+
+def is_in_check(board, state, side):
+    attack_maps = state.get('attacks')
+    if attack_maps is not None:
+        return attack_maps.in_check(side)
+    king_pos = find_king(board, side)
+    if king_pos is None:
+        return True  # King missing means checkmate technically
+    r, c = king_pos
+    attacker_side = 'black' if side == 'white' else 'white'
+    return is_attacked(board, r, c, attacker_side)
+
+def is_legal(board, state, move):
+    """
+    Check whether a move from generate_all_moves is legal: it must not leave
+    the mover's king attacked, and castling may not start in or pass through
+    check.
+    """
+    side = state['side_to_move']
+    from_sq, to_sq = move[0], move[1]
+    if board[from_sq[0]][from_sq[1]] in 'Kk' and abs(to_sq[1] - from_sq[1]) == 2:
+        enemy = 'black' if side == 'white' else 'white'
+        row = from_sq[0]
+        attack_maps = state.get('attacks')
+        if attack_maps is not None:
+            if (attack_maps.attacked(row * 8 + from_sq[1], enemy) or
+                    attack_maps.attacked(row * 8 + (from_sq[1] + to_sq[1]) // 2, enemy)):
+                return False
+        elif (is_attacked(board, row, from_sq[1], enemy) or
+                is_attacked(board, row, (from_sq[1] + to_sq[1]) // 2, enemy)):
+            return False
+    new_board, new_state = apply_move(board, move, state)
+    return not is_in_check(new_board, new_state, side)
+
+def generate_legal_moves(board, state):
+    """
+    Generate strictly legal moves for the current player
+    (generate_all_moves filtered by is_legal).
+    """
+    return [move for move in generate_all_moves(board, state) if is_legal(board, state, move)]
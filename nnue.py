@@ -0,0 +1,182 @@
+"""
+NNUE-style evaluation: a small network over 768 piece-square inputs whose
+first layer is kept as an accumulator and updated incrementally.
+
+Inputs are one-hot (piece, square) features seen from each side: from
+black's point of view the board is mirrored vertically and the colours
+swapped, so one weight matrix serves both perspectives. The accumulator
+holds the first-layer sums for both sides. apply_move carries it into the
+new state, adding and subtracting the weight rows of the pieces the move
+changes, so a node costs a few row additions instead of a 768-input
+matrix product.
+
+    eval = w2 . [clip(acc[side to move], 0, 1), clip(acc[other], 0, 1)] + b2
+
+Weights are float32 arrays in a local .npz file (w1 (768, H), b1 (H,),
+w2 (2H,), b2 scalar). nnue_reference.npz is a tiny reference net
+(material only plus a little noise) used by the tests; make it again with
+    python nnue.py --reference
+"""
+import argparse
+import os
+
+import numpy as np
+
+FEATURES = 768
+PIECE_ORDER = 'PNBRQKpnbrqk'
+PIECE_INDEX = {piece: i for i, piece in enumerate(PIECE_ORDER)}
+# From black's point of view the colours swap: own pieces come first
+SWAPPED_INDEX = {piece: PIECE_INDEX[piece.swapcase()] for piece in PIECE_ORDER}
+
+REFERENCE_NETWORK = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'nnue_reference.npz')
+
+
+def feature(piece, r, c, perspective):
+    """Input index of a piece on (r, c) seen from perspective ('white'/'black')."""
+    if perspective == 'white':
+        return PIECE_INDEX[piece] * 64 + r * 8 + c
+    return SWAPPED_INDEX[piece] * 64 + (7 - r) * 8 + c
+
+def move_features(board, move):
+    """
+    (added, removed) lists of (piece, r, c) for a move on the board before
+    it is made, mirroring apply_move: captures, en passant, castling rook
+    and promotion.
+    """
+    (fr, fc), (tr, tc) = move[0], move[1]
+    piece = board[fr][fc]
+    removed = [(piece, fr, fc)]
+    added = [(move[2] if len(move) == 3 else piece, tr, tc)]
+    captured = board[tr][tc]
+    if captured != '.':
+        removed.append((captured, tr, tc))
+    elif piece in 'Pp' and fc != tc:
+        # En passant: the captured pawn stands beside the moving pawn
+        removed.append((board[fr][tc], fr, tc))
+    if piece in 'Kk' and abs(tc - fc) == 2:
+        rook = 'R' if piece == 'K' else 'r'
+        rook_from, rook_to = (7, 5) if tc == 6 else (0, 3)
+        removed.append((rook, fr, rook_from))
+        added.append((rook, fr, rook_to))
+    return added, removed
+
+
+class Accumulator:
+    """
+    First-layer sums for both perspectives. Treated as immutable: updates
+    return a new accumulator, so copies of a state can share one.
+    """
+    __slots__ = ('network', 'white', 'black')
+
+    def __init__(self, network, white, black):
+        self.network = network
+        self.white = white
+        self.black = black
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def after_move(self, board, move):
+        """Accumulator for the position after move (board is before it)."""
+        w1 = self.network.w1
+        white = self.white.copy()
+        black = self.black.copy()
+        added, removed = move_features(board, move)
+        for piece, r, c in added:
+            white += w1[feature(piece, r, c, 'white')]
+            black += w1[feature(piece, r, c, 'black')]
+        for piece, r, c in removed:
+            white -= w1[feature(piece, r, c, 'white')]
+            black -= w1[feature(piece, r, c, 'black')]
+        return Accumulator(self.network, white, black)
+
+
+class Network:
+    """Network weights plus full refresh and evaluation."""
+
+    def __init__(self, w1, b1, w2, b2):
+        self.w1 = np.ascontiguousarray(w1, dtype=np.float32)
+        self.b1 = np.asarray(b1, dtype=np.float32)
+        self.w2 = np.asarray(w2, dtype=np.float32)
+        self.b2 = float(b2)
+        hidden = self.b1.shape[0]
+        if self.w1.shape != (FEATURES, hidden) or self.w2.shape != (2 * hidden,):
+            raise ValueError("inconsistent network shapes")
+
+    def refresh(self, board):
+        """Compute an accumulator from scratch."""
+        white = self.b1.copy()
+        black = self.b1.copy()
+        for r in range(8):
+            for c in range(8):
+                piece = board[r][c]
+                if piece != '.':
+                    white += self.w1[feature(piece, r, c, 'white')]
+                    black += self.w1[feature(piece, r, c, 'black')]
+        return Accumulator(self, white, black)
+
+    def attach(self, board, state):
+        """Copy of state carrying a fresh accumulator for board."""
+        return dict(state, accumulator=self.refresh(board))
+
+    def evaluate(self, board, state):
+        """Score from the side to move's point of view, in centipawns."""
+        acc = state.get('accumulator')
+        if acc is None or acc.network is not self:
+            acc = self.refresh(board)
+        if state['side_to_move'] == 'white':
+            own, other = acc.white, acc.black
+        else:
+            own, other = acc.black, acc.white
+        hidden = np.concatenate((own, other))
+        np.clip(hidden, 0.0, 1.0, out=hidden)
+        return int(round(float(hidden @ self.w2) + self.b2))
+
+
+def load_network(path=REFERENCE_NETWORK):
+    with np.load(path) as data:
+        return Network(data['w1'], data['b1'], data['w2'], data['b2'])
+
+def save_network(network, path):
+    np.savez(path, w1=network.w1, b1=network.b1, w2=network.w2, b2=np.float32(network.b2))
+
+def reference_network(hidden=16, seed=0):
+    """
+    The tiny test net: hidden units 0-9 count own and enemy pawns, knights,
+    bishops, rooks and queens (scaled into 0..1), the output weighs them by
+    piece value; the remaining units carry small seeded random weights.
+    """
+    rng = np.random.default_rng(seed)
+    w1 = np.zeros((FEATURES, hidden), dtype=np.float32)
+    w2 = np.zeros(2 * hidden, dtype=np.float32)
+    values = {'P': 100, 'N': 320, 'B': 330, 'R': 500, 'Q': 900}
+    caps = {'P': 8, 'N': 10, 'B': 10, 'R': 10, 'Q': 9}
+    for unit, kind in enumerate('PNBRQ'):
+        w1[PIECE_INDEX[kind] * 64:PIECE_INDEX[kind] * 64 + 64, unit] = 1 / caps[kind]
+        w1[PIECE_INDEX[kind.lower()] * 64:PIECE_INDEX[kind.lower()] * 64 + 64, unit + 5] = 1 / caps[kind]
+        w2[unit] = values[kind] * caps[kind]
+        w2[unit + 5] = -values[kind] * caps[kind]
+    w1[:, 10:] = rng.normal(0, 0.05, size=(FEATURES, hidden - 10))
+    w2[10:hidden] = rng.normal(0, 10, size=hidden - 10)
+    w2[hidden + 10:] = -w2[10:hidden]
+    return Network(w1, np.full(hidden, 0.0, dtype=np.float32), w2, 0.0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="NNUE network tools")
+    parser.add_argument('--reference', action='store_true',
+                        help=f"write the reference net to {os.path.basename(REFERENCE_NETWORK)}")
+    parser.add_argument('--fen', help="evaluate a position with --weights")
+    parser.add_argument('--weights', default=REFERENCE_NETWORK)
+    args = parser.parse_args()
+    if args.reference:
+        save_network(reference_network(), REFERENCE_NETWORK)
+        print(f"wrote {REFERENCE_NETWORK}")
+    if args.fen:
+        from main import fen_to_board
+        board, state = fen_to_board(args.fen)
+        print(load_network(args.weights).evaluate(board, state))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,173 @@
+"""
+Perft (performance test) for move generation and move application.
+
+Counts the leaf nodes of the legal move tree to a fixed depth and compares
+them against published reference counts, which proves generate_all_moves and
+apply_move correct and doubles as a raw nodes-per-second benchmark.
+
+Usage:
+    python perft.py                          # run the standard suite
+    python perft.py --depth 4 --hash         # deeper, with a perft hash table
+    python perft.py --fen "<fen>" --depth 3 --divide
+    python perft.py --depth 4 --workers 4    # split root moves over processes
+"""
+import argparse
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from move_generation import generate_legal_moves
+from move_application import apply_move
+from main import fen_to_board, move_to_uci
+
+START_FEN = 'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1'
+
+# (name, fen, known node counts for depth 1, 2, 3, ...)
+PERFT_SUITE = [
+    ('startpos', START_FEN,
+     [20, 400, 8902, 197281, 4865609]),
+    ('kiwipete', 'r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1',
+     [48, 2039, 97862, 4085603]),
+    ('position3', '8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1',
+     [14, 191, 2812, 43238, 674624]),
+    ('position4', 'r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1',
+     [6, 264, 9467, 422333]),
+    ('position5', 'rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8',
+     [44, 1486, 62379, 2103487]),
+    ('position6', 'r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10',
+     [46, 2079, 89890, 3894594]),
+]
+
+
+def position_key(board, state):
+    """Hashable key covering everything that affects the legal move tree."""
+    cr = state.get('castling_rights', {})
+    return (''.join(''.join(row) for row in board),
+            state['side_to_move'],
+            cr.get('K', False), cr.get('Q', False), cr.get('k', False), cr.get('q', False),
+            state.get('en_passant'))
+
+
+def perft(board, state, depth, hash_table=None):
+    """
+    Count leaf nodes of the legal move tree to the given depth.
+    The last ply is bulk-counted (the number of legal moves is returned
+    without applying them). Pass a dict as hash_table to cache subtree
+    counts keyed by (position, depth).
+    """
+    if depth == 0:
+        return 1
+    if hash_table is not None and depth > 1:
+        key = (position_key(board, state), depth)
+        cached = hash_table.get(key)
+        if cached is not None:
+            return cached
+    moves = generate_legal_moves(board, state)
+    if depth == 1:
+        return len(moves)
+    nodes = 0
+    for move in moves:
+        new_board, new_state = apply_move(board, move, state)
+        nodes += perft(new_board, new_state, depth - 1, hash_table)
+    if hash_table is not None:
+        hash_table[key] = nodes
+    return nodes
+
+
+def _perft_worker(args):
+    """Process-pool entry point: perft of one root move's subtree."""
+    board, state, depth, use_hash = args
+    return perft(board, state, depth, {} if use_hash else None)
+
+
+def divide(board, state, depth, hash_table=None, workers=None):
+    """
+    Return {uci_move: node_count} for each legal root move.
+    With workers set, root subtrees are searched in a process pool; each
+    worker keeps its own hash table when hash_table is given.
+    """
+    if depth < 1:
+        raise ValueError("divide requires depth >= 1")
+    moves = generate_legal_moves(board, state)
+    children = [apply_move(board, move, state) for move in moves]
+    if workers:
+        jobs = [(nb, ns, depth - 1, hash_table is not None) for nb, ns in children]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            counts = list(pool.map(_perft_worker, jobs))
+    else:
+        counts = [perft(nb, ns, depth - 1, hash_table) for nb, ns in children]
+    return {move_to_uci(move): count for move, count in zip(moves, counts)}
+
+
+def perft_parallel(board, state, depth, workers=None, use_hash=False):
+    """Perft with the root moves split across a process pool."""
+    if depth < 2:
+        return perft(board, state, depth)
+    return sum(divide(board, state, depth, {} if use_hash else None, workers or None).values())
+
+
+def run_perft(board, state, depth, use_hash=False, workers=None):
+    """Run one perft and return (nodes, elapsed_seconds)."""
+    start = time.perf_counter()
+    if workers:
+        nodes = perft_parallel(board, state, depth, workers, use_hash)
+    else:
+        nodes = perft(board, state, depth, {} if use_hash else None)
+    return nodes, time.perf_counter() - start
+
+
+def run_suite(depth=None, use_hash=False, workers=None):
+    """
+    Run the standard suite, printing nodes, time and NPS per position.
+    depth=None uses the deepest depth with a count up to ~10k nodes.
+    Returns True if every count matches its reference value.
+    """
+    all_ok = True
+    total_nodes = 0
+    total_time = 0.0
+    for name, fen, expected in PERFT_SUITE:
+        d = depth
+        if d is None:
+            d = max(i + 1 for i, n in enumerate(expected) if n <= 10000)
+        board, state = fen_to_board(fen)
+        nodes, elapsed = run_perft(board, state, d, use_hash, workers)
+        ok = d <= len(expected) and nodes == expected[d - 1]
+        all_ok = all_ok and ok
+        total_nodes += nodes
+        total_time += elapsed
+        nps = int(nodes / elapsed) if elapsed > 0 else 0
+        print(f"{name:<10} depth {d}  nodes {nodes:>10}  time {elapsed:8.3f}s  "
+              f"nps {nps:>8}  {'ok' if ok else 'FAIL'}")
+    nps = int(total_nodes / total_time) if total_time > 0 else 0
+    print(f"total nodes {total_nodes}  time {total_time:.3f}s  nps {nps}")
+    return all_ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Move generation perft and divide")
+    parser.add_argument('--fen', help="position to test (default: run the standard suite)")
+    parser.add_argument('--depth', type=int, help="search depth")
+    parser.add_argument('--divide', action='store_true', help="print per-root-move counts")
+    parser.add_argument('--hash', action='store_true', help="use a perft hash table")
+    parser.add_argument('--workers', type=int, default=0, help="process pool size (0 = serial)")
+    args = parser.parse_args()
+
+    if args.fen is None and not args.divide:
+        raise SystemExit(0 if run_suite(args.depth, args.hash, args.workers) else 1)
+
+    board, state = fen_to_board(args.fen or START_FEN)
+    depth = args.depth or 3
+    if args.divide:
+        start = time.perf_counter()
+        counts = divide(board, state, depth, {} if args.hash else None, args.workers or None)
+        elapsed = time.perf_counter() - start
+        for uci in sorted(counts):
+            print(f"{uci}: {counts[uci]}")
+        nodes = sum(counts.values())
+    else:
+        nodes, elapsed = run_perft(board, state, depth, args.hash, args.workers)
+    nps = int(nodes / elapsed) if elapsed > 0 else 0
+    print(f"\nNodes searched: {nodes}  time {elapsed:.3f}s  nps {nps}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,305 @@
+"""
+Polyglot opening book support.
+
+The reader memory-maps a Polyglot .bin file and binary-searches it on the
+Polyglot Zobrist key, so a book probe costs microseconds instead of a full
+search. The builder turns a PGN collection, or the engine's own analyses
+(the JSON lines written by engine_move with search stats enabled), into a
+book file.
+
+Usage:
+    python polyglot.py build games.pgn -o book.bin [--plies 20]
+    python polyglot.py build --analysis stats.jsonl -o book.bin
+    python polyglot.py probe book.bin [--fen "<fen>"]
+"""
+import argparse
+import json
+import mmap
+import random
+import re
+import struct
+
+from move_generation import generate_all_moves, is_legal
+from move_application import apply_move
+from polyglot_random import POLYGLOT_RANDOM_ARRAY
+
+START_FEN = 'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1'
+
+ENTRY = struct.Struct('>QHHI')  # key, move, weight, learn (16 bytes, big-endian)
+
+# Polyglot piece kinds: black pawn 0, white pawn 1, ..., black king 10, white king 11
+PIECE_KIND = {'p': 0, 'P': 1, 'n': 2, 'N': 3, 'b': 4, 'B': 5,
+              'r': 6, 'R': 7, 'q': 8, 'Q': 9, 'k': 10, 'K': 11}
+CASTLE_OFFSET = 768
+EP_OFFSET = 772
+TURN_OFFSET = 780
+
+PROMOTION_CODES = {'n': 1, 'b': 2, 'r': 3, 'q': 4}
+PROMOTION_PIECES = {code: piece for piece, code in PROMOTION_CODES.items()}
+
+MAX_WEIGHT = 0xFFFF
+
+
+def polyglot_key(board, state):
+    """Compute the 64-bit Polyglot Zobrist key of a position."""
+    key = 0
+    for r in range(8):
+        row = board[r]
+        for c in range(8):
+            piece = row[c]
+            if piece != '.':
+                key ^= POLYGLOT_RANDOM_ARRAY[64 * PIECE_KIND[piece] + 8 * (7 - r) + c]
+    cr = state.get('castling_rights', {})
+    for i, right in enumerate('KQkq'):
+        if cr.get(right, False):
+            key ^= POLYGLOT_RANDOM_ARRAY[CASTLE_OFFSET + i]
+    ep = state.get('en_passant')
+    if ep is not None:
+        # Only hashed when a pawn of the side to move could capture en passant
+        er, ec = ep
+        white = state['side_to_move'] == 'white'
+        pawn, pawn_row = ('P', er + 1) if white else ('p', er - 1)
+        if any(0 <= ec + dc < 8 and board[pawn_row][ec + dc] == pawn for dc in (-1, 1)):
+            key ^= POLYGLOT_RANDOM_ARRAY[EP_OFFSET + ec]
+    if state['side_to_move'] == 'white':
+        key ^= POLYGLOT_RANDOM_ARRAY[TURN_OFFSET]
+    return key
+
+
+def encode_move(board, move):
+    """Encode an engine move as a Polyglot 16-bit move (castling as king takes rook)."""
+    (fr, fc), (tr, tc) = move[0], move[1]
+    if board[fr][fc] in 'Kk' and abs(tc - fc) == 2:
+        tc = 7 if tc == 6 else 0
+    promo = PROMOTION_CODES[move[2].lower()] if len(move) == 3 else 0
+    return (promo << 12) | ((7 - fr) << 9) | (fc << 6) | ((7 - tr) << 3) | tc
+
+
+def decode_move(board, state, raw, pseudo_moves=None):
+    """
+    Decode a Polyglot move into the matching legal engine move, or None.
+    Pass pseudo_moves (generate_all_moves output) when decoding several
+    moves for the same position.
+    """
+    tc, tr = raw & 7, 7 - ((raw >> 3) & 7)
+    fc, fr = (raw >> 6) & 7, 7 - ((raw >> 9) & 7)
+    promo = (raw >> 12) & 7
+    piece = board[fr][fc]
+    if piece in 'Kk' and fr == tr and fc == 4 and tc in (0, 7):
+        tc = 6 if tc == 7 else 2
+    if promo:
+        promo_piece = PROMOTION_PIECES[promo]
+        move = ((fr, fc), (tr, tc), promo_piece.upper() if piece == 'P' else promo_piece)
+    else:
+        move = ((fr, fc), (tr, tc))
+    if pseudo_moves is None:
+        pseudo_moves = generate_all_moves(board, state)
+    return move if move in pseudo_moves and is_legal(board, state, move) else None
+
+
+# ---------- Reader ----------
+
+def open_book(path):
+    """Open and memory-map a Polyglot book. Returns a book handle (dict)."""
+    f = open(path, 'rb')
+    try:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except ValueError:  # empty file cannot be mapped
+        mm = b''
+    return {'file': f, 'mm': mm, 'count': len(mm) // ENTRY.size}
+
+
+def close_book(book):
+    if isinstance(book['mm'], mmap.mmap):
+        book['mm'].close()
+    book['file'].close()
+
+
+def book_entries(book, key):
+    """Return [(raw_move, weight, learn), ...] for a key via binary search."""
+    mm = book['mm']
+    lo, hi = 0, book['count']
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if ENTRY.unpack_from(mm, mid * ENTRY.size)[0] < key:
+            lo = mid + 1
+        else:
+            hi = mid
+    entries = []
+    i = lo
+    while i < book['count']:
+        entry_key, move, weight, learn = ENTRY.unpack_from(mm, i * ENTRY.size)
+        if entry_key != key:
+            break
+        entries.append((move, weight, learn))
+        i += 1
+    return entries
+
+
+def book_moves(book, board, state):
+    """Return [(engine_move, weight), ...] for the position, legal moves only."""
+    entries = book_entries(book, polyglot_key(board, state))
+    if not entries:
+        return []
+    pseudo_moves = generate_all_moves(board, state)
+    moves = []
+    for raw, weight, _ in entries:
+        move = decode_move(board, state, raw, pseudo_moves)
+        if move is not None:
+            moves.append((move, weight))
+    return moves
+
+
+def book_move(book, board, state, mode='weighted', rng=None):
+    """
+    Pick a book move for the position, or None if it is out of book.
+    mode='weighted' picks randomly in proportion to the weights,
+    mode='best' always plays the highest-weighted move.
+    """
+    moves = [(m, w) for m, w in book_moves(book, board, state) if w > 0]
+    if not moves:
+        return None
+    if mode == 'best':
+        return max(moves, key=lambda mw: mw[1])[0]
+    rng = rng or random
+    pick = rng.randrange(sum(w for _, w in moves))
+    for move, weight in moves:
+        pick -= weight
+        if pick < 0:
+            return move
+    return moves[-1][0]
+
+
+# ---------- Builder ----------
+
+def add_book_move(counts, board, state, move, weight=1):
+    """Accumulate weight for (position, move) in a {(key, raw_move): weight} dict."""
+    key = (polyglot_key(board, state), encode_move(board, move))
+    counts[key] = counts.get(key, 0) + weight
+
+
+def write_book(counts, path):
+    """Write accumulated counts as a sorted Polyglot book, scaling weights to 16 bits."""
+    top = max(counts.values(), default=0)
+    scale = MAX_WEIGHT / top if top > MAX_WEIGHT else 1
+    entries = sorted(((key, move, max(1, int(w * scale))) for (key, move), w in counts.items() if w > 0),
+                     key=lambda e: (e[0], -e[2]))
+    with open(path, 'wb') as f:
+        for key, move, weight in entries:
+            f.write(ENTRY.pack(key, move, weight, 0))
+    return len(entries)
+
+
+_PGN_NOISE = re.compile(r'\{[^}]*\}|;[^\n]*|\$\d+|\d+\.(\.\.)?')
+_RESULTS = {'1-0': 'white', '0-1': 'black', '1/2-1/2': None, '*': None}
+
+
+def read_pgn_games(text):
+    """Yield (result, [san, ...]) for each game in a PGN string."""
+    headers, movetext = {}, []
+
+    def finish():
+        tokens = ' '.join(movetext)
+        # Drop comments, NAGs and move numbers, then nested variations
+        tokens = _PGN_NOISE.sub(' ', tokens)
+        while '(' in tokens:
+            tokens = re.sub(r'\([^()]*\)', ' ', tokens)
+        sans = [t for t in tokens.split() if t not in _RESULTS]
+        return headers.get('Result', '*'), sans
+
+    for line in text.splitlines():
+        line = line.strip()
+        if line.startswith('['):
+            if movetext:
+                yield finish()
+                headers, movetext = {}, []
+            m = re.match(r'\[(\w+)\s+"(.*)"\]', line)
+            if m:
+                headers[m.group(1)] = m.group(2)
+        elif line:
+            movetext.append(line)
+    if movetext:
+        yield finish()
+
+
+def build_from_pgn(paths, max_plies=20, counts=None):
+    """
+    Add the first max_plies of every game to counts. A move scores 2 for
+    the winning side, 1 for a draw and 0 for the losing side.
+    """
+    from main import fen_to_board, san_to_move
+    counts = {} if counts is None else counts
+    for path in paths:
+        with open(path, encoding='utf-8', errors='replace') as f:
+            text = f.read()
+        for result, sans in read_pgn_games(text):
+            winner = _RESULTS.get(result)
+            board, state = fen_to_board(START_FEN)
+            for san in sans[:max_plies]:
+                try:
+                    move = san_to_move(board, state, san)
+                except ValueError:
+                    break
+                side = state['side_to_move']
+                weight = 1 if result == '1/2-1/2' else (2 if side == winner else 0)
+                add_book_move(counts, board, state, move, weight)
+                board, state = apply_move(board, move, state)
+    return counts
+
+
+def build_from_analysis(paths, counts=None):
+    """
+    Add engine analyses to counts. Each line is a JSON object with 'fen' and
+    'move' (UCI string or engine move as nested lists), e.g. the per-move
+    records that engine_move logs when search stats are enabled.
+    """
+    from main import fen_to_board, uci_to_move
+    counts = {} if counts is None else counts
+    for path in paths:
+        with open(path) as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                move = record.get('move')
+                if not move:
+                    continue
+                board, state = fen_to_board(record['fen'])
+                if isinstance(move, str):
+                    move = uci_to_move(board, state, move)
+                else:
+                    move = tuple(tuple(part) if isinstance(part, list) else part for part in move)
+                add_book_move(counts, board, state, move, record.get('weight', 1))
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Polyglot opening book tools")
+    sub = parser.add_subparsers(dest='command', required=True)
+    build = sub.add_parser('build', help="build a book from PGN files and/or analyses")
+    build.add_argument('pgn', nargs='*', help="PGN files")
+    build.add_argument('--analysis', nargs='*', default=[], help="JSON-lines analysis files")
+    build.add_argument('-o', '--output', required=True, help="output .bin file")
+    build.add_argument('--plies', type=int, default=20, help="plies per game to include")
+    probe = sub.add_parser('probe', help="list book moves for a position")
+    probe.add_argument('book')
+    probe.add_argument('--fen', default=START_FEN)
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        counts = build_from_pgn(args.pgn, args.plies)
+        build_from_analysis(args.analysis, counts)
+        print(f"wrote {write_book(counts, args.output)} entries to {args.output}")
+    else:
+        from main import fen_to_board, move_to_uci
+        board, state = fen_to_board(args.fen)
+        book = open_book(args.book)
+        try:
+            for move, weight in book_moves(book, board, state):
+                print(f"{move_to_uci(move)} {weight}")
+        finally:
+            close_book(book)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,239 @@
+"""
+Search tree tracer, for diagnosing move ordering and pruning offline.
+
+start_trace installs traced versions of main.alphabeta_pvs,
+main.quiescence_search and main.apply_move (the search calls all three
+through module globals) and stop_trace puts the originals back, so an
+untraced search runs exactly the code it always did. While tracing, every
+node that completes is appended to a binary file as one fixed-size record,
+written in post-order (children before their parent) through a buffered
+writer:
+
+    flags    node type (TRACE_PV / TRACE_CUT / TRACE_ALL) | TRACE_QUIESCENCE
+    ply      distance from the node the traced search was entered at
+    depth    remaining depth (quiescence nodes: minus their quiescence depth)
+    alpha, beta, score   the window the node was called with and its result
+    move     16-bit code of the move that led to it (0 at the top)
+    index    its position among the parent's searched moves (TRACE_NO_INDEX
+             for a null window re-probe of the same position, e.g. razoring)
+    children number of moves searched
+    cutoff   index of the move that failed high, or -1
+    nodes    size of its subtree, itself included
+
+Files start with a small header and are only ever appended to. read_trace
+yields the records and trace_stats aggregates them: node types, cutoff index
+histograms and first-move cutoff rates per depth, mean subtree size per ply
+and the largest subtrees below the top.
+
+Only one search at a time may be traced (the tracer keeps one node stack).
+
+Usage:
+    python search_trace.py record --fen "<fen>" --depth 4 -o search.trace
+    python search_trace.py stats search.trace --top 10
+"""
+import argparse
+import heapq
+import struct
+
+import main
+from move_generation import encode_move, decode_move
+
+TRACE_MAGIC = b'PYST'
+TRACE_VERSION = 1
+TRACE_HEADER = struct.Struct('<4sB3x')
+TRACE_RECORD = struct.Struct('<BBbfffHHHhI')  # 27 bytes, fields as in the module docstring
+
+TRACE_PV, TRACE_CUT, TRACE_ALL = 0, 1, 2
+TRACE_QUIESCENCE = 4
+TRACE_NO_INDEX = 0xFFFF
+NODE_TYPES = {TRACE_PV: 'pv', TRACE_CUT: 'cut', TRACE_ALL: 'all'}
+
+# Node stack frame slots
+PLY, MOVE, INDEX, CHILDREN, NODES, PENDING_BOARD, PENDING_MOVE, PENDING_SERIAL, ENTERED_SERIAL = range(9)
+
+
+def start_trace(path, buffer_size=1 << 16):
+    """Start appending search nodes to path. Returns the tracer handle for stop_trace."""
+    f = open(path, 'ab')
+    if f.tell() == 0:
+        f.write(TRACE_HEADER.pack(TRACE_MAGIC, TRACE_VERSION))
+    search, quiesce, make = main.alphabeta_pvs, main.quiescence_search, main.apply_move
+    stack = []
+    buffer = bytearray()
+    tracer = {'file': f, 'buffer': buffer, 'records': 0,
+              'originals': (search, quiesce, make)}
+    pack = TRACE_RECORD.pack
+
+    def enter(board):
+        code, index = 0, TRACE_NO_INDEX
+        if stack:
+            parent = stack[-1]
+            if parent[PENDING_BOARD] == id(board):
+                code = parent[PENDING_MOVE]
+                if parent[PENDING_SERIAL] != parent[ENTERED_SERIAL]:  # not a re-search
+                    parent[ENTERED_SERIAL] = parent[PENDING_SERIAL]
+                    parent[CHILDREN] += 1
+                index = parent[CHILDREN] - 1
+        frame = [len(stack), code, index, 0, 1, None, 0, 0, -1]
+        stack.append(frame)
+        return frame
+
+    def leave(frame, kind, depth, alpha, beta, score):
+        stack.pop()
+        if score >= beta:
+            node_type = TRACE_CUT
+        elif score <= alpha:
+            node_type = TRACE_ALL
+        else:
+            node_type = TRACE_PV
+        children = frame[CHILDREN]
+        cutoff = children - 1 if node_type == TRACE_CUT and children else -1
+        buffer.extend(pack(kind | node_type, min(frame[PLY], 255), max(-128, min(depth, 127)),
+                           alpha, beta, score, frame[MOVE], frame[INDEX],
+                           min(children, 0xFFFF), min(cutoff, 0x7FFF), frame[NODES]))
+        tracer['records'] += 1
+        if stack:
+            stack[-1][NODES] += frame[NODES]
+        if len(buffer) >= buffer_size:
+            f.write(buffer)
+            buffer.clear()
+
+    def traced_apply(board, move, state):
+        new_board, new_state = make(board, move, state)
+        if stack:
+            frame = stack[-1]
+            frame[PENDING_BOARD] = id(new_board)
+            frame[PENDING_MOVE] = move if move.__class__ is int else encode_move(board, move)
+            frame[PENDING_SERIAL] += 1
+        return new_board, new_state
+
+    def traced_search(board, state, depth, alpha, beta, maximizing,
+                      generate_moves_fn, apply_move_fn, root_moves=None, ply=0):
+        if depth == 0:  # goes straight to quiescence, which is traced
+            return search(board, state, depth, alpha, beta, maximizing,
+                          generate_moves_fn, apply_move_fn, root_moves, ply)
+        frame = enter(board)
+        try:
+            score, move = search(board, state, depth, alpha, beta, maximizing,
+                                 generate_moves_fn, apply_move_fn, root_moves, ply)
+        except BaseException:
+            del stack[frame[PLY]:]  # aborted nodes have no result to record
+            raise
+        leave(frame, 0, depth, alpha, beta, score)
+        return score, move
+
+    def traced_quiescence(board, state, alpha, beta, side_to_move, depth=0, ply=0):
+        frame = enter(board)
+        try:
+            score = quiesce(board, state, alpha, beta, side_to_move, depth, ply)
+        except BaseException:
+            del stack[frame[PLY]:]
+            raise
+        leave(frame, TRACE_QUIESCENCE, -depth, alpha, beta, score)
+        return score
+
+    main.alphabeta_pvs = traced_search
+    main.quiescence_search = traced_quiescence
+    main.apply_move = traced_apply
+    return tracer
+
+
+def stop_trace(tracer):
+    """Restore the untraced search, flush and close the file. Returns the number of records written."""
+    main.alphabeta_pvs, main.quiescence_search, main.apply_move = tracer['originals']
+    tracer['file'].write(tracer['buffer'])
+    tracer['buffer'].clear()
+    tracer['file'].close()
+    return tracer['records']
+
+
+def read_trace(path):
+    """Yield the records of a trace file as tuples, in TRACE_RECORD field order."""
+    with open(path, 'rb') as f:
+        data = f.read()
+    if len(data) < TRACE_HEADER.size or TRACE_HEADER.unpack_from(data) != (TRACE_MAGIC, TRACE_VERSION):
+        raise ValueError(f"{path} is not a search trace")
+    count = (len(data) - TRACE_HEADER.size) // TRACE_RECORD.size
+    yield from TRACE_RECORD.iter_unpack(data[TRACE_HEADER.size:TRACE_HEADER.size + count * TRACE_RECORD.size])
+
+
+def trace_stats(path, top=10):
+    """Aggregate a trace file (see the module docstring)."""
+    stats = {'nodes': 0, 'qnodes': 0, 'types': {name: 0 for name in NODE_TYPES.values()},
+             'cutoff_index': {}, 'first_move_cutoff_rate': {}, 'mean_subtree_by_ply': {},
+             'largest_subtrees': []}
+    ply_totals = {}
+    largest = []
+    for flags, ply, depth, alpha, beta, score, move, index, children, cutoff, nodes in read_trace(path):
+        stats['nodes'] += 1
+        stats['types'][NODE_TYPES[flags & 3]] += 1
+        if flags & TRACE_QUIESCENCE:
+            stats['qnodes'] += 1
+        elif cutoff >= 0:
+            histogram = stats['cutoff_index'].setdefault(depth, {})
+            histogram[cutoff] = histogram.get(cutoff, 0) + 1
+        total = ply_totals.setdefault(ply, [0, 0])
+        total[0] += nodes
+        total[1] += 1
+        if ply > 0:
+            entry = (nodes, ply, depth, move, score)
+            if len(largest) < top:
+                heapq.heappush(largest, entry)
+            elif entry > largest[0]:
+                heapq.heapreplace(largest, entry)
+    for depth, histogram in stats['cutoff_index'].items():
+        stats['first_move_cutoff_rate'][depth] = histogram.get(0, 0) / sum(histogram.values())
+    stats['mean_subtree_by_ply'] = {ply: total / count for ply, (total, count) in sorted(ply_totals.items())}
+    stats['largest_subtrees'] = [
+        {'nodes': nodes, 'ply': ply, 'depth': depth, 'score': score,
+         'move': main.move_to_uci(decode_move(move)) if move else None}
+        for nodes, ply, depth, move, score in sorted(largest, reverse=True)]
+    return stats
+
+
+def print_stats(stats):
+    print(f"Nodes: {stats['nodes']} ({stats['qnodes']} quiescence)  "
+          + '  '.join(f"{name} {count}" for name, count in stats['types'].items()))
+    print("\nCutoff move index by depth:")
+    for depth in sorted(stats['cutoff_index'], reverse=True):
+        histogram = stats['cutoff_index'][depth]
+        counts = ' '.join(f"{index}:{histogram[index]}" for index in sorted(histogram)[:8])
+        more = sum(count for index, count in histogram.items() if index >= 8)
+        print(f"  depth {depth:>2}  first-move {stats['first_move_cutoff_rate'][depth]:6.1%}  "
+              f"{counts}" + (f" 8+:{more}" if more else ''))
+    print("\nMean subtree size by ply:")
+    for ply, size in stats['mean_subtree_by_ply'].items():
+        print(f"  ply {ply:>2}  {size:10.1f}")
+    print("\nLargest subtrees:")
+    for entry in stats['largest_subtrees']:
+        print(f"  {entry['nodes']:>8} nodes  ply {entry['ply']}  depth {entry['depth']}  "
+              f"move {entry['move']}  score {entry['score']:g}")
+
+
+def cli():
+    parser = argparse.ArgumentParser(description="Record and analyse search trees")
+    commands = parser.add_subparsers(dest='command', required=True)
+    record = commands.add_parser('record', help="trace a fixed-depth search")
+    record.add_argument('--fen', default='rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1')
+    record.add_argument('--depth', type=int, default=3)
+    record.add_argument('-o', '--output', default='search.trace')
+    stats = commands.add_parser('stats', help="aggregate a trace file")
+    stats.add_argument('path')
+    stats.add_argument('--top', type=int, default=10, help="number of largest subtrees to list")
+    args = parser.parse_args()
+
+    if args.command == 'record':
+        board, state = main.fen_to_board(args.fen)
+        main.reset_search_state()
+        tracer = start_trace(args.output)
+        try:
+            main.iterative_deepening_pvs(board, state, max_time=float('inf'), max_depth=args.depth)
+        finally:
+            count = stop_trace(tracer)
+        print(f"Wrote {count} nodes to {args.output}")
+    else:
+        print_stats(trace_stats(args.path, args.top))
+
+
+if __name__ == '__main__':
+    cli()
@@ -0,0 +1,421 @@
+"""
+Asyncio game server: many concurrent human-vs-engine games over a local
+TCP line protocol (try it with `nc 127.0.0.1 8765`).
+
+Each connection plays one game at a time. Commands:
+    new [white|black] [budget <seconds>]   start a game playing that side
+    move <san|uci>                         play a move; the engine answers
+    go                                     ask the engine to move (e.g. after 'error busy')
+    fen                                    the current position
+    metrics                                server metrics as JSON
+    quit
+Replies are single lines: "ok game <id>", "engine <uci> <san>",
+"result <1-0|0-1|1/2-1/2|*> <reason>", "fen <fen>", "metrics {...}" and
+"error <message>". A game whose engine move fails in the worker ends as
+"result * abandoned".
+
+Engine moves run in one shared, bounded ProcessPoolExecutor. Requests wait
+in a single FIFO queue that one dispatcher per worker drains; a game never
+has more than one request in flight, so the queue serves the waiting games
+round-robin. Every game has its own thinking-time budget: an engine move
+gets min(movetime, remaining / MOVES_LEFT) and only the time actually spent
+thinking is charged, not the time spent queued. Queue depth, busy workers
+and queue-wait / think-time percentiles are reported by 'metrics'.
+
+Usage:
+    python server.py [--port 8765] [--workers N] [--movetime 1.0] [--budget 300]
+    python server.py loadtest [--clients 200] [--moves 3] [--movetime 0.05]
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import re
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import main
+from main import (fen_to_board, board_to_fen, apply_move, generate_legal_moves, game_result,
+                  san_to_move, uci_to_move, move_to_uci, move_to_san)
+
+START_FEN = 'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1'
+
+DEFAULT_PORT = 8765
+DEFAULT_MOVE_TIME = 1.0   # seconds an engine move may take at most
+DEFAULT_BUDGET = 300.0    # engine thinking time per game, in seconds
+MOVES_LEFT = 30           # a move may use at most budget_left / MOVES_LEFT
+MIN_MOVE_TIME = 0.01
+MAX_PENDING = 1024        # engine requests beyond this are refused with 'error busy'
+LATENCY_SAMPLES = 1000    # recent samples kept for the percentiles
+
+UCI_MOVE = re.compile(r'^[a-h][1-8][a-h][1-8][qrbn]?$')
+COMMANDS = ('new', 'move', 'go', 'fen', 'metrics', 'quit')
+
+
+def _warm_up():
+    """Runs once per worker so process start-up is not charged to a game."""
+    return os.getpid()
+
+
+def think(board, state, max_time):
+    """Worker-process entry point: the engine's move and the seconds it took."""
+    start = time.perf_counter()
+    move = main.engine_move(board, state, max_time)
+    return move, time.perf_counter() - start
+
+
+def parse_budget(args):
+    """The seconds after 'budget' in a 'new' command's arguments, or None without one."""
+    if 'budget' not in args:
+        return None
+    try:
+        budget = float(args[args.index('budget') + 1])
+    except (IndexError, ValueError):
+        raise ValueError("bad budget") from None
+    if not 0 < budget < float('inf'):
+        raise ValueError("bad budget")
+    return budget
+
+
+def parse_move(board, state, text):
+    """A move typed by the client, in UCI or SAN."""
+    if UCI_MOVE.match(text):
+        try:
+            return uci_to_move(board, state, text)
+        except ValueError:
+            pass
+    return san_to_move(board, state, text)
+
+
+# ---------- Server state ----------
+
+def new_server(workers=None, move_time=DEFAULT_MOVE_TIME, budget=DEFAULT_BUDGET):
+    """Create the server state; start_server begins accepting connections."""
+    workers = workers or os.cpu_count() or 1
+    return {
+        'workers': workers,
+        # 'spawn': forked workers would inherit (and keep open) client sockets
+        'executor': ProcessPoolExecutor(max_workers=workers,
+                                        mp_context=multiprocessing.get_context('spawn')),
+        'jobs': None,
+        'dispatchers': [],
+        'tcp': None,
+        'move_time': move_time,
+        'budget': budget,
+        'games': {},
+        'next_id': 1,
+        'metrics': {
+            'games_started': 0, 'games_finished': 0, 'engine_moves': 0, 'refused': 0,
+            'engine_errors': 0, 'busy_workers': 0,
+            'wait_ms': deque(maxlen=LATENCY_SAMPLES),
+            'think_ms': deque(maxlen=LATENCY_SAMPLES),
+        },
+    }
+
+
+def new_game(server, side='white', budget=None):
+    board, state = fen_to_board(START_FEN)
+    game = {
+        'id': server['next_id'],
+        'board': board,
+        'state': state,
+        'human': side,
+        'clock': server['budget'] if budget is None else budget,
+        'result': None,
+        'thinking': False,
+    }
+    server['next_id'] += 1
+    server['games'][game['id']] = game
+    server['metrics']['games_started'] += 1
+    return game
+
+
+def end_game(server, game, result):
+    game['result'] = result
+    if server['games'].pop(game['id'], None) is not None:
+        server['metrics']['games_finished'] += 1
+
+
+def _percentiles(samples):
+    ordered = sorted(samples)
+    if not ordered:
+        return {'p50': 0.0, 'p95': 0.0, 'max': 0.0}
+    pick = lambda q: round(ordered[int(q * (len(ordered) - 1))], 1)
+    return {'p50': pick(0.5), 'p95': pick(0.95), 'max': round(ordered[-1], 1)}
+
+
+def metrics_snapshot(server):
+    """Counters, queue depth and latency percentiles (milliseconds) as a dict."""
+    m = server['metrics']
+    return {
+        'games_active': len(server['games']),
+        'games_started': m['games_started'],
+        'games_finished': m['games_finished'],
+        'engine_moves': m['engine_moves'],
+        'refused': m['refused'],
+        'engine_errors': m['engine_errors'],
+        'queue_depth': server['jobs'].qsize() if server['jobs'] is not None else 0,
+        'busy_workers': m['busy_workers'],
+        'workers': server['workers'],
+        'wait_ms': _percentiles(m['wait_ms']),
+        'think_ms': _percentiles(m['think_ms']),
+    }
+
+
+# ---------- Engine scheduling ----------
+
+async def _dispatch(server):
+    """Feed queued engine requests to the pool, one at a time per dispatcher."""
+    loop = asyncio.get_running_loop()
+    metrics = server['metrics']
+    while True:
+        board, state, max_time, queued_at, future = await server['jobs'].get()
+        metrics['wait_ms'].append((time.perf_counter() - queued_at) * 1000)
+        metrics['busy_workers'] += 1
+        try:
+            result = await loop.run_in_executor(server['executor'], think, board, state, max_time)
+        except Exception as e:
+            if not future.done():
+                future.set_exception(e)
+        else:
+            if not future.done():
+                future.set_result(result)
+        finally:
+            metrics['busy_workers'] -= 1
+            server['jobs'].task_done()
+
+
+async def engine_reply(server, game):
+    """
+    Queue the game for an engine move, wait for it and play it. Returns the
+    move, or None when the queue is full.
+    """
+    max_time = max(MIN_MOVE_TIME, min(server['move_time'], game['clock'] / MOVES_LEFT))
+    future = asyncio.get_running_loop().create_future()
+    try:
+        server['jobs'].put_nowait((game['board'], game['state'], max_time, time.perf_counter(), future))
+    except asyncio.QueueFull:
+        server['metrics']['refused'] += 1
+        return None
+    game['thinking'] = True
+    try:
+        move, elapsed = await future
+    finally:
+        game['thinking'] = False
+    game['clock'] -= elapsed
+    server['metrics']['think_ms'].append(elapsed * 1000)
+    server['metrics']['engine_moves'] += 1
+    return move
+
+
+# ---------- Connections ----------
+
+async def handle_client(server, reader, writer):
+    game = None
+
+    async def send(line):
+        writer.write((line + '\n').encode())
+        await writer.drain()
+
+    async def engine_turn():
+        try:
+            move = await engine_reply(server, game)
+        except Exception:
+            server['metrics']['engine_errors'] += 1
+            end_game(server, game, ('*', 'abandoned'))
+            await send("result * abandoned")
+            return
+        if move is None:
+            await send("error busy")
+            return
+        san = move_to_san(game['board'], game['state'], move)
+        game['board'], game['state'] = apply_move(game['board'], move, game['state'])
+        await send(f"engine {move_to_uci(move)} {san}")
+        await check_over()
+
+    async def check_over():
+        result = game_result(game['board'], game['state'])
+        if result is None and game['clock'] <= 0:
+            result = ('1-0' if game['human'] == 'white' else '0-1'), 'time'
+        if result is not None:
+            end_game(server, game, result)
+            await send(f"result {result[0]} {result[1]}")
+
+    try:
+        while True:
+            raw = await reader.readline()
+            if not raw:
+                break
+            tokens = raw.decode(errors='replace').split()
+            if not tokens:
+                continue
+            cmd, args = tokens[0].lower(), tokens[1:]
+            if cmd == 'quit':
+                break
+            if cmd not in COMMANDS:
+                await send(f"error unknown command {cmd}")
+            elif cmd == 'metrics':
+                await send("metrics " + json.dumps(metrics_snapshot(server)))
+            elif cmd == 'new':
+                try:
+                    budget = parse_budget(args)
+                except ValueError as e:
+                    await send(f"error {e}")
+                    continue
+                if game is not None and game['result'] is None:
+                    end_game(server, game, ('*', 'abandoned'))
+                side = 'black' if 'black' in args else 'white'
+                game = new_game(server, side, budget)
+                await send(f"ok game {game['id']}")
+                if side == 'black':
+                    await engine_turn()
+            elif game is None or game['result'] is not None:
+                await send("error no game in progress")
+            elif cmd == 'fen':
+                await send("fen " + board_to_fen(game['board'], game['state']))
+            elif cmd == 'go':
+                if game['state']['side_to_move'] == game['human']:
+                    await send("error your move")
+                else:
+                    await engine_turn()
+            elif cmd == 'move':
+                if game['state']['side_to_move'] != game['human']:
+                    await send("error not your move")
+                    continue
+                try:
+                    move = parse_move(game['board'], game['state'], ' '.join(args))
+                except ValueError as e:
+                    await send(f"error {e}")
+                    continue
+                game['board'], game['state'] = apply_move(game['board'], move, game['state'])
+                await check_over()
+                if game['result'] is None:
+                    await engine_turn()
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        if game is not None and game['result'] is None:
+            end_game(server, game, ('*', 'disconnected'))
+        writer.close()
+
+
+async def start_server(server, host='127.0.0.1', port=DEFAULT_PORT):
+    """Start the workers, dispatchers and listener; returns the bound port."""
+    loop = asyncio.get_running_loop()
+    await asyncio.gather(*(loop.run_in_executor(server['executor'], _warm_up)
+                           for _ in range(server['workers'])))
+    server['jobs'] = asyncio.Queue(MAX_PENDING)
+    server['dispatchers'] = [asyncio.create_task(_dispatch(server)) for _ in range(server['workers'])]
+    server['tcp'] = await asyncio.start_server(lambda r, w: handle_client(server, r, w),
+                                               host, port, backlog=1024)
+    return server['tcp'].sockets[0].getsockname()[1]
+
+
+async def stop_server(server):
+    server['tcp'].close()
+    await server['tcp'].wait_closed()
+    for task in server['dispatchers']:
+        task.cancel()
+    await asyncio.gather(*server['dispatchers'], return_exceptions=True)
+    server['executor'].shutdown(wait=True, cancel_futures=True)
+
+
+async def serve(host='127.0.0.1', port=DEFAULT_PORT, workers=None,
+                move_time=DEFAULT_MOVE_TIME, budget=DEFAULT_BUDGET):
+    server = new_server(workers, move_time, budget)
+    port = await start_server(server, host, port)
+    print(f"listening on {host}:{port} with {server['workers']} engine workers")
+    try:
+        await server['tcp'].serve_forever()
+    finally:
+        await stop_server(server)
+
+
+# ---------- Load test ----------
+
+async def _simulated_client(port, moves, rng, latencies):
+    """Play random legal moves against the server and time every engine reply."""
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+
+    async def ask(line):
+        writer.write((line + '\n').encode())
+        await writer.drain()
+        return (await reader.readline()).decode().split()
+
+    board, state = fen_to_board(START_FEN)
+    await ask('new white')
+    for _ in range(moves):
+        move = rng.choice(generate_legal_moves(board, state))
+        board, state = apply_move(board, move, state)
+        start = time.perf_counter()
+        reply = await ask('move ' + move_to_uci(move))
+        while reply[:2] == ['error', 'busy']:
+            await asyncio.sleep(0.05)
+            reply = await ask('go')
+        if reply[0] != 'engine':
+            break  # our move ended the game
+        latencies.append((time.perf_counter() - start) * 1000)
+        board, state = apply_move(board, uci_to_move(board, state, reply[1]), state)
+        if game_result(board, state) is not None:
+            break
+    writer.write(b'quit\n')
+    await writer.drain()
+    await reader.read()  # the server closes the connection once the game is released
+    writer.close()
+
+
+async def load_test(clients=200, moves=3, workers=None, move_time=0.05, seed=0):
+    """
+    Run a server in this process and play `clients` simultaneous games of
+    `moves` random moves each against it. Returns client-side reply latency
+    percentiles (ms) and the server's final metrics.
+    """
+    server = new_server(workers, move_time)
+    port = await start_server(server, port=0)
+    latencies = []
+    start = time.perf_counter()
+    try:
+        await asyncio.gather(*(_simulated_client(port, moves, random.Random(seed + i), latencies)
+                               for i in range(clients)))
+        elapsed = time.perf_counter() - start
+        snapshot = metrics_snapshot(server)
+    finally:
+        await stop_server(server)
+    return {
+        'clients': clients,
+        'engine_moves': len(latencies),
+        'elapsed': round(elapsed, 2),
+        'moves_per_second': round(len(latencies) / elapsed, 1) if elapsed > 0 else 0.0,
+        'latency_ms': _percentiles(latencies),
+        'server': snapshot,
+    }
+
+
+def cli():
+    parser = argparse.ArgumentParser(description="Asyncio multi-game chess server")
+    parser.add_argument('command', nargs='?', default='serve', choices=['serve', 'loadtest'])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--workers', type=int, help="engine processes (default: CPU count)")
+    parser.add_argument('--movetime', type=float, help="max seconds per engine move")
+    parser.add_argument('--budget', type=float, default=DEFAULT_BUDGET, help="engine seconds per game")
+    parser.add_argument('--clients', type=int, default=200, help="loadtest: simulated clients")
+    parser.add_argument('--moves', type=int, default=3, help="loadtest: moves per client")
+    args = parser.parse_args()
+    if args.command == 'loadtest':
+        report = asyncio.run(load_test(args.clients, args.moves, args.workers,
+                                       args.movetime or 0.05))
+        print(json.dumps(report, indent=1))
+    else:
+        try:
+            asyncio.run(serve(args.host, args.port, args.workers,
+                              args.movetime or DEFAULT_MOVE_TIME, args.budget))
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == '__main__':
+    cli()
@@ -0,0 +1,625 @@
+"""
+Endgame tablebases generated locally by retrograde analysis.
+
+Supported endings: KQvK, KRvK, KPvK and KBNvK (the strong side may be either
+colour when probing). Each table stores one byte per position: the distance
+to mate in plies for the side to move, or draw. Positions are addressed by
+a direct index over the piece squares, with the board's 8-fold symmetry
+(left-right only for pawn endings) folded out, and the files are
+memory-mapped for probing.
+
+Generation scans every position once in a process pool (legal move counts
+and values of captures/promotions that leave the table), then resolves
+wins and losses backwards from the mates, one ply at a time.
+
+Usage:
+    python tablebase.py generate KQvK KRvK KPvK [--dir tablebases] [--workers 4]
+    python tablebase.py probe --fen "<fen>" [--dir tablebases]
+
+KBNvK has about 5 million positions and takes a while in pure Python.
+En passant cannot occur in these endings and castling rights are not
+supported (positions with castling rights are never probed).
+"""
+import argparse
+import mmap
+import os
+import struct
+from array import array
+
+# Table name -> piece list (white/strong side uppercase, white king first)
+TABLES = {
+    'KQvK': 'KQk',
+    'KRvK': 'KRk',
+    'KPvK': 'KPk',
+    'KBNvK': 'KBNk',
+}
+GENERATION_ORDER = ['KQvK', 'KRvK', 'KPvK', 'KBNvK']
+INSUFFICIENT = {'KvK', 'KBvK', 'KNvK'}
+
+DEFAULT_DIR = 'tablebases'
+FILE_SUFFIX = '.pytb'
+HEADER = struct.Struct('<4sB3x8s')  # magic, version, table name
+MAGIC = b'PYTB'
+VERSION = 1
+
+# Value bytes, from the side to move's point of view
+DRAW = 0
+LOSS_BASE = 128    # 128 + n: side to move is mated in n plies
+INVALID = 255      # 1..127: side to move mates in n plies
+
+PIECE_ORDER = 'KQRBNP'
+
+CHUNK_SIZE = 4096
+
+
+# ---------- Square geometry ----------
+
+def _on_board(r, c):
+    return 0 <= r < 8 and 0 <= c < 8
+
+def _step_targets(deltas):
+    return [frozenset((r + dr) * 8 + c + dc for dr, dc in deltas if _on_board(r + dr, c + dc))
+            for r in range(8) for c in range(8)]
+
+KING_TARGETS = _step_targets([(-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)])
+KNIGHT_TARGETS = _step_targets([(-2, -1), (-2, 1), (-1, -2), (-1, 2), (1, -2), (1, 2), (2, -1), (2, 1)])
+# Squares attacked by a white / black pawn standing on each square
+PAWN_ATTACKS = {
+    'white': _step_targets([(-1, -1), (-1, 1)]),
+    'black': _step_targets([(1, -1), (1, 1)]),
+}
+
+ORTHOGONAL = [(-1, 0), (1, 0), (0, -1), (0, 1)]
+DIAGONAL = [(-1, -1), (-1, 1), (1, -1), (1, 1)]
+
+def _rays(directions):
+    rays = []
+    for r in range(8):
+        for c in range(8):
+            square_rays = []
+            for dr, dc in directions:
+                ray, nr, nc = [], r + dr, c + dc
+                while _on_board(nr, nc):
+                    ray.append(nr * 8 + nc)
+                    nr += dr
+                    nc += dc
+                square_rays.append(ray)
+            rays.append(square_rays)
+    return rays
+
+ORTHOGONAL_RAYS = _rays(ORTHOGONAL)
+DIAGONAL_RAYS = _rays(DIAGONAL)
+SLIDER_RAYS = {
+    'R': ORTHOGONAL_RAYS,
+    'B': DIAGONAL_RAYS,
+    'Q': [o + d for o, d in zip(ORTHOGONAL_RAYS, DIAGONAL_RAYS)],
+}
+
+# LINE[a][b] = (kind, squares strictly between) for slider lines, else None
+LINE = [[None] * 64 for _ in range(64)]
+for _sq in range(64):
+    for _kind, _rays_of in (('R', ORTHOGONAL_RAYS), ('B', DIAGONAL_RAYS)):
+        for _ray in _rays_of[_sq]:
+            for _i, _target in enumerate(_ray):
+                LINE[_sq][_target] = (_kind, tuple(_ray[:_i]))
+
+# The 8 board symmetries as square permutations
+def _transform(fn):
+    return [fn(sq // 8, sq % 8)[0] * 8 + fn(sq // 8, sq % 8)[1] for sq in range(64)]
+
+SYMMETRIES = [
+    _transform(lambda r, c: (r, c)),
+    _transform(lambda r, c: (r, 7 - c)),
+    _transform(lambda r, c: (7 - r, c)),
+    _transform(lambda r, c: (7 - r, 7 - c)),
+    _transform(lambda r, c: (c, r)),
+    _transform(lambda r, c: (c, 7 - r)),
+    _transform(lambda r, c: (7 - c, r)),
+    _transform(lambda r, c: (7 - c, 7 - r)),
+]
+# White king region after folding: a1-d1-d4 triangle, or files a-d with pawns
+TRIANGLE = [r * 8 + c for r in range(4, 8) for c in range(4) if 7 - r <= c]
+HALF_BOARD = [r * 8 + c for r in range(8) for c in range(4)]
+
+
+# ---------- Indexing ----------
+
+def table_info(name):
+    """Static description of a table: pieces, king slots and size."""
+    pieces = TABLES[name]
+    has_pawns = 'P' in pieces.upper()
+    slots = HALF_BOARD if has_pawns else TRIANGLE
+    return {
+        'name': name,
+        'pieces': pieces,
+        'has_pawns': has_pawns,
+        'symmetries': SYMMETRIES[:2] if has_pawns else SYMMETRIES,
+        'slot_of': {sq: i for i, sq in enumerate(slots)},
+        'slots': slots,
+        'size': len(slots) * 64 ** (len(pieces) - 1) * 2,
+    }
+
+def encode_index(info, squares, stm):
+    """Canonical index of a placement (squares in table piece order), stm 0/1."""
+    best = None
+    slot_of = info['slot_of']
+    for perm in info['symmetries']:
+        king = perm[squares[0]]
+        if king not in slot_of:
+            continue
+        idx = slot_of[king]
+        for sq in squares[1:]:
+            idx = idx * 64 + perm[sq]
+        if best is None or idx < best:
+            best = idx
+    return best * 2 + stm
+
+def decode_index(info, idx):
+    stm = idx & 1
+    idx >>= 1
+    rest = []
+    for _ in range(len(info['pieces']) - 1):
+        rest.append(idx % 64)
+        idx //= 64
+    return [info['slots'][idx]] + rest[::-1], stm
+
+
+# ---------- Move generation on piece lists ----------
+
+def _color(piece):
+    return 'white' if piece.isupper() else 'black'
+
+def _attacked(sq, by_color, pieces, squares, occupied):
+    """Is sq attacked by by_color? Entries with square None are captured."""
+    for piece, s in zip(pieces, squares):
+        if s is None or _color(piece) != by_color:
+            continue
+        kind = piece.upper()
+        if kind == 'K':
+            if sq in KING_TARGETS[s]:
+                return True
+        elif kind == 'N':
+            if sq in KNIGHT_TARGETS[s]:
+                return True
+        elif kind == 'P':
+            if sq in PAWN_ATTACKS[by_color][s]:
+                return True
+        else:
+            line = LINE[s][sq]
+            if line is not None and (kind == 'Q' or kind == line[0]):
+                if not any(b in occupied for b in line[1]):
+                    return True
+    return False
+
+def _king_attacked(color, pieces, squares):
+    king = 'K' if color == 'white' else 'k'
+    occupied = {s for s in squares if s is not None}
+    return _attacked(squares[pieces.index(king)], 'black' if color == 'white' else 'white',
+                     pieces, squares, occupied)
+
+def _pseudo_moves(pieces, squares, color):
+    """Yield (piece_index, to_square, promotion) for color's pieces."""
+    occupant = {s: i for i, s in enumerate(squares)}
+    for i, (piece, s) in enumerate(zip(pieces, squares)):
+        if _color(piece) != color:
+            continue
+        kind = piece.upper()
+        if kind in 'KN':
+            for t in (KING_TARGETS if kind == 'K' else KNIGHT_TARGETS)[s]:
+                j = occupant.get(t)
+                if j is None or (_color(pieces[j]) != color and pieces[j].upper() != 'K'):
+                    yield i, t, None
+        elif kind == 'P':
+            forward = -8 if color == 'white' else 8
+            last_row = 0 if color == 'white' else 7
+            start_row = 6 if color == 'white' else 1
+            targets = []
+            if s + forward not in occupant:
+                targets.append(s + forward)
+                if s // 8 == start_row and s + 2 * forward not in occupant:
+                    targets.append(s + 2 * forward)
+            for t in PAWN_ATTACKS[color][s]:
+                j = occupant.get(t)
+                if j is not None and _color(pieces[j]) != color and pieces[j].upper() != 'K':
+                    targets.append(t)
+            for t in targets:
+                if t // 8 == last_row:
+                    for promo in 'QRBN':
+                        yield i, t, promo if color == 'white' else promo.lower()
+                else:
+                    yield i, t, None
+        else:
+            for ray in SLIDER_RAYS[kind][s]:
+                for t in ray:
+                    j = occupant.get(t)
+                    if j is None:
+                        yield i, t, None
+                        continue
+                    if _color(pieces[j]) != color and pieces[j].upper() != 'K':
+                        yield i, t, None
+                    break
+
+def _valid_placement(info, squares, stm):
+    pieces = info['pieces']
+    if len(set(squares)) != len(squares):
+        return False
+    for piece, s in zip(pieces, squares):
+        if piece in 'Pp' and s // 8 in (0, 7):
+            return False
+    not_to_move = 'black' if stm == 0 else 'white'
+    return not _king_attacked(not_to_move, pieces, squares)
+
+
+# ---------- Values ----------
+
+def material_name(pieces):
+    """Table name for a piece list, e.g. 'KQk' -> 'KQvK'."""
+    white = sorted((p for p in pieces if p.isupper()), key=PIECE_ORDER.index)
+    black = sorted((p.upper() for p in pieces if p.islower()), key=PIECE_ORDER.index)
+    return ''.join(white) + 'v' + ''.join(black)
+
+def _mirror_name(name):
+    white, black = name.split('v')
+    return black + 'v' + white
+
+def _decode_value(byte):
+    """Byte -> signed plies: +n side to move mates in n, -n is mated in n, 0 draw."""
+    if byte == DRAW:
+        return 0
+    if byte >= LOSS_BASE:
+        return -(byte - LOSS_BASE) or -0.5  # mated now: keep the sign distinct from draw
+    return byte
+
+def _lookup(tables, pieces, squares, stm):
+    """
+    Value byte of a placement after a move left the current table.
+    tables maps names to loaded tables; unknown material raises KeyError.
+    """
+    name = material_name(pieces)
+    if name in INSUFFICIENT or _mirror_name(name) in INSUFFICIENT:
+        return DRAW
+    if name not in TABLES:
+        # Strong side is black: swap colours and mirror the board vertically
+        name = _mirror_name(name)
+        pieces = ''.join(p.swapcase() for p in pieces)
+        squares = [(7 - s // 8) * 8 + s % 8 for s in squares]
+        stm ^= 1
+    table = tables[name]
+    order = {p: i for i, p in enumerate(pieces)}
+    ordered = [squares[order[p]] for p in table['info']['pieces']]
+    return table['data'][encode_index(table['info'], ordered, stm)]
+
+
+# ---------- Generation ----------
+
+_worker_tables = {}
+
+def _subtables(directory):
+    for name in GENERATION_ORDER:
+        if name not in _worker_tables:
+            path = os.path.join(directory, name + FILE_SUFFIX)
+            if os.path.exists(path):
+                _worker_tables[name] = open_table(path)
+    return _worker_tables
+
+def _scan_chunk(name, directory, start, stop):
+    """
+    First pass over positions [start, stop). For each position returns:
+    flags (1 invalid, 2 mated, 4 stalemate, 8 has a drawing exit),
+    the number of distinct in-table successors, the fastest win through an
+    exit move (plies, 0 = none) and the slowest loss through one (plies + 1,
+    0 = none).
+    """
+    info = table_info(name)
+    tables = _subtables(directory)
+    pieces = info['pieces']
+    count = stop - start
+    flags = bytearray(count)
+    successors = array('H', bytes(2 * count))
+    exit_win = bytearray(count)
+    exit_loss = bytearray(count)
+    for k in range(count):
+        idx = start + k
+        squares, stm = decode_index(info, idx)
+        if not _valid_placement(info, squares, stm) or encode_index(info, squares, stm) != idx:
+            flags[k] = 1
+            continue
+        color = 'white' if stm == 0 else 'black'
+        children = set()
+        legal = 0
+        win, loss_max, draw_exit = 0, 0, False
+        for i, to, promo in _pseudo_moves(pieces, squares, color):
+            new_squares = list(squares)
+            new_squares[i] = to
+            captured = squares.index(to) if to in squares else None
+            if captured is not None:
+                new_squares[captured] = None
+            if _king_attacked(color, pieces, new_squares):
+                continue
+            legal += 1
+            if captured is None and promo is None:
+                children.add(encode_index(info, new_squares, stm ^ 1))
+                continue
+            # Capture or promotion: the position moves to another table
+            exit_pieces = list(pieces)
+            if promo is not None:
+                exit_pieces[i] = promo
+            keep = [j for j in range(len(pieces)) if new_squares[j] is not None]
+            value = _lookup(tables, ''.join(exit_pieces[j] for j in keep),
+                            [new_squares[j] for j in keep], stm ^ 1)
+            if value == DRAW:
+                draw_exit = True
+            elif value >= LOSS_BASE:
+                plies = value - LOSS_BASE + 1
+                win = plies if not win else min(win, plies)
+            else:
+                loss_max = max(loss_max, value + 1)
+        if legal == 0:
+            flags[k] = 2 if _king_attacked(color, pieces, squares) else 4
+            continue
+        flags[k] = 8 if draw_exit else 0
+        successors[k] = len(children)
+        exit_win[k] = win
+        exit_loss[k] = loss_max
+    return start, bytes(flags), successors.tobytes(), bytes(exit_win), bytes(exit_loss)
+
+def _predecessors(info, squares, stm):
+    """Canonical indices of positions from which one quiet move reaches this one."""
+    pieces = info['pieces']
+    mover = 'black' if stm == 0 else 'white'
+    occupied = set(squares)
+    preds = set()
+    for i, (piece, s) in enumerate(zip(pieces, squares)):
+        if _color(piece) != mover:
+            continue
+        kind = piece.upper()
+        if kind == 'K':
+            origins = [t for t in KING_TARGETS[s] if t not in occupied]
+        elif kind == 'N':
+            origins = [t for t in KNIGHT_TARGETS[s] if t not in occupied]
+        elif kind == 'P':
+            back = 8 if mover == 'white' else -8
+            start_row = 6 if mover == 'white' else 1
+            origins = []
+            t = s + back
+            if 0 <= t < 64 and t not in occupied and t // 8 not in (0, 7):
+                origins.append(t)
+                if t + back < 64 and t + back >= 0 and (t + back) // 8 == start_row and t + back not in occupied:
+                    origins.append(t + back)
+        else:
+            origins = []
+            for ray in SLIDER_RAYS[kind][s]:
+                for t in ray:
+                    if t in occupied:
+                        break
+                    origins.append(t)
+        for t in origins:
+            prev = list(squares)
+            prev[i] = t
+            # In the previous position the mover was on move, so the other
+            # side's king must not have been in check
+            if _king_attacked('white' if mover == 'black' else 'black', pieces, prev):
+                continue
+            preds.add(encode_index(info, prev, stm ^ 1))
+    return preds
+
+def generate_table(name, directory=DEFAULT_DIR, workers=None, verbose=True):
+    """Generate one table (its sub-tables must already exist) and write it."""
+    info = table_info(name)
+    size = info['size']
+    os.makedirs(directory, exist_ok=True)
+    flags = bytearray(size)
+    successors = array('H', bytes(2 * size))
+    exit_win = bytearray(size)
+    exit_loss = bytearray(size)
+    chunks = [(name, directory, start, min(start + CHUNK_SIZE, size))
+              for start in range(0, size, CHUNK_SIZE)]
+    if workers == 1:
+        results = (_scan_chunk(*chunk) for chunk in chunks)
+    else:
+        from concurrent.futures import ProcessPoolExecutor  # slow import, keep it off engine startup
+        pool = ProcessPoolExecutor(max_workers=workers)
+        results = pool.map(_scan_chunk, *zip(*chunks))
+    for start, f, s, w, l in results:
+        stop = start + len(f)
+        flags[start:stop] = f
+        successors[start:stop] = array('H', s)
+        exit_win[start:stop] = w
+        exit_loss[start:stop] = l
+    if workers != 1:
+        pool.shutdown()
+
+    # Retrograde pass: resolve positions in order of distance to mate
+    values = bytearray(size)
+    resolved = bytearray(size)
+    slowest = bytearray(size)  # slowest winning reply seen so far, in plies
+    buckets = {}
+
+    def push(plies, idx, win):
+        buckets.setdefault(plies, []).append((idx, win))
+
+    for idx in range(size):
+        f = flags[idx]
+        if f & 1:
+            values[idx] = INVALID
+            resolved[idx] = 1
+        elif f & 2:
+            push(0, idx, False)
+        elif f & 4:
+            resolved[idx] = 1
+        else:
+            if exit_win[idx]:
+                push(exit_win[idx], idx, True)
+            if exit_loss[idx]:
+                slowest[idx] = exit_loss[idx] - 1
+            if f & 8:
+                successors[idx] += 1  # a drawing exit means this side never has to lose
+            elif successors[idx] == 0 and exit_loss[idx]:
+                push(exit_loss[idx], idx, False)
+
+    plies = 0
+    while buckets:
+        for idx, win in buckets.pop(plies, []):
+            if resolved[idx]:
+                continue
+            resolved[idx] = 1
+            values[idx] = plies if win else LOSS_BASE + plies
+            squares, stm = decode_index(info, idx)
+            for pred in _predecessors(info, squares, stm):
+                if resolved[pred]:
+                    continue
+                if not win:
+                    push(plies + 1, pred, True)
+                else:
+                    successors[pred] -= 1
+                    slowest[pred] = max(slowest[pred], plies)
+                    if successors[pred] == 0:
+                        push(slowest[pred] + 1, pred, False)
+        plies += 1
+        if plies >= LOSS_BASE - 1:
+            raise ValueError(f"{name}: distance to mate does not fit the value byte")
+
+    path = os.path.join(directory, name + FILE_SUFFIX)
+    with open(path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, name.encode()))
+        f.write(values)
+    if verbose:
+        wins = sum(1 for v in values if 0 < v < LOSS_BASE)
+        losses = sum(1 for v in values if LOSS_BASE <= v < INVALID)
+        print(f"{name}: {size} positions, {wins} wins, {losses} losses, "
+              f"longest mate {plies - 1} plies -> {path}")
+    _worker_tables.pop(name, None)
+    return path
+
+
+# ---------- Probing ----------
+
+def open_table(path):
+    """Memory-map a generated table file."""
+    with open(path, 'rb') as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, version, name = HEADER.unpack_from(mm, 0)
+    if magic != MAGIC or version != VERSION:
+        mm.close()
+        raise ValueError(f"{path} is not a tablebase file")
+    name = name.rstrip(b'\0').decode()
+    return {'info': table_info(name), 'mm': mm,
+            'data': memoryview(mm)[HEADER.size:]}
+
+def load_tablebases(directory=DEFAULT_DIR):
+    """Open every table found in directory. Returns {name: table}."""
+    tables = {}
+    if os.path.isdir(directory):
+        for filename in sorted(os.listdir(directory)):
+            if filename.endswith(FILE_SUFFIX):
+                table = open_table(os.path.join(directory, filename))
+                tables[table['info']['name']] = table
+    return tables
+
+def close_tablebases(tables):
+    for table in tables.values():
+        table['data'].release()
+        table['mm'].close()
+    tables.clear()
+
+def probe_dtm(tables, board, state):
+    """
+    Probe the tables for a position. Returns None if there is no table for
+    it or it is illegal (the side not to move is in check, as the
+    pseudo-legal search can reach), else signed plies: +n side to move
+    mates in n, -n side to move is mated in n, 0 draw (and -0.5 when
+    already checkmated).
+    """
+    pieces, squares = [], []
+    for r in range(8):
+        row = board[r]
+        for c in range(8):
+            piece = row[c]
+            if piece != '.':
+                if len(pieces) == 4:
+                    return None
+                pieces.append(piece)
+                squares.append(r * 8 + c)
+    name = material_name(pieces)
+    insufficient = name in INSUFFICIENT or _mirror_name(name) in INSUFFICIENT
+    if not insufficient and name not in tables and _mirror_name(name) not in tables:
+        return None
+    if 'K' not in pieces or 'k' not in pieces:
+        return None
+    not_to_move = 'black' if state['side_to_move'] == 'white' else 'white'
+    if _king_attacked(not_to_move, pieces, squares):
+        return None
+    if insufficient:
+        return 0
+    if any(state.get('castling_rights', {}).values()):
+        return None
+    stm = 0 if state['side_to_move'] == 'white' else 1
+    try:
+        byte = _lookup(tables, ''.join(pieces), squares, stm)
+    except KeyError:
+        return None
+    return None if byte == INVALID else _decode_value(byte)
+
+def tablebase_move(tables, board, state, generate_moves, apply_move):
+    """
+    Best move by the tables: the fastest mate when winning, a drawing move
+    when drawn, the slowest mate when losing. Returns (move, value) or None.
+    """
+    if probe_dtm(tables, board, state) is None:
+        return None
+    best, best_key, best_value = None, None, None
+    for move in generate_moves(board, state):
+        new_board, new_state = apply_move(board, move, state)
+        child = probe_dtm(tables, new_board, new_state)
+        if child is None:
+            continue
+        if child < 0:
+            key = (2, -abs(child))       # opponent is mated: faster is better
+        elif child == 0:
+            key = (1, 0)
+        else:
+            key = (0, child)             # opponent mates: slower is better
+        if best_key is None or key > best_key:
+            best, best_key, best_value = move, key, child
+    if best is None:
+        return None
+    if best_value < 0:
+        return best, int(-best_value) + 1
+    if best_value > 0:
+        return best, -(best_value + 1)
+    return best, 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Endgame tablebase generator and prober")
+    sub = parser.add_subparsers(dest='command', required=True)
+    gen = sub.add_parser('generate', help="generate tables (sub-tables first)")
+    gen.add_argument('tables', nargs='*', default=GENERATION_ORDER[:3],
+                     help=f"tables to build (default: {' '.join(GENERATION_ORDER[:3])})")
+    gen.add_argument('--dir', default=DEFAULT_DIR)
+    gen.add_argument('--workers', type=int, default=None, help="process pool size")
+    probe = sub.add_parser('probe', help="probe a position")
+    probe.add_argument('--fen', required=True)
+    probe.add_argument('--dir', default=DEFAULT_DIR)
+    args = parser.parse_args()
+
+    if args.command == 'generate':
+        for name in sorted(args.tables, key=GENERATION_ORDER.index):
+            generate_table(name, args.dir, args.workers)
+    else:
+        from main import fen_to_board
+        board, state = fen_to_board(args.fen)
+        tables = load_tablebases(args.dir)
+        value = probe_dtm(tables, board, state)
+        if value is None:
+            print("not in tablebases")
+        elif value > 0:
+            print(f"win, mate in {value} plies")
+        elif value < 0:
+            print(f"loss, mated in {int(abs(value))} plies")
+        else:
+            print("draw")
+
+
+if __name__ == '__main__':
+    main()
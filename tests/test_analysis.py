@@ -0,0 +1,151 @@
+import sys
+import os
+import io
+import time
+import asyncio
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import pytest
+
+import main
+import search_trace
+import uci
+from benchmark import BENCH_POSITIONS
+from perft import START_FEN
+
+KIWIPETE = 'r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1'
+FIELDS = {'depth', 'seldepth', 'score', 'move', 'pv', 'nodes', 'nps', 'hashfull', 'time'}
+
+
+@pytest.fixture(autouse=True)
+def fresh_search():
+    main.reset_search_state()
+    yield
+    main.search_stop.clear()
+    main.reset_search_state()
+
+
+def test_yields_every_depth_and_returns_the_best_move():
+    board, state = main.fen_to_board(KIWIPETE)
+    analysis = main.analyse(board, state, {'max_depth': 3})
+    infos = []
+    with pytest.raises(StopIteration) as done:
+        while True:
+            infos.append(next(analysis))
+    assert [info['depth'] for info in infos] == [1, 2, 3]
+    for info in infos:
+        assert FIELDS <= set(info)
+        assert info['pv'][0] == info['move']
+        assert info['depth'] <= info['seldepth'] <= info['depth'] + main.MAX_QUIESCENCE_DEPTH
+        assert 0 <= info['hashfull'] <= 1000
+    assert infos[0]['nodes'] < infos[1]['nodes'] < infos[2]['nodes']
+    assert done.value.value == infos[-1]['move']
+    # Same search as iterative_deepening_pvs on its own
+    main.reset_search_state()
+    assert main.iterative_deepening_pvs(board, state, max_time=float('inf'), max_depth=3) == done.value.value
+    assert main.search_stats['nodes'] == infos[-1]['nodes']
+
+
+def test_seldepth_is_the_deepest_ply_of_each_iteration(tmp_path):
+    path = str(tmp_path / 'bench.trace')
+    board, state = main.fen_to_board(BENCH_POSITIONS[20])  # depth 4 reaches less far than depth 3
+    tracer = search_trace.start_trace(path)
+    try:
+        infos = list(main.analyse(board, state, {'max_depth': 4}))
+    finally:
+        search_trace.stop_trace(tracer)
+    deepest = [0]  # per iteration: post-order, so each one ends at its root record
+    for record in search_trace.read_trace(path):
+        ply = record[1]
+        deepest[-1] = max(deepest[-1], ply)
+        if ply == 0:
+            deepest.append(0)
+    assert [info['seldepth'] for info in infos] == deepest[:-1]
+
+
+def test_closing_stops_the_search_promptly():
+    board, state = main.fen_to_board(START_FEN)
+    analysis = main.analyse(board, state)  # no limits: runs until stopped
+    for info in analysis:
+        if info['depth'] == 2:
+            break
+    start = time.time()
+    analysis.close()
+    assert time.time() - start < 0.5
+    assert not main.search_stop.is_set()
+    nodes = main.search_stats['nodes']
+    time.sleep(0.1)
+    assert main.search_stats['nodes'] == nodes  # nothing is searching any more
+
+
+def test_multipv_lines():
+    board, state = main.fen_to_board(START_FEN)
+    infos = list(main.analyse(board, state, {'max_depth': 2, 'multipv': 3}))
+    assert len(infos) == 2 and len(infos[-1]['lines']) == 3
+    assert infos[-1]['pv'] == infos[-1]['lines'][0][1]
+
+
+def test_async_analysis_and_cancellation():
+    board, state = main.fen_to_board(KIWIPETE)
+
+    async def collect():
+        return [info async for info in main.analyse_async(board, state, {'max_depth': 3})]
+
+    infos = asyncio.run(collect())
+    assert [info['depth'] for info in infos] == [1, 2, 3]
+    assert FIELDS <= set(infos[-1])
+
+    async def cancel_after_first_depth():
+        seen = []
+        async def consume():
+            async for info in main.analyse_async(board, state):
+                seen.append(info['depth'])
+        task = asyncio.create_task(consume())
+        while not seen:
+            await asyncio.sleep(0.01)
+        start = time.time()
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        return time.time() - start
+
+    assert asyncio.run(cancel_after_first_depth()) < 0.5
+    assert not main.search_stop.is_set()
+
+
+def test_async_stop_does_not_block_the_event_loop(monkeypatch):
+    def slow_to_stop(board, state, on_iteration=None, **limits):
+        on_iteration({'depth': 1, 'score': 0, 'move': None, 'nodes': 1, 'seldepth': 1,
+                      'time': 0.0, 'hashfull': 0})
+        main.search_stop.wait()
+        time.sleep(0.3)  # still finishing a node when the stop arrives
+    monkeypatch.setattr(main, 'iterative_deepening_pvs', slow_to_stop)
+    monkeypatch.setattr(main, 'extract_pv', lambda board, state, depth: [])
+    board, state = main.fen_to_board(START_FEN)
+
+    async def close_while_ticking():
+        ticks = 0
+        async def tick():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+        ticker = asyncio.create_task(tick())
+        analysis = main.analyse_async(board, state)
+        await analysis.__anext__()
+        await analysis.aclose()
+        ticker.cancel()
+        return ticks
+
+    assert asyncio.run(close_while_ticking()) >= 10
+    assert not main.search_stop.is_set()
+
+
+def test_uci_info_reports_seldepth():
+    session = uci.new_session(io.StringIO())
+    uci.handle_command(session, 'position startpos')
+    uci.handle_command(session, 'go depth 2')
+    session['worker'].join(timeout=30)
+    info = [line for line in session['out'].getvalue().splitlines() if line.startswith('info depth 2')]
+    assert ' seldepth ' in info[0] and ' hashfull ' in info[0]
@@ -0,0 +1,112 @@
+import sys
+import os
+import random
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import pytest
+
+import main
+import attacks
+from benchmark import BENCH_POSITIONS, bench
+from move_generation import generate_all_moves, generate_legal_moves, is_attacked, is_in_check
+from perft import START_FEN
+
+
+def sq(name):
+    """Square index of an algebraic square name (a8 = 0)."""
+    return (8 - int(name[1])) * 8 + 'abcdefgh'.index(name[0])
+
+
+def with_maps(fen):
+    board, state = main.fen_to_board(fen)
+    return board, attacks.attach(board, state)
+
+
+def test_incremental_maps_match_a_fresh_computation():
+    rng = random.Random(7)
+    for fen in BENCH_POSITIONS[:10]:
+        board, state = with_maps(fen)
+        for _ in range(20):
+            moves = generate_legal_moves(board, state)
+            if not moves:
+                break
+            board, state = main.apply_move(board, rng.choice(moves), state)
+            fresh = attacks.compute_attacks(board)
+            maps = state['attacks']
+            assert (maps.words, maps.sources, maps.kings, maps.sliders, maps.occupied) == \
+                   (fresh.words, fresh.sources, fresh.kings, fresh.sliders, fresh.occupied)
+            for square in range(64):
+                for side in ('white', 'black'):
+                    assert maps.attacked(square, side) == is_attacked(board, square >> 3, square & 7, side)
+
+
+def test_counts_and_piece_types():
+    maps = with_maps(START_FEN)[1]['attacks']
+    assert maps.count(sq('f3'), 'white') == 3
+    assert maps.attacked_by(sq('f3'), 'white', 'P') == 2
+    assert maps.attacked_by(sq('f3'), 'white', 'N') == 1
+    assert maps.cheapest_attacker(sq('f3'), 'white') == 'P'
+    assert maps.count(sq('d1'), 'white') == 1  # only the king defends the queen
+    assert maps.count(sq('e4'), 'white') == 0 and maps.cheapest_attacker(sq('e4'), 'white') is None
+    assert maps.attackers(sq('f6'), 'black') == 2 << attacks.TYPE_SHIFT['P'] | 1 << attacks.TYPE_SHIFT['N']
+
+
+def test_check_and_king_zone():
+    board, state = with_maps('4k3/8/8/8/8/8/3q4/4K3 w - - 0 1')
+    maps = state['attacks']
+    assert maps.in_check('white') and not maps.in_check('black')
+    assert is_in_check(board, state, 'white')
+    assert maps.king_square('white') == sq('e1')
+    assert maps.king_zone_attacks('white') == 4  # the queen hits d1, e1, e2 and f2
+    assert maps.king_zone_attacks('black') == 0
+
+
+def test_hanging_pieces():
+    # The bishop on a6 is undefended; the knight on d4 is defended but attacked by a pawn
+    board, state = with_maps('r3k3/8/B7/4p3/3N4/2P5/8/4K2R w - - 0 1')
+    assert state['attacks'].hanging(board, 'white') == [sq('a6'), sq('d4')]
+    assert state['attacks'].hanging(board, 'black') == []
+
+
+@pytest.mark.parametrize("fen", [
+    'r3k2r/8/8/8/8/8/8/R3K2R w KQkq - 0 1',
+    '4k3/8/8/3pP3/8/8/8/4K2B w - d6 0 1',
+    '8/8/8/KPp4r/8/8/8/7k w - c6 0 1',
+    '3k4/1P6/8/8/8/8/8/4K3 w - - 0 1',
+    '5k2/8/8/8/8/8/8/4K2R w K - 0 1',
+    BENCH_POSITIONS[1],
+])
+def test_gives_check_matches_making_the_move(fen):
+    board, state = with_maps(fen)
+    enemy = 'black' if state['side_to_move'] == 'white' else 'white'
+    for move in generate_all_moves(board, state):
+        nb, ns = main.apply_move(board, move, dict(state, attacks=None))
+        assert state['attacks'].gives_check(board, move) == is_in_check(nb, ns, enemy), move
+
+
+def test_castling_legality_uses_the_maps():
+    # The rook on f8 covers f1, so white may only castle queenside
+    board, state = with_maps('5r1k/8/8/8/8/8/8/R3K2R w KQ - 0 1')
+    legal = generate_legal_moves(board, state)
+    assert ((7, 4), (7, 2)) in legal and ((7, 4), (7, 6)) not in legal
+    plain = generate_legal_moves(board, dict(state, attacks=None))
+    assert sorted(legal) == sorted(plain)
+
+
+def test_search_is_unchanged_by_the_maps():
+    saved = main.use_attack_maps
+    try:
+        main.use_attack_maps = False
+        plain = bench(2, BENCH_POSITIONS[:6], verbose=False)[0]
+        main.use_attack_maps = True
+        assert bench(2, BENCH_POSITIONS[:6], verbose=False)[0] == plain
+    finally:
+        main.use_attack_maps = saved
+
+
+def test_quiescence_stops_once_a_king_is_captured():
+    main.reset_search_stats()
+    board, state = main.fen_to_board('8/8/8/8/8/8/8/K6r w - - 0 1')
+    assert main.quiescence_search(board, state, float('-inf'), float('inf'), 'black') == -100000
+    assert main.search_stats['qnodes'] == 1
@@ -0,0 +1,94 @@
+import sys
+import os
+import random
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+import main
+from batch_eval import encode_positions, encode_fens, evaluate_batch, bench_batch_eval
+from benchmark import BENCH_POSITIONS
+from perft import PERFT_SUITE
+
+# Positions that exercise the odd corners of mobility and king safety
+EDGE_FENS = [
+    '4k3/1P6/8/8/8/8/6p1/4K3 w - - 0 1',             # promotions, white to move
+    '4k3/1P6/8/8/8/8/6p1/4K3 b - - 0 1',             # promotions, black to move
+    'r1n1k3/1P6/8/8/8/8/8/4K3 w - - 0 1',            # promotion captures
+    '4k3/8/8/3pP3/8/8/8/4K3 w - d6 0 1',             # en passant
+    '4k3/8/8/8/3Pp3/8/8/4K3 b - d3 0 1',
+    '4k3/8/8/8/2PpP3/8/8/4K3 b - c3 0 1',
+    'r3k2r/8/8/8/8/8/8/R3K2R w KQkq - 0 1',          # castling both ways
+    'r3k2r/8/8/8/8/8/8/R3K2R b KQkq - 0 1',
+    '8/8/8/8/8/8/8/4K3 w KQ - 0 1',                  # rights without rooks
+    '8/8/8/4k3/8/8/8/8 w - - 0 1',                   # side to move has no king
+    '8/8/8/4k3/8/8/8/8 b - - 0 1',
+    '8/8/3qrb2/3nkn2/3bpq2/8/8/4K3 b - - 0 1',       # crowded king zone
+    'PPPPPPPP/8/8/8/8/8/8/pppppppp w - - 0 1',       # pawns on the back ranks
+    'PPPPPPPP/8/8/8/8/8/8/pppppppp b - - 0 1',
+]
+
+
+def random_positions(count, seed=0):
+    rng = random.Random(seed)
+    positions = []
+    while len(positions) < count:
+        board, state = main.fen_to_board(rng.choice(BENCH_POSITIONS))
+        for _ in range(rng.randrange(1, 40)):
+            moves = main.generate_legal_moves(board, state)
+            if not moves:
+                break
+            board, state = main.apply_move(board, rng.choice(moves), state)
+            positions.append((board, state))
+    return positions[:count]
+
+
+def check_matches(positions):
+    scores = evaluate_batch(encode_positions(positions))
+    expected = [main.advanced_evaluate(board, state) for board, state in positions]
+    assert scores.tolist() == expected
+
+
+def test_encoding_layout():
+    enc = encode_fens(['4k3/8/8/8/8/8/8/R3K2R b K e3 0 1'])
+    assert enc['squares'].shape == (1, 64) and enc['squares'].dtype == np.int8
+    assert enc['squares'][0, 4] == -6 and enc['squares'][0, 56] == 4 and enc['squares'][0, 60] == 6
+    assert enc['white_to_move'].tolist() == [False]
+    assert enc['castling'].tolist() == [[True, False, False, False]]
+    assert enc['en_passant'].tolist() == [5 * 8 + 4]
+
+
+def test_matches_advanced_evaluate_on_fixed_positions():
+    fens = BENCH_POSITIONS + [fen for _, fen, _ in PERFT_SUITE] + EDGE_FENS
+    check_matches([main.fen_to_board(fen) for fen in fens])
+
+
+def test_matches_advanced_evaluate_on_random_games():
+    check_matches(random_positions(400))
+
+
+def test_chunking_does_not_change_results(monkeypatch):
+    positions = random_positions(50, seed=1)
+    enc = encode_positions(positions)
+    whole = evaluate_batch(enc)
+    monkeypatch.setattr('batch_eval.CHUNK_SIZE', 7)
+    assert evaluate_batch(enc).tolist() == whole.tolist()
+
+
+def test_follows_changes_to_the_tables(monkeypatch):
+    positions = random_positions(20, seed=2)
+    monkeypatch.setitem(main.piece_values, 'N', 350)
+    monkeypatch.setitem(main.piece_values, 'n', -350)
+    check_matches(positions)
+
+
+def test_empty_batch():
+    assert evaluate_batch(encode_positions([])).tolist() == []
+
+
+def test_bench_batch_eval_runs():
+    results = bench_batch_eval(sizes=(100, 250), verbose=False)
+    assert set(results) == {100, 250}
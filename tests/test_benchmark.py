@@ -0,0 +1,32 @@
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import pytest
+
+import main
+from benchmark import BENCH_POSITIONS, bench
+
+def test_bench_positions_parse():
+    assert len(BENCH_POSITIONS) >= 30
+    for fen in BENCH_POSITIONS:
+        board, state = main.fen_to_board(fen)
+        assert main.find_king(board, 'white') is not None
+        assert main.find_king(board, 'black') is not None
+
+def test_bench_signature_is_deterministic():
+    nodes1, _ = bench(2, BENCH_POSITIONS[:3], verbose=False)
+    main.killer_moves[1] = main.encode_move(main.fen_to_board(BENCH_POSITIONS[0])[0], ((6, 4), (4, 4)))  # dirty state must not leak into the next run
+    nodes2, _ = bench(2, BENCH_POSITIONS[:3], verbose=False)
+    assert nodes1 > 0
+    assert nodes1 == nodes2
+
+def test_reset_search_state():
+    main.killer_moves[3] = 52 << 6 | 36
+    main.history_heuristic[52 << 6 | 36] = 9
+    main.search_stats['nodes'] = 42
+    main.reset_search_state()
+    assert main.killer_moves == {}
+    assert not any(main.history_heuristic)
+    assert main.search_stats['nodes'] == 0
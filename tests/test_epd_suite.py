@@ -0,0 +1,66 @@
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import pytest
+
+import main
+import epd_suite
+
+BACK_RANK = '6k1/5ppp/8/8/8/8/5PPP/3R2K1 w - - bm Rd8#; id "back rank"; c0 "Rd8=10, Rd7=2";'
+WAC_006 = '7k/p7/1R5K/6r1/6p1/6P1/8/8 w - - bm Rb7; id "WAC.006";'
+
+
+def test_solves_and_scores_a_mate_in_one():
+    fen, ops = main.parse_epd(BACK_RANK)
+    result = epd_suite.solve_position(fen, ops, max_time=float('inf'), max_depth=2)
+    assert result['solved'] and result['move'] == 'Rd8#'
+    assert result['solution_depth'] == 2 and result['solution_nodes'] > 0  # depth 1 cannot see mate
+    assert result['points'] == result['max_points'] == 10
+    assert result['depth'] == 2 and result['nodes'] >= result['solution_nodes']
+
+
+def test_avoid_move():
+    fen, ops = main.parse_epd('6k1/5ppp/8/8/8/8/5PPP/3R2K1 w - - am Rd8#; id "avoid";')
+    result = epd_suite.solve_position(fen, ops, max_time=float('inf'), max_depth=2)
+    assert not result['solved'] and result['solution_time'] is None
+
+
+def test_solution_is_where_the_correct_move_appeared_and_stayed(monkeypatch):
+    fen, ops = main.parse_epd(WAC_006)
+    board, state = main.fen_to_board(fen)
+    good = main.san_to_move(board, state, 'Rb7')
+    bad = main.san_to_move(board, state, 'Rb8+')
+    def fake_search(board, state, max_time, max_depth, max_nodes, on_iteration):
+        for depth, move in enumerate([bad, good, bad, good, good], 1):
+            on_iteration({'depth': depth, 'move': move, 'time': depth / 10, 'nodes': depth * 100})
+        return good
+    monkeypatch.setattr(epd_suite, 'iterative_deepening_pvs', fake_search)
+    result = epd_suite.solve_position(fen, ops)
+    assert (result['solution_depth'], result['solution_time'], result['solution_nodes']) == (4, 0.4, 400)
+    assert result['points'] is None
+
+
+def test_suite_summary(tmp_path):
+    path = tmp_path / 'suite.epd'
+    path.write_text('; two positions\n' + BACK_RANK + '\n\n' + WAC_006 + '\n')
+    positions = epd_suite.read_suite(str(path))
+    assert [ops['id'] for _, ops in positions] == [['back rank'], ['WAC.006']]
+    seen = []
+    results, summary = epd_suite.run_suite(positions, max_time=float('inf'), max_depth=4,
+                                           on_result=seen.append)
+    assert seen == results
+    assert summary['positions'] == 2 and summary['solved'] == 2
+    assert summary['mean_solution_time'] == pytest.approx(
+        sum(r['solution_time'] for r in results) / 2)
+    assert summary['total_nodes'] == sum(r['nodes'] for r in results)
+    assert (summary['points'], summary['max_points']) == (10, 10)
+
+
+def test_uci_notation_and_bad_moves():
+    fen, _ = main.parse_epd(WAC_006)
+    board, state = main.fen_to_board(fen)
+    assert epd_suite.parse_suite_move(board, state, 'b6b7') == main.san_to_move(board, state, 'Rb7')
+    with pytest.raises(ValueError):
+        epd_suite.parse_suite_move(board, state, 'Qh5')
@@ -0,0 +1,96 @@
+import sys
+import os
+import io
+import math
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import pytest
+
+import main
+import match
+import uci
+
+
+def test_parse_epd():
+    fen, ops = main.parse_epd('r1bqkbnr/pppp1ppp/2n5/4p3/4P3/5N2/PPPP1PPP/RNBQKB1R w KQkq - '
+                              'bm Bb5 Bc4; id "Italian or Spanish"; hmvc 2; fmvn 3;')
+    assert fen == 'r1bqkbnr/pppp1ppp/2n5/4p3/4P3/5N2/PPPP1PPP/RNBQKB1R w KQkq - 2 3'
+    assert ops['bm'] == ['Bb5', 'Bc4'] and ops['id'] == ['Italian or Spanish']
+    assert main.parse_epd('8/8/8/8/8/8/8/K6k b - -')[0] == '8/8/8/8/8/8/8/K6k b - - 0 1'
+
+
+def test_bundled_openings_are_legal_positions():
+    fens = match.read_openings()
+    assert len(fens) >= 20 and len(set(fens)) == len(fens)
+    for fen in fens:
+        board, state = main.fen_to_board(fen)
+        assert main.game_result(board, state) is None
+
+
+def test_game_result_insufficient_material():
+    board, state = main.fen_to_board('8/8/4k3/8/8/3NK3/8/8 w - - 0 1')
+    assert main.game_result(board, state) == ('1/2-1/2', 'insufficient-material')
+    board, state = main.fen_to_board('8/8/4k3/8/8/3RK3/8/8 w - - 0 1')
+    assert main.game_result(board, state) is None
+
+
+def test_elo_and_sprt_math():
+    assert match.elo_from_score(0.5) == 0.0
+    assert match.elo_from_score(0.75) == pytest.approx(190.85, abs=0.01)
+    lower, upper = match.sprt_bounds(0.05, 0.05)
+    assert upper == pytest.approx(math.log(19)) and lower == -upper
+    assert match.sprt_llr(0, 10, 0) == 0.0  # no spread yet
+    assert match.sprt_llr(60, 20, 20, 0, 5) > 0 > match.sprt_llr(20, 20, 60, 0, 5)
+    stats = match.match_stats(300, 100, 100, 0, 5)
+    assert stats['verdict'] == 'H1' and stats['elo'] > 0
+    assert stats['elo'] - stats['elo_error'] > 0
+    assert match.match_stats(100, 100, 300, 0, 5)['verdict'] == 'H0'
+    assert match.match_stats(3, 2, 3)['verdict'] is None
+
+
+def test_adjudication():
+    assert match.adjudicate([700] * 6) == ('1-0', 'adjudication')
+    assert match.adjudicate([-50] * 4 + [-700] * 6) == ('0-1', 'adjudication')
+    assert match.adjudicate([700] * 5 + [None]) is None
+    assert match.adjudicate([0] * 40) is None  # too early for a draw
+    assert match.adjudicate([30] * 72 + [5, -5] * 4) == ('1/2-1/2', 'adjudication')
+    assert match.adjudicate([100] * match.MAX_PLIES) == ('1/2-1/2', 'max-length')
+
+
+def test_pgn_numbering_from_black_to_move():
+    game = {'white': 'a', 'black': 'b', 'fen': '8/8/8/8/8/8/8/K6k b - - 0 12',
+            'moves': ['Kg2', 'Ka2', 'Kf3'], 'result': '1/2-1/2', 'reason': 'max-length'}
+    pgn = match.format_pgn(game, round_number=3)
+    assert '[Round "3"]' in pgn and '[Termination "adjudication"]' in pgn
+    assert pgn.rstrip().endswith('12... Kg2 13. Ka2 Kf3 {max-length} 1/2-1/2')
+
+
+def test_uci_pruning_options():
+    session = uci.new_session(io.StringIO())
+    saved = dict(main.pruning)
+    try:
+        uci.handle_command(session, 'uci')
+        assert 'option name Futility type check default true' in session['out'].getvalue()
+        uci.handle_command(session, 'setoption name Futility value false')
+        assert main.pruning['futility'] is False
+    finally:
+        main.pruning.update(saved)
+
+
+def test_small_match(tmp_path):
+    pgn = tmp_path / 'match.pgn'
+    games = []
+    engine1 = {'name': 'plain', 'options': {'Futility': 'false'}}
+    engine2 = {'name': 'default'}
+    stats = match.run_match(engine1, engine2, match.read_openings()[:1], {'nodes': 100},
+                            games=2, concurrency=2, pgn_path=str(pgn),
+                            on_game=lambda game, stats: games.append(game))
+    assert stats['games'] == 2 and stats['wins'] + stats['draws'] + stats['losses'] == 2
+    assert {(g['white'], g['black']) for g in games} == {('plain', 'default'), ('default', 'plain')}
+    text = pgn.read_text()
+    assert text.count('[Event ') == 2
+    for game in games:
+        board, state = main.fen_to_board(game['fen'])
+        for san in game['moves']:
+            board, state = main.apply_move(board, main.san_to_move(board, state, san), state)
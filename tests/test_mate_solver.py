@@ -0,0 +1,75 @@
+import sys
+import os
+import io
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import pytest
+
+import main
+import uci
+from mate_solver import solve_mate
+
+BACK_RANK = '6k1/5ppp/8/8/8/8/5PPP/3R2K1 w - - 0 1'
+WAC_004 = 'r1bq2rk/pp3pbp/2p1p1pQ/7P/3P4/2PB1N2/PP3PPR/2KR4 w - - 0 1'  # Qxh7+ Kxh7 hxg6#
+WAC_001 = '2rr3k/pp3pp1/1nnqbN1p/3pN3/2pP4/2P3Q1/PPB4P/R4RK1 w - - 0 1'  # Qg6, a quiet first move
+
+
+def assert_mates(fen, line):
+    board, state = main.fen_to_board(fen)
+    for move in line:
+        assert move in main.generate_legal_moves(board, state)
+        board, state = main.apply_move(board, move, state)
+    assert not main.generate_legal_moves(board, state)
+    assert main.is_in_check(board, state, state['side_to_move'])
+
+
+def test_mate_in_one():
+    board, state = main.fen_to_board(BACK_RANK)
+    result = solve_mate(board, state, max_plies=1)
+    assert result['result'] == 'mate' and result['mate_in'] == 1
+    assert result['line'] == [((7, 3), (0, 3))]
+
+
+def test_mate_in_two_by_checks():
+    board, state = main.fen_to_board(WAC_004)
+    result = solve_mate(board, state, max_plies=5)
+    assert result['result'] == 'mate' and result['mate_in'] == 2
+    assert_mates(WAC_004, result['line'])
+    assert result['nodes'] < 100
+
+
+def test_quiet_moves_need_the_full_attacker_search():
+    board, state = main.fen_to_board(WAC_001)
+    assert solve_mate(board, state, max_plies=3)['result'] == 'no mate'
+    result = solve_mate(board, state, max_plies=3, checks_only=False)
+    assert result['result'] == 'mate' and result['mate_in'] == 2
+    assert main.move_to_san(board, state, result['line'][0]) == 'Qg6'
+    assert_mates(WAC_001, result['line'])
+
+
+def test_no_mate_and_stalemate():
+    # Every check lets the king out to b8, and Qc7 stalemates, which does not count as mate
+    board, state = main.fen_to_board('k7/8/1K6/8/8/8/8/1Q6 w - - 0 1')
+    result = solve_mate(board, state, max_plies=1, checks_only=False)
+    assert result['result'] == 'no mate'
+
+
+def test_budgets():
+    board, state = main.fen_to_board(WAC_001)
+    assert solve_mate(board, state, max_plies=5, checks_only=False, max_nodes=50)['result'] == 'unknown'
+    start = time.time()
+    assert solve_mate(board, state, max_plies=5, checks_only=False, max_time=0.2)['result'] == 'unknown'
+    assert time.time() - start < 2
+
+
+def test_uci_go_mate():
+    session = uci.new_session(io.StringIO())
+    uci.handle_command(session, f'position fen {WAC_004}')
+    uci.handle_command(session, 'go mate 2')
+    session['worker'].join(timeout=30)
+    lines = session['out'].getvalue().splitlines()
+    assert 'score mate 2' in lines[-2] and lines[-2].endswith('pv h6h7 h8h7 h5g6')
+    assert lines[-1] == 'bestmove h6h7'
+    uci.stop_search(session)
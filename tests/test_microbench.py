@@ -0,0 +1,55 @@
+import sys
+import os
+import json
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import pytest
+
+import microbench
+from benchmark import BENCH_POSITIONS
+
+
+def test_cases_cover_every_operation():
+    cases = microbench.build_cases(BENCH_POSITIONS[:2])
+    assert set(cases) == set(microbench.OPERATIONS)
+    assert len(cases['is_attacked']) == 2 * 64
+    assert len(cases['apply_move']) == len(cases['apply_undo_move']) == len(cases['san_to_move']) > 0
+    board, move, state = cases['apply_undo_move'][0]
+    assert microbench.apply_undo_move(board, move, state) == (board, state)
+    for name, args_list in cases.items():
+        microbench.OPERATIONS[name](*args_list[0])
+
+
+def test_quick_run_produces_json_results(tmp_path):
+    results = microbench.run_microbench(['board_to_fen', 'is_in_check'], BENCH_POSITIONS[:3],
+                                        repeat=3, warmup=0, min_time=0)
+    assert results['positions'] == 3
+    assert list(results['results']) == ['board_to_fen', 'is_in_check']
+    for stats in results['results'].values():
+        assert 0 < stats['ns_per_op'] <= stats['median']
+        assert stats['repeat'] == 3 and stats['calls'] >= 3
+    path = tmp_path / 'results.json'
+    path.write_text(json.dumps(results))
+    assert json.loads(path.read_text()) == results
+
+
+def test_compare_flags_regressions_beyond_threshold():
+    def doc(**ns):
+        return {'results': {name: {'ns_per_op': value} for name, value in ns.items()}}
+    baseline = doc(apply_move=1000, is_attacked=100, board_to_fen=50)
+    current = doc(apply_move=1150, is_attacked=105, board_to_fen=40, san_to_move=9)
+    rows, regressions = microbench.compare(current, baseline, threshold=0.10)
+    assert regressions == ['apply_move']
+    assert [name for name, *_ in rows] == ['apply_move', 'is_attacked', 'board_to_fen']
+    assert rows[0][3] == pytest.approx(0.15)
+
+
+@pytest.mark.skipif('MICROBENCH_BASELINE' not in os.environ,
+                    reason="set MICROBENCH_BASELINE to a microbench.py --json file to gate on it")
+def test_no_regressions_against_baseline():
+    with open(os.environ['MICROBENCH_BASELINE']) as f:
+        baseline = json.load(f)
+    threshold = float(os.environ.get('MICROBENCH_THRESHOLD', microbench.THRESHOLD))
+    current = microbench.run_microbench(list(baseline['results']))
+    assert microbench.compare(current, baseline, threshold)[1] == []
@@ -5,6 +5,7 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")
 
 import pytest
 
+from move_application import apply_move
 from move_generation import (
     generate_white_pawn_moves,
     generate_white_knight_moves,
@@ -23,6 +24,11 @@ from move_generation import (
     generate_white_pawn_en_passant,
     generate_black_pawn_moves_with_promotion,
     generate_black_castling_moves,
+    generate_all_moves,
+    generate_move_codes,
+    encode_move,
+    decode_move,
+    MOVE_NONE, PROMOTION, EN_PASSANT, CASTLING,
     generate_black_pawn_en_passant,
 )
 
@@ -155,3 +161,36 @@ def test_black_en_passant():
     moves = generate_black_pawn_en_passant(board, en_passant_target)
     expected = [((4, 3), (5, 4))]
     assert moves == expected
+
+def test_move_encoding_flags():
+    board = [['.' for _ in range(8)] for __ in range(8)]
+    board[7][4] = 'K'
+    board[3][3] = 'P'
+    board[6][1] = 'p'
+    assert encode_move(board, ((7, 4), (7, 6))) == (60 << 6 | 62) | CASTLING
+    assert encode_move(board, ((3, 3), (2, 4))) == (27 << 6 | 20) | EN_PASSANT
+    assert encode_move(board, ((6, 1), (7, 0), 'n')) == (49 << 6 | 56) | PROMOTION
+    assert decode_move((49 << 6 | 56) | PROMOTION | 3 << 12) == ((6, 1), (7, 0), 'q')
+    assert decode_move((12 << 6 | 4) | PROMOTION | 2 << 12) == ((1, 4), (0, 4), 'R')
+
+def test_move_encoding_round_trip():
+    board = [
+        ['r', '.', '.', '.', 'k', '.', '.', 'r'],
+        ['.', 'P', '.', '.', '.', '.', '.', '.'],
+        ['.', '.', '.', '.', '.', '.', '.', '.'],
+        ['.', '.', '.', 'p', 'P', '.', '.', '.'],
+        ['.', '.', '.', '.', '.', '.', '.', '.'],
+        ['.', '.', '.', '.', '.', '.', '.', '.'],
+        ['.', '.', '.', '.', '.', '.', 'p', '.'],
+        ['R', '.', '.', '.', 'K', '.', '.', 'R'],
+    ]
+    for side in ('white', 'black'):
+        state = {'castling_rights': {k: True for k in 'KQkq'}, 'en_passant': (2, 3), 'side_to_move': side}
+        moves = generate_all_moves(board, state)
+        codes = [encode_move(board, m) for m in moves]
+        assert len(set(codes)) == len(moves)
+        assert all(MOVE_NONE < code < 1 << 16 for code in codes)
+        assert [decode_move(code) for code in codes] == moves
+        assert generate_move_codes(board, state) == codes
+        for move, code in zip(moves, codes):
+            assert apply_move(board, code, state) == apply_move(board, move, state)
@@ -0,0 +1,112 @@
+import sys
+import os
+import io
+import re
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import pytest
+
+import main
+import uci
+from benchmark import BENCH_POSITIONS
+
+KIWIPETE = 'r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 10'
+
+
+@pytest.fixture(autouse=True)
+def fresh_search():
+    main.reset_search_state()
+
+
+def test_lines_are_ranked_and_distinct():
+    board, state = main.fen_to_board(KIWIPETE)
+    lines = main.multipv_search(board, state, 4, max_time=float('inf'), max_depth=2)
+    assert len(lines) == 4
+    scores = [score for score, _ in lines]
+    assert scores == sorted(scores, reverse=True)
+    assert len({pv[0] for _, pv in lines}) == 4
+    legal = main.generate_legal_moves(board, state)
+    for _, pv in lines:
+        assert pv[0] in legal
+        b, s = board, state
+        for move in pv:
+            assert move in main.generate_legal_moves(b, s)
+            b, s = main.apply_move(b, move, s)
+
+
+def test_scores_are_exact(monkeypatch):
+    # With pruning off, every line's score is the full-window value of its move
+    monkeypatch.setattr(main, 'pruning', dict.fromkeys(main.pruning, False))
+    board, state = main.fen_to_board(BENCH_POSITIONS[4])
+    lines = main.multipv_search(board, state, 3, max_time=float('inf'), max_depth=2)
+    for score, pv in lines:
+        main.reset_search_state()
+        nb, ns = main.apply_move(board, pv[0], state)
+        value, _ = main.alphabeta_pvs(nb, ns, 1, float('-inf'), float('inf'), False,
+                                      main.generate_move_codes, main.apply_move)
+        assert score == -value
+
+
+def test_best_line_matches_single_pv_on_tactics():
+    board, state = main.fen_to_board('4k3/8/8/3q4/8/8/3R4/4K3 w - - 0 1')
+    lines = main.multipv_search(board, state, 3, max_time=float('inf'), max_depth=2)
+    assert lines[0][1][0] == ((6, 3), (3, 3))
+    assert lines[0][0] > lines[1][0] + 500
+    # The root TT entry follows the best line, so extract_pv agrees with it
+    assert main.extract_pv(board, state, 1) == [lines[0][1][0]]
+
+
+def test_more_lines_than_moves():
+    board, state = main.fen_to_board('7k/8/8/8/8/8/8/K7 w - - 0 1')
+    lines = main.multipv_search(board, state, 10, max_time=float('inf'), max_depth=2)
+    assert sorted(pv[0] for _, pv in lines) == sorted(main.generate_legal_moves(board, state))
+
+
+def test_single_line_matches_plain_search():
+    board, state = main.fen_to_board(KIWIPETE)
+    best = main.iterative_deepening_pvs(board, state, max_time=float('inf'), max_depth=2)
+    main.reset_search_state()
+    lines = main.multipv_search(board, state, 1, max_time=float('inf'), max_depth=2)
+    assert len(lines) == 1 and lines[0][1][0] == best
+
+
+def test_iteration_info_carries_lines():
+    board, state = main.fen_to_board(KIWIPETE)
+    infos = []
+    best = main.iterative_deepening_pvs(board, state, max_time=float('inf'), max_depth=2,
+                                        on_iteration=infos.append, multipv=3)
+    assert [info['depth'] for info in infos] == [1, 2]
+    assert all(len(info['lines']) == 3 for info in infos)
+    assert best == infos[-1]['lines'][0][1][0] == infos[-1]['move']
+
+
+def test_next_depth_searches_the_ranked_lines_first(monkeypatch):
+    board, state = main.fen_to_board(KIWIPETE)
+    searched = [[]]  # root moves in the order each depth made them
+    apply_move = main.apply_move
+    def recording_apply(b, move, s):
+        if b is board:
+            searched[-1].append(main.decode_move(move))
+        return apply_move(b, move, s)
+    monkeypatch.setattr(main, 'apply_move', recording_apply)
+    infos = []
+    def record(info):
+        infos.append(info)
+        searched.append([])
+    main.iterative_deepening_pvs(board, state, max_time=float('inf'), max_depth=3,
+                                 on_iteration=record, multipv=3)
+    for info, moves in zip(infos[:-1], searched[1:]):
+        assert moves[:3] == [pv[0] for _, pv in info['lines']]
+
+
+def test_uci_multipv_option():
+    session = uci.new_session(io.StringIO())
+    uci.handle_command(session, 'setoption name MultiPV value 3')
+    uci.handle_command(session, 'position startpos')
+    uci.handle_command(session, 'go depth 2')
+    session['worker'].join(timeout=60)
+    lines = session['out'].getvalue().splitlines()
+    for rank in (1, 2, 3):
+        assert any(re.match(rf'info depth 2 seldepth \d+ multipv {rank} score cp ', line) for line in lines)
+    assert lines[-1].startswith('bestmove ')
@@ -0,0 +1,113 @@
+import sys
+import os
+import random
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+import main
+from nnue import FEATURES, feature, move_features, load_network, save_network, reference_network
+from benchmark import BENCH_POSITIONS
+
+START_FEN = 'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1'
+
+
+@pytest.fixture
+def net():
+    return load_network()
+
+
+@pytest.fixture
+def nnue_evaluator():
+    main.set_evaluator('nnue')
+    yield main.nnue_network
+    main.set_evaluator('classic')
+
+
+def test_reference_file_matches_generator(net):
+    ref = reference_network()
+    assert np.array_equal(net.w1, ref.w1) and np.array_equal(net.w2, ref.w2)
+
+
+def test_features_cover_768_inputs():
+    seen = {feature(p, r, c, side) for p in 'PNBRQKpnbrqk'
+            for r in range(8) for c in range(8) for side in ('white', 'black')}
+    assert seen == set(range(FEATURES))
+    # Black's view of a black pawn on e7 is white's view of a white pawn on e2
+    assert feature('p', 1, 4, 'black') == feature('P', 6, 4, 'white')
+
+
+def test_move_features_special_moves():
+    board, _ = main.fen_to_board('r3k3/8/8/3pP3/8/8/1p6/R3K2R w KQq d6 0 1')
+    assert move_features(board, ((3, 4), (2, 3))) == ([('P', 2, 3)], [('P', 3, 4), ('p', 3, 3)])
+    assert move_features(board, ((7, 4), (7, 6))) == (
+        [('K', 7, 6), ('R', 7, 5)], [('K', 7, 4), ('R', 7, 7)])
+    assert move_features(board, ((6, 1), (7, 0), 'q')) == ([('q', 7, 0)], [('p', 6, 1), ('R', 7, 0)])
+
+
+def test_incremental_updates_match_refresh(net):
+    rng = random.Random(0)
+    for fen in BENCH_POSITIONS[:10]:
+        board, state = main.fen_to_board(fen)
+        state = net.attach(board, state)
+        for _ in range(40):
+            moves = main.generate_legal_moves(board, state)
+            if not moves:
+                break
+            board, state = main.apply_move(board, rng.choice(moves), state)
+            fresh = net.refresh(board)
+            assert np.allclose(state['accumulator'].white, fresh.white, atol=1e-4)
+            assert np.allclose(state['accumulator'].black, fresh.black, atol=1e-4)
+            plain = {k: v for k, v in state.items() if k != 'accumulator'}
+            assert abs(net.evaluate(board, state) - net.evaluate(board, plain)) <= 1
+
+
+def test_evaluation_is_colour_symmetric(net):
+    board, state = main.fen_to_board('r1bqkbnr/pppp1ppp/2n5/4p3/4P3/5N2/PPPP1PPP/RNBQKB1R w KQkq - 2 3')
+    mirrored, mstate = main.fen_to_board('rnbqkb1r/pppp1ppp/5n2/4p3/4P3/2N5/PPPP1PPP/R1BQKBNR b KQkq - 2 3')
+    assert net.evaluate(board, state) == net.evaluate(mirrored, mstate)
+
+
+def test_reference_net_counts_material(net):
+    board, state = main.fen_to_board(START_FEN)
+    up_a_queen, qstate = main.fen_to_board('rnb1kbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1')
+    assert abs(net.evaluate(board, state)) < 50
+    assert net.evaluate(up_a_queen, qstate) - net.evaluate(board, state) > 800
+
+
+def test_save_and_load_round_trip(tmp_path, net):
+    path = tmp_path / 'net.npz'
+    save_network(net, str(path))
+    loaded = load_network(str(path))
+    board, state = main.fen_to_board(BENCH_POSITIONS[3])
+    assert loaded.evaluate(board, state) == net.evaluate(board, state)
+
+
+def test_set_evaluator_switches_backend(nnue_evaluator):
+    assert main.evaluate == nnue_evaluator.evaluate
+    main.set_evaluator('classic')
+    assert main.evaluate is main.advanced_evaluate and main.nnue_network is None
+    with pytest.raises(ValueError):
+        main.set_evaluator('bogus')
+
+
+def test_search_with_nnue_takes_free_queen(nnue_evaluator):
+    board, state = main.fen_to_board('4k3/8/8/3q4/8/8/3R4/4K3 w - - 0 1')
+    main.reset_search_state()
+    move = main.iterative_deepening_pvs(board, state, max_time=float('inf'), max_depth=2)
+    assert move == ((6, 3), (3, 3))
+
+
+def test_stats_wrap_the_selected_evaluator(nnue_evaluator):
+    main.enable_search_stats()
+    try:
+        board, state = main.fen_to_board(START_FEN)
+        main.reset_search_state()
+        main.iterative_deepening_pvs(board, state, max_time=float('inf'), max_depth=1)
+        assert main.search_stats['eval_calls'] > 0
+    finally:
+        main.enable_search_stats(False)
+    assert main.evaluate == nnue_evaluator.evaluate
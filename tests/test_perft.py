@@ -0,0 +1,45 @@
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import pytest
+
+from main import fen_to_board
+from perft import PERFT_SUITE, START_FEN, perft, divide, perft_parallel, move_to_uci
+
+
+# Known counts for the standard suite, kept shallow so the test stays fast
+@pytest.mark.parametrize("name,fen,expected", PERFT_SUITE, ids=[p[0] for p in PERFT_SUITE])
+def test_perft_suite(name, fen, expected):
+    board, state = fen_to_board(fen)
+    for depth in (1, 2):
+        assert perft(board, state, depth) == expected[depth - 1]
+
+def test_perft_startpos_depth3():
+    board, state = fen_to_board(START_FEN)
+    assert perft(board, state, 3) == 8902
+
+def test_perft_hash_matches_plain():
+    board, state = fen_to_board(PERFT_SUITE[2][1])  # position3
+    table = {}
+    assert perft(board, state, 3, table) == 2812
+    assert len(table) > 0
+    # Second run is answered from the table
+    assert perft(board, state, 3, table) == 2812
+
+def test_divide_sums_to_perft():
+    board, state = fen_to_board(PERFT_SUITE[1][1])  # kiwipete
+    counts = divide(board, state, 2)
+    assert len(counts) == 48
+    assert sum(counts.values()) == 2039
+    assert 'e1g1' in counts and 'e1c1' in counts
+
+def test_perft_parallel_matches_serial():
+    board, state = fen_to_board(PERFT_SUITE[4][1])  # position5
+    assert perft_parallel(board, state, 2, workers=2) == 1486
+
+def test_move_to_uci_promotion():
+    assert move_to_uci(((6, 4), (4, 4))) == 'e2e4'
+    assert move_to_uci(((1, 3), (0, 2), 'Q')) == 'd7c8q'
+    assert move_to_uci(((6, 0), (7, 0), 'n')) == 'a2a1n'
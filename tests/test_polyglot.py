@@ -0,0 +1,93 @@
+import sys
+import os
+import json
+import random
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import pytest
+
+import main
+from polyglot import (polyglot_key, encode_move, decode_move, open_book, close_book,
+                      book_moves, book_move, add_book_move, write_book,
+                      build_from_pgn, build_from_analysis, read_pgn_games)
+
+START_FEN = 'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1'
+
+# Reference keys from the Polyglot specification
+@pytest.mark.parametrize("fen,key", [
+    (START_FEN, 0x463b96181691fc9c),
+    ('rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq e3 0 1', 0x823c9b50fd114196),
+    ('rnbqkbnr/ppp1pppp/8/3p4/4P3/8/PPPP1PPP/RNBQKBNR w KQkq d6 0 2', 0x0756b94461c50fb0),
+    ('rnbqkbnr/ppp1p1pp/8/3pPp2/8/8/PPPP1PPP/RNBQKBNR w KQkq f6 0 3', 0x22a48b5a8e47ff78),
+    ('rnbqkbnr/ppp1p1pp/8/3pPp2/8/8/PPPPKPPP/RNBQ1BNR b kq - 0 3', 0x652a607ca3f242c1),
+    ('rnbq1bnr/ppp1pkpp/8/3pPp2/8/8/PPPPKPPP/RNBQ1BNR w - - 0 4', 0x00fdd303c946bdd9),
+    ('rnbqkbnr/p1pppppp/8/8/PpP4P/8/1P1PPPP1/RNBQKBNR b KQkq c3 0 3', 0x3c8123ea7b067637),
+    ('rnbqkbnr/p1pppppp/8/8/P6P/R1p5/1P1PPPP1/1NBQKBNR b Kkq - 0 4', 0x5c3f9b829b279560),
+])
+def test_polyglot_key_reference_values(fen, key):
+    board, state = main.fen_to_board(fen)
+    assert polyglot_key(board, state) == key
+
+def test_castling_move_roundtrip():
+    board, state = main.fen_to_board('r3k2r/8/8/8/8/8/8/R3K2R w KQkq - 0 1')
+    for move in (((7, 4), (7, 6)), ((7, 4), (7, 2))):
+        raw = encode_move(board, move)
+        assert decode_move(board, state, raw) == move
+    # Polyglot stores castling as king-takes-rook: e1h1
+    assert encode_move(board, ((7, 4), (7, 6))) == (0 << 9) | (4 << 6) | (0 << 3) | 7
+
+def test_promotion_move_roundtrip():
+    board, state = main.fen_to_board('7k/8/8/8/8/8/p7/7K b - - 0 1')
+    move = ((6, 0), (7, 0), 'n')
+    assert decode_move(board, state, encode_move(board, move)) == move
+
+def test_write_and_probe_book(tmp_path):
+    board, state = main.fen_to_board(START_FEN)
+    counts = {}
+    add_book_move(counts, board, state, ((6, 4), (4, 4)), 30)
+    add_book_move(counts, board, state, ((6, 3), (4, 3)), 10)
+    other_board, other_state = main.apply_move(board, ((6, 4), (4, 4)), state)
+    add_book_move(counts, other_board, other_state, ((1, 2), (3, 2)), 5)
+    path = str(tmp_path / "book.bin")
+    assert write_book(counts, path) == 3
+    book = open_book(path)
+    try:
+        assert sorted(book_moves(book, board, state)) == sorted([(((6, 4), (4, 4)), 30), (((6, 3), (4, 3)), 10)])
+        assert book_move(book, board, state, mode='best') == ((6, 4), (4, 4))
+        picks = {book_move(book, board, state, rng=random.Random(i)) for i in range(50)}
+        assert picks == {((6, 4), (4, 4)), ((6, 3), (4, 3))}
+        empty_board, empty_state = main.fen_to_board('8/8/8/8/8/8/8/K6k w - - 0 1')
+        assert book_move(book, empty_board, empty_state) is None
+    finally:
+        close_book(book)
+
+def test_build_from_pgn_weights_by_result(tmp_path):
+    pgn = tmp_path / "games.pgn"
+    pgn.write_text('[Result "1-0"]\n\n1. e4 {best by test} e5 (1... c5) 2. Nf3 Nc6 1-0\n\n'
+                   '[Result "1/2-1/2"]\n\n1. d4 d5 $1 1/2-1/2\n')
+    assert [sans for _, sans in read_pgn_games(pgn.read_text())] == [['e4', 'e5', 'Nf3', 'Nc6'], ['d4', 'd5']]
+    path = str(tmp_path / "book.bin")
+    write_book(build_from_pgn([str(pgn)]), path)
+    book = open_book(path)
+    try:
+        board, state = main.fen_to_board(START_FEN)
+        assert dict(book_moves(book, board, state)) == {((6, 4), (4, 4)): 2, ((6, 3), (4, 3)): 1}
+        # Losing side's moves get zero weight and are left out
+        board, state = main.apply_move(board, ((6, 4), (4, 4)), state)
+        assert book_moves(book, board, state) == []
+    finally:
+        close_book(book)
+
+def test_build_from_analysis_and_engine_move_uses_book(tmp_path):
+    analysis = tmp_path / "stats.jsonl"
+    analysis.write_text(json.dumps({'fen': START_FEN, 'move': [[6, 2], [4, 2]]}) + '\n' +
+                        json.dumps({'fen': START_FEN, 'move': 'c2c4'}) + '\n')
+    path = str(tmp_path / "book.bin")
+    write_book(build_from_analysis([str(analysis)]), path)
+    main.set_opening_book(path, mode='best')
+    try:
+        board, state = main.fen_to_board(START_FEN)
+        assert main.engine_move(board, state, max_time=5.0) == ((6, 2), (4, 2))
+    finally:
+        main.set_opening_book(None)
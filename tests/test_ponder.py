@@ -0,0 +1,46 @@
+import sys
+import os
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import pytest
+
+import main
+from perft import START_FEN
+
+@pytest.fixture(autouse=True)
+def clean_state():
+    main.reset_search_state()
+    yield
+    main.search_stop.clear()
+    main.reset_search_state()
+
+def test_ponder_hit_keeps_tables_and_returns_reply():
+    board, state = main.fen_to_board(START_FEN)
+    expected = ((6, 4), (4, 4))  # e2e4
+    ponder = main.start_ponder(board, state, expected)
+    time.sleep(0.3)
+    best = main.finish_ponder(ponder, expected, max_time=0.2)
+    nb, ns = main.apply_move(board, expected, state)
+    assert best in main.generate_legal_moves(nb, ns)
+    assert main.tt_count() > 0
+    assert not ponder['thread'].is_alive()
+
+def test_ponder_miss_discards_tables():
+    board, state = main.fen_to_board(START_FEN)
+    ponder = main.start_ponder(board, state, ((6, 4), (4, 4)))
+    time.sleep(0.2)
+    start = time.time()
+    best = main.finish_ponder(ponder, ((6, 3), (4, 3)), max_time=5.0)
+    assert best is None
+    assert time.time() - start < 1.0
+    assert main.tt_count() == 0
+    assert main.killer_moves == {}
+
+def test_ponder_whole_position_keeps_tt():
+    board, state = main.fen_to_board(START_FEN)
+    ponder = main.start_ponder(board, state)
+    time.sleep(0.2)
+    assert main.finish_ponder(ponder, ((6, 3), (4, 3))) is None
+    assert main.tt_count() > 0
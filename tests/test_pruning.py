@@ -0,0 +1,83 @@
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import pytest
+
+import main
+from benchmark import BENCH_POSITIONS, bench
+
+ALL_OFF = {'futility': False, 'reverse_futility': False, 'razoring': False}
+
+
+@pytest.fixture
+def stats():
+    saved = dict(main.pruning)
+    main.reset_search_state()
+    main.enable_search_stats()
+    yield main.search_stats
+    main.enable_search_stats(False)
+    main.pruning.update(saved)
+
+
+def probe(fen, depth, alpha):
+    """Null-window search of a non-root node."""
+    board, state = main.fen_to_board(fen)
+    return main.alphabeta_pvs(board, state, depth, alpha, alpha + 1, True,
+                              main.generate_move_codes, main.apply_move)[0]
+
+
+def test_pruning_reduces_nodes(stats):
+    nodes_on, _ = bench(2, BENCH_POSITIONS[:6], verbose=False)
+    main.pruning.update(ALL_OFF)
+    nodes_off, _ = bench(2, BENCH_POSITIONS[:6], verbose=False)
+    assert nodes_on < nodes_off
+
+
+def test_switches_disable_each_technique(stats):
+    main.pruning.update(ALL_OFF)
+    bench(2, BENCH_POSITIONS[:3], verbose=False)
+    assert stats['futility_prunes'] == stats['reverse_futility_cutoffs'] == stats['razor_cutoffs'] == 0
+
+
+def test_reverse_futility_cuts_quiet_winning_nodes(stats):
+    # White is a queen up: far above beta = 0
+    assert probe('4k3/8/8/8/8/8/8/Q3K3 w - - 0 1', 1, -1) == 0
+    assert stats['reverse_futility_cutoffs'] == 1
+
+
+def test_razoring_drops_into_quiescence(stats):
+    # White is a queen down with nothing to capture
+    assert probe('3qk3/8/8/8/8/8/8/4K3 w - - 0 1', 1, 0) <= 0
+    assert stats['razor_cutoffs'] == 1
+    assert stats['nodes'] == stats['qnodes'] + 1
+
+
+def test_futility_skips_quiet_moves(stats):
+    main.pruning['razoring'] = False
+    probe('3qk3/8/8/8/8/8/8/4K3 w - - 0 1', 1, 0)
+    assert stats['futility_prunes'] > 0
+
+
+def test_no_pruning_in_check(stats):
+    # White is far ahead but in check
+    probe('4k3/8/8/8/8/8/4r3/Q3K3 w - - 0 1', 1, -1000)
+    probe('3qk3/8/8/8/8/8/8/4K2r w - - 0 1', 1, 0)
+    assert stats['futility_prunes'] == stats['reverse_futility_cutoffs'] == stats['razor_cutoffs'] == 0
+
+
+def test_no_pruning_near_mate_scores(stats):
+    probe('4k3/8/8/8/8/8/8/Q3K3 w - - 0 1', 1, -main.MATE_BOUND - 1)
+    probe('3qk3/8/8/8/8/8/8/4K3 w - - 0 1', 1, main.MATE_BOUND)
+    assert stats['futility_prunes'] == stats['reverse_futility_cutoffs'] == stats['razor_cutoffs'] == 0
+
+
+@pytest.mark.parametrize("fen,best", [
+    ('6k1/5ppp/8/8/8/8/8/R5K1 w - - 0 1', ((7, 0), (0, 0))),        # back-rank mate
+    ('4k3/8/8/3q4/8/8/3R4/4K3 w - - 0 1', ((6, 3), (3, 3))),        # free queen
+    ('r5k1/5ppp/8/8/8/8/5PPP/6K1 b - - 0 1', ((0, 0), (7, 0))),     # mate for black
+])
+def test_tactics_survive_pruning(stats, fen, best):
+    board, state = main.fen_to_board(fen)
+    assert main.iterative_deepening_pvs(board, state, max_time=float('inf'), max_depth=3) == best
@@ -0,0 +1,94 @@
+import sys
+import os
+import io
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import pytest
+
+import main
+import uci
+from move_application import apply_move, position_key
+
+START_FEN = 'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1'
+KNIGHT_SHUFFLE = [((7, 6), (5, 5)), ((0, 6), (2, 5)), ((5, 5), (7, 6)), ((2, 5), (0, 6))]
+
+
+def play(fen, moves):
+    board, state = main.fen_to_board(fen)
+    for move in moves:
+        board, state = apply_move(board, move, state)
+    return board, state
+
+
+def test_counters_follow_the_game():
+    board, state = play(START_FEN, [((6, 4), (4, 4)), ((0, 6), (2, 5)), ((7, 6), (5, 5))])
+    assert state['halfmove_clock'] == 2 and state['fullmove_number'] == 2
+    assert main.board_to_fen(board, state).endswith(' b KQkq - 2 2')
+    board, state = apply_move(board, ((2, 5), (4, 4)), state)  # capture resets the clock
+    assert state['halfmove_clock'] == 0 and state['history'] == ()
+    assert main.board_to_fen(board, state).endswith(' w KQkq - 0 3')
+
+
+def test_fen_counters_round_trip():
+    fen = 'r3k2r/8/8/8/8/8/8/R3K2R b KQkq - 37 58'
+    assert main.board_to_fen(*main.fen_to_board(fen)) == fen
+    _, state = main.fen_to_board('8/8/8/8/8/8/8/K6k w - -')
+    assert state['halfmove_clock'] == 0 and state['fullmove_number'] == 1
+
+
+def test_history_holds_the_reversible_window():
+    board, state = play(START_FEN, KNIGHT_SHUFFLE)
+    start_board, start_state = main.fen_to_board(START_FEN)
+    assert state['history'][0] == position_key(start_board, start_state)
+    assert main.repetition_count(board, state) == 1
+    board, state = play(START_FEN, KNIGHT_SHUFFLE * 2)
+    assert main.repetition_count(board, state) == 2
+
+
+def test_rule_draws():
+    board, state = play(START_FEN, KNIGHT_SHUFFLE)
+    assert main.is_rule_draw(board, state, main.board_hash(board, state))
+    board, state = main.fen_to_board('8/8/8/8/8/3k4/8/3K3R w - - 99 80')
+    assert not main.is_rule_draw(board, state, main.board_hash(board, state))
+    board, state = main.fen_to_board('8/8/8/8/8/3k4/8/3K3R w - - 100 80')
+    assert main.is_rule_draw(board, state, main.board_hash(board, state))
+    # Checkmate on the hundredth ply is still a loss
+    board, state = main.fen_to_board('3k3R/8/3K4/8/8/8/8/8 b - - 100 80')
+    assert not main.is_rule_draw(board, state, main.board_hash(board, state))
+
+
+def test_search_scores_repetitions_as_draws():
+    main.reset_search_state()
+    board, state = play(START_FEN, KNIGHT_SHUFFLE[:3])
+    board, state = apply_move(board, KNIGHT_SHUFFLE[3], state)
+    score, move = main.alphabeta_pvs(board, state, 2, -10 ** 6, 10 ** 6, True,
+                                     main.generate_move_codes, main.apply_move)
+    assert (score, move) == (0, None)
+
+
+def test_winning_side_avoids_repetition():
+    # White is a queen up; going back to the earlier position would be a draw
+    main.reset_search_state()
+    board, state = play('4k3/8/8/8/8/8/8/Q3K3 b - - 0 1', [((0, 4), (0, 3))])
+    board, state = apply_move(board, ((7, 0), (7, 1)), state)
+    board, state = apply_move(board, ((0, 3), (0, 4)), state)
+    best = main.iterative_deepening_pvs(board, state, max_time=float('inf'), max_depth=1)
+    assert best != ((7, 1), (7, 0))
+
+
+def test_fifty_move_rule_draws_in_search():
+    main.reset_search_state()
+    board, state = main.fen_to_board('4k3/8/8/8/8/8/8/Q3K3 b - - 99 120')
+    score, _ = main.alphabeta_pvs(board, state, 2, -10 ** 6, 10 ** 6, False,
+                                  main.generate_move_codes, main.apply_move,
+                                  root_moves=[main.encode_move(board, m) for m in main.generate_legal_moves(board, state)])
+    assert score == 0
+
+
+def test_uci_position_keeps_the_history():
+    session = uci.new_session(io.StringIO())
+    uci.handle_command(session, 'position startpos moves g1f3 g8f6 f3g1 f6g8 g1f3')
+    board, state = session['board'], session['state']
+    assert state['halfmove_clock'] == 5 and len(state['history']) == 5
+    assert main.repetition_count(board, state) == 1
@@ -0,0 +1,85 @@
+import sys
+import os
+import random
+import subprocess
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import pytest
+
+from main import fen_to_board, board_to_fen, apply_move, generate_legal_moves, san_to_move, move_to_san
+from benchmark import BENCH_POSITIONS
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+
+@pytest.mark.parametrize("fen,san,move", [
+    ('rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1', 'e4', ((6, 4), (4, 4))),
+    ('rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1', 'Nf3', ((7, 6), (5, 5))),
+    ('r3k2r/8/8/8/8/8/8/R3K2R w KQkq - 0 1', 'O-O', ((7, 4), (7, 6))),
+    ('r3k2r/8/8/8/8/8/8/R3K2R b KQkq - 0 1', '0-0-0', ((0, 4), (0, 2))),
+    ('4k3/8/8/3pP3/8/8/8/4K3 w - d6 0 1', 'exd6', ((3, 4), (2, 3))),
+    ('4k3/8/8/8/8/8/1p6/R3K3 b - - 0 1', 'bxa1=Q+', ((6, 1), (7, 0), 'q')),
+    ('4k3/8/8/8/8/8/1p6/R3K3 b - - 0 1', 'b1N', ((6, 1), (7, 1), 'n')),
+    ('4k3/8/8/8/8/8/8/R3K2R w - - 0 1', 'Rad1', ((7, 0), (7, 3))),
+    ('4k3/8/8/8/8/R7/8/R3K3 w - - 0 1', 'R1a2', ((7, 0), (6, 0))),
+])
+def test_san_to_move(fen, san, move):
+    board, state = fen_to_board(fen)
+    assert san_to_move(board, state, san) == move
+
+
+@pytest.mark.parametrize("fen,san", [
+    ('rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1', 'e5'),      # illegal
+    ('rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1', 'O-O'),
+    ('4k3/8/8/8/8/8/4K3/R6R w - - 0 1', 'Rd1'),                               # ambiguous
+    ('4k3/8/8/8/8/8/1p6/R3K3 b - - 0 1', 'b1'),                               # missing promotion
+    ('4k3/8/8/8/8/8/8/4K3 w - - 0 1', 'hello'),
+])
+def test_san_to_move_rejects(fen, san):
+    board, state = fen_to_board(fen)
+    with pytest.raises(ValueError):
+        san_to_move(board, state, san)
+
+
+def test_move_to_san_suffixes_and_disambiguation():
+    board, state = fen_to_board('6k1/5ppp/8/8/8/8/4K3/R6R w - - 0 1')
+    assert move_to_san(board, state, ((7, 0), (0, 0))) == 'Ra8#'
+    assert move_to_san(board, state, ((7, 7), (7, 5))) == 'Rhf1'
+    assert move_to_san(board, state, ((7, 7), (0, 7))) == 'Rh8+'
+    assert move_to_san(board, state, ((6, 4), (5, 4))) == 'Ke3'
+    board, state = fen_to_board('4k3/8/8/8/8/R7/8/R3K3 w - - 0 1')
+    assert move_to_san(board, state, ((5, 0), (6, 0))) == 'R3a2'
+
+
+def test_round_trip_on_random_games():
+    rng = random.Random(0)
+    for fen in BENCH_POSITIONS[:6]:
+        board, state = fen_to_board(fen)
+        for _ in range(6):
+            moves = generate_legal_moves(board, state)
+            if not moves:
+                break
+            for move in moves:
+                assert san_to_move(board, state, move_to_san(board, state, move, moves)) == move
+            board, state = apply_move(board, rng.choice(moves), state)
+
+
+def test_matches_python_chess():
+    chess = pytest.importorskip("chess")
+    rng = random.Random(1)
+    for fen in BENCH_POSITIONS[:12]:
+        board, state = fen_to_board(fen)
+        for _ in range(20):
+            moves = generate_legal_moves(board, state)
+            if not moves:
+                break
+            reference = chess.Board(board_to_fen(board, state))
+            expected = sorted(reference.san(m) for m in reference.legal_moves)
+            assert sorted(move_to_san(board, state, m, moves) for m in moves) == expected
+            board, state = apply_move(board, rng.choice(moves), state)
+
+
+def test_engine_starts_without_python_chess():
+    code = "import sys, main; sys.exit('chess' in sys.modules)"
+    assert subprocess.run([sys.executable, '-c', code], cwd=ROOT).returncode == 0
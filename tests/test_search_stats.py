@@ -0,0 +1,65 @@
+import sys
+import os
+import json
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import pytest
+
+import main
+import move_generation
+from perft import START_FEN
+
+KIWIPETE = 'r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1'
+
+@pytest.fixture(autouse=True)
+def clean_state():
+    main.reset_search_state()
+    yield
+    main.enable_search_stats(False)
+    main.reset_search_state()
+
+def test_disabled_stats_only_count_nodes():
+    board, state = main.fen_to_board(START_FEN)
+    main.iterative_deepening_pvs(board, state, max_time=float('inf'), max_depth=2)
+    assert main.search_stats['nodes'] > 0
+    assert main.search_stats['qnodes'] > 0
+    assert main.search_stats['tt_probes'] == 0
+    assert main.search_stats['eval_calls'] == 0
+    assert main.search_stats['movegen_time'] == 0.0
+
+def test_enabled_stats_collect_counters_and_timings(monkeypatch):
+    # Without frontier pruning every depth-2 cutoff is an ordinary beta cutoff
+    monkeypatch.setattr(main, 'pruning', dict.fromkeys(main.pruning, False))
+    main.enable_search_stats()
+    board, state = main.fen_to_board(KIWIPETE)
+    main.iterative_deepening_pvs(board, state, max_time=float('inf'), max_depth=2)
+    stats = main.search_stats
+    assert stats['tt_probes'] > 0
+    assert stats['beta_cutoffs'] > 0
+    assert stats['first_move_cutoffs'] <= stats['beta_cutoffs']
+    assert stats['eval_calls'] > 0
+    assert stats['movegen_time'] > 0 and stats['eval_time'] > 0 and stats['make_time'] > 0
+    report = main.search_stats_report()
+    assert 0.0 < report['qnode_share'] <= 1.0
+    assert 0.0 <= report['first_move_cutoff_rate'] <= 1.0
+
+def test_disable_restores_plain_functions():
+    main.enable_search_stats()
+    assert main.generate_move_codes is not move_generation.generate_move_codes
+    main.enable_search_stats(False)
+    assert main.generate_move_codes is move_generation.generate_move_codes
+    assert main.advanced_evaluate.__name__ == 'advanced_evaluate'
+    assert not hasattr(main.advanced_evaluate, '__wrapped__')
+    assert main.evaluate is main.advanced_evaluate
+
+def test_engine_move_logs_json_per_move(tmp_path):
+    log = tmp_path / "stats.jsonl"
+    main.enable_search_stats(log_path=str(log))
+    board, state = main.fen_to_board(START_FEN)
+    main.engine_move(board, state, max_time=0.05)
+    main.engine_move(board, state, max_time=0.05)
+    records = [json.loads(line) for line in log.read_text().splitlines()]
+    assert len(records) == 2
+    assert records[0]['fen'] == main.board_to_fen(board, state)
+    assert records[0]['nodes'] > 0
@@ -0,0 +1,84 @@
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import pytest
+
+import main
+import search_trace
+from benchmark import BENCH_POSITIONS, bench
+from perft import START_FEN
+
+
+def traced_search(path, fen, depth):
+    board, state = main.fen_to_board(fen)
+    main.reset_search_state()
+    tracer = search_trace.start_trace(str(path))
+    try:
+        main.iterative_deepening_pvs(board, state, max_time=float('inf'), max_depth=depth)
+    finally:
+        count = search_trace.stop_trace(tracer)
+    return count
+
+
+def test_stopping_restores_the_untraced_search(tmp_path):
+    originals = (main.alphabeta_pvs, main.quiescence_search, main.apply_move)
+    plain = bench(2, BENCH_POSITIONS[:3], verbose=False)[0]
+    tracer = search_trace.start_trace(str(tmp_path / 'bench.trace'))
+    try:
+        assert main.alphabeta_pvs is not originals[0]
+        traced = bench(2, BENCH_POSITIONS[:3], verbose=False)[0]
+    finally:
+        assert search_trace.stop_trace(tracer) == traced
+    assert (main.alphabeta_pvs, main.quiescence_search, main.apply_move) == originals
+    assert traced == plain
+
+
+def test_records_form_the_search_tree(tmp_path):
+    path = tmp_path / 'start.trace'
+    count = traced_search(path, START_FEN, 3)
+    records = list(search_trace.read_trace(str(path)))
+    assert len(records) == count == main.search_stats['nodes']
+    assert sum(1 for r in records if r[0] & search_trace.TRACE_QUIESCENCE) == main.search_stats['qnodes']
+    # Post-order: every top-level node closes its iteration, and its subtree is everything since the last one
+    tops = [i for i, r in enumerate(records) if r[1] == 0]
+    assert [records[i][2] for i in tops] == [1, 2, 3]
+    assert [records[i][10] for i in tops] == [b - a for a, b in zip([-1] + tops, tops)]
+    for flags, ply, depth, alpha, beta, score, move, index, children, cutoff, nodes in records:
+        if flags & 3 == search_trace.TRACE_CUT:
+            assert score >= beta and cutoff == (children - 1 if children else -1)
+        else:
+            assert cutoff == -1
+        if ply > 0 and index != search_trace.TRACE_NO_INDEX:
+            assert move != 0
+
+
+def test_file_is_append_only(tmp_path):
+    path = tmp_path / 'both.trace'
+    first = traced_search(path, START_FEN, 2)
+    second = traced_search(path, BENCH_POSITIONS[1], 2)
+    assert sum(1 for _ in search_trace.read_trace(str(path))) == first + second
+    assert path.stat().st_size == (search_trace.TRACE_HEADER.size
+                                   + (first + second) * search_trace.TRACE_RECORD.size)
+
+
+def test_stats(tmp_path):
+    path = tmp_path / 'kiwipete.trace'
+    count = traced_search(path, BENCH_POSITIONS[1], 3)
+    stats = search_trace.trace_stats(str(path), top=3)
+    assert stats['nodes'] == count and sum(stats['types'].values()) == count
+    for depth, histogram in stats['cutoff_index'].items():
+        assert 0 <= stats['first_move_cutoff_rate'][depth] <= 1
+        assert all(index >= 0 for index in histogram)
+    assert stats['mean_subtree_by_ply'][0] > stats['mean_subtree_by_ply'][1]
+    sizes = [entry['nodes'] for entry in stats['largest_subtrees']]
+    assert len(sizes) == 3 and sizes == sorted(sizes, reverse=True)
+    assert all(entry['move'] for entry in stats['largest_subtrees'])
+
+
+def test_reader_rejects_other_files(tmp_path):
+    path = tmp_path / 'table.tt'
+    path.write_bytes(b'PYTT' + b'\0' * 40)
+    with pytest.raises(ValueError):
+        list(search_trace.read_trace(str(path)))
@@ -0,0 +1,112 @@
+import sys
+import os
+import json
+import asyncio
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import main
+import server
+
+
+def run_session(lines, move_time=0.02):
+    """Start a one-worker server, send `lines` over one connection, return the replies."""
+    async def session():
+        srv = server.new_server(workers=1, move_time=move_time)
+        port = await server.start_server(srv, port=0)
+        try:
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            replies = []
+            for line, count in lines:
+                writer.write((line + '\n').encode())
+                await writer.drain()
+                for _ in range(count):
+                    replies.append((await reader.readline()).decode().strip())
+            writer.write(b'quit\n')
+            await writer.drain()
+            await reader.read()
+            writer.close()
+            return replies, server.metrics_snapshot(srv)
+        finally:
+            await server.stop_server(srv)
+    return asyncio.run(session())
+
+
+def test_game_accepts_uci_and_san():
+    replies, metrics = run_session([('new', 1), ('move e2e4', 1), ('move Nf3', 1), ('fen', 1)])
+    assert replies[0] == 'ok game 1'
+    assert replies[1].startswith('engine ') and replies[2].startswith('engine ')
+    board, state = main.fen_to_board(server.START_FEN)
+    for uci_move in ('e2e4', replies[1].split()[1], 'g1f3', replies[2].split()[1]):
+        board, state = main.apply_move(board, main.uci_to_move(board, state, uci_move), state)
+    assert replies[3] == 'fen ' + main.board_to_fen(board, state)
+    assert metrics['engine_moves'] == 2
+    assert metrics['games_finished'] == 1  # released on disconnect
+
+
+def test_engine_opens_when_human_plays_black():
+    replies, _ = run_session([('new black', 2), ('go', 1)])
+    assert replies[0] == 'ok game 1'
+    _, uci_move, san = replies[1].split()
+    board, state = main.fen_to_board(server.START_FEN)
+    move = main.uci_to_move(board, state, uci_move)
+    assert main.move_to_san(board, state, move) == san
+    assert replies[2] == 'error your move'
+
+
+def test_protocol_errors():
+    replies, _ = run_session([('move e2e4', 1), ('bogus', 1), ('new', 1),
+                              ('move e2e5', 1), ('move Qh5', 1)])
+    assert replies[0] == 'error no game in progress'
+    assert replies[1] == 'error unknown command bogus'
+    assert replies[3].startswith('error ')
+    assert replies[4].startswith('error ')
+
+
+def test_metrics_command():
+    replies, _ = run_session([('new', 1), ('move d4', 1), ('metrics', 1)])
+    snapshot = json.loads(replies[2].split(' ', 1)[1])
+    assert snapshot['games_active'] == 1 and snapshot['workers'] == 1
+    assert snapshot['engine_moves'] == 1 and snapshot['think_ms']['max'] > 0
+
+
+def test_budget_caps_move_time():
+    replies, metrics = run_session([('new budget 0.3', 1), ('move e4', 1)], move_time=5.0)
+    assert replies[1].startswith('engine ')
+    # min(5.0, 0.3 / MOVES_LEFT) seconds plus some overhead
+    assert metrics['think_ms']['max'] < 1000
+
+
+def test_bad_budget_is_refused():
+    replies, metrics = run_session([('new budget abc', 1), ('new budget', 1), ('new budget -5', 1),
+                                    ('new budget 10', 1)])
+    assert replies[:3] == ['error bad budget'] * 3
+    assert replies[3] == 'ok game 1' and metrics['games_started'] == 1
+
+
+def test_engine_failure_abandons_the_game(monkeypatch):
+    async def failing_reply(srv, game):
+        raise RuntimeError("worker died")
+    monkeypatch.setattr(server, 'engine_reply', failing_reply)
+    replies, metrics = run_session([('new', 1), ('move e4', 1), ('fen', 1), ('new', 1)])
+    assert replies[1] == 'result * abandoned'
+    assert replies[2] == 'error no game in progress'
+    assert replies[3] == 'ok game 2'  # the connection survives
+    assert metrics['engine_errors'] == 1 and metrics['games_finished'] == 2
+
+
+def test_game_result_detection():
+    board, state = main.fen_to_board('rnb1kbnr/pppp1ppp/8/4p3/6Pq/5P2/PPPPP2P/RNBQKBNR w KQkq - 1 3')
+    assert server.game_result(board, state) == ('0-1', 'checkmate')
+    board, state = main.fen_to_board('7k/5Q2/6K1/8/8/8/8/8 b - - 0 1')
+    assert server.game_result(board, state) == ('1/2-1/2', 'stalemate')
+    board, state = main.fen_to_board(server.START_FEN)
+    assert server.game_result(board, state) is None
+
+
+def test_small_load_test():
+    report = asyncio.run(server.load_test(clients=8, moves=2, workers=1, move_time=0.02))
+    assert report['engine_moves'] == 16
+    assert report['server']['games_started'] == report['server']['games_finished'] == 8
+    assert report['server']['queue_depth'] == 0 and report['server']['busy_workers'] == 0
+    assert report['server']['refused'] == 0
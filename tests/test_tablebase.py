@@ -0,0 +1,128 @@
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import pytest
+
+import main
+from tablebase import (table_info, encode_index, decode_index, generate_table,
+                       load_tablebases, close_tablebases, probe_dtm, tablebase_move)
+
+
+@pytest.fixture(scope='module')
+def tb_dir(tmp_path_factory):
+    directory = tmp_path_factory.mktemp('tb')
+    generate_table('KQvK', str(directory), workers=1, verbose=False)
+    return str(directory)
+
+
+@pytest.fixture(scope='module')
+def kqk(tb_dir):
+    tables = load_tablebases(tb_dir)
+    yield tables
+    close_tablebases(tables)
+
+
+@pytest.fixture(scope='module')
+def kpk(tb_dir):
+    for name in ('KRvK', 'KPvK'):  # KPvK promotes into KQvK and KRvK
+        generate_table(name, tb_dir, workers=1, verbose=False)
+    tables = load_tablebases(tb_dir)
+    yield tables
+    close_tablebases(tables)
+
+
+@pytest.mark.parametrize("name", ['KQvK', 'KPvK', 'KBNvK'])
+def test_index_round_trip(name):
+    info = table_info(name)
+    for idx in range(0, info['size'], 997):
+        squares, stm = decode_index(info, idx)
+        if encode_index(info, squares, stm) == idx:
+            assert decode_index(info, idx) == (squares, stm)
+
+
+def test_symmetric_positions_share_an_index():
+    info = table_info('KQvK')
+    a1, h1, a8, b3, g6 = 7 * 8, 7 * 8 + 7, 0, 5 * 8 + 1, 2 * 8 + 6
+    # White king a1 / h1 / a8 with the other pieces mirrored accordingly
+    assert (encode_index(info, [a1, b3, a8], 0) ==
+            encode_index(info, [h1, 5 * 8 + 6, 0 * 8 + 7], 0))
+    assert encode_index(info, [a8, 2 * 8 + 1, a1], 1) == encode_index(info, [a1, b3, a8], 1)
+    assert encode_index(info, [a1, b3, g6], 0) != encode_index(info, [a1, b3, g6], 1)
+
+
+@pytest.mark.parametrize("fen,expected", [
+    ('7k/8/6QK/8/8/8/8/8 w - - 0 1', 1),             # Qg7#
+    ('7k/6Q1/7K/8/8/8/8/8 b - - 0 1', -0.5),          # already mated
+    ('7k/5Q2/6K1/8/8/8/8/8 b - - 0 1', 0),             # stalemate
+    ('7K/8/6qk/8/8/8/8/8 b - - 0 1', 1),              # colours flipped
+    ('8/8/8/3k4/8/8/8/3K4 w - - 0 1', 0),             # bare kings
+])
+def test_probe_known_positions(kqk, fen, expected):
+    board, state = main.fen_to_board(fen)
+    assert probe_dtm(kqk, board, state) == expected
+
+
+@pytest.mark.parametrize("fen", [
+    '7k/8/8/8/8/8/8/K6Q w - - 0 1',                   # black king left in check
+    '8/8/8/3k4/3K4/8/8/8 b - - 0 1',                  # adjacent bare kings
+])
+def test_probe_rejects_illegal_positions(kqk, fen):
+    board, state = main.fen_to_board(fen)
+    assert probe_dtm(kqk, board, state) is None
+
+
+def test_probe_outside_tables(kqk):
+    board, state = main.fen_to_board('7k/8/6RK/8/8/8/8/8 w - - 0 1')
+    assert probe_dtm(kqk, board, state) is None
+    board, state = main.fen_to_board('r3k3/8/8/8/8/8/8/4K3 w q - 0 1')
+    assert probe_dtm(kqk, board, state) is None
+
+
+def test_kqk_longest_mate_is_ten_moves(kqk):
+    data = kqk['KQvK']['data']
+    assert max(v for v in data if 0 < v < 128) == 19
+
+
+def test_tablebase_move_converts(kqk):
+    board, state = main.fen_to_board('8/8/8/4k3/8/8/8/KQ6 w - - 0 1')
+    dtm = probe_dtm(kqk, board, state)
+    assert dtm > 0
+    for _ in range(dtm):
+        move, value = tablebase_move(kqk, board, state, main.generate_legal_moves, main.apply_move)
+        assert value == probe_dtm(kqk, board, state)
+        board, state = main.apply_move(board, move, state)
+    assert probe_dtm(kqk, board, state) == -0.5
+
+
+def test_search_and_engine_move_use_tables(kqk):
+    board, state = main.fen_to_board('7k/8/6QK/8/8/8/8/8 w - - 0 1')
+    main.tablebases.update(kqk)
+    try:
+        main.reset_search_state()
+        score, _ = main.alphabeta_pvs(board, state, 2, -float('inf'), float('inf'), True,
+                                      main.generate_move_codes, main.apply_move,
+                                      root_moves=[main.encode_move(board, m) for m in main.generate_legal_moves(board, state)])
+        assert score >= main.TB_WIN - 1
+        move = main.engine_move(board, state, max_time=1.0)
+        board, state = main.apply_move(board, move, state)
+        assert probe_dtm(kqk, board, state) == -0.5
+    finally:
+        main.tablebases.clear()
+
+
+def test_search_keeps_a_mate_whose_refutations_are_illegal(kpk):
+    # After Qg7+ the reply Kxg7 reaches KPvK with the kings adjacent
+    board, state = main.fen_to_board('7k/p7/5K2/8/8/8/8/6Q1 w - - 0 1')
+    main.tablebases.update(kpk)
+    try:
+        main.reset_search_state()
+        qg7 = main.encode_move(board, ((7, 6), (1, 6)))
+        score, _ = main.alphabeta_pvs(board, state, 3, -float('inf'), float('inf'), True,
+                                      main.generate_move_codes, main.apply_move, root_moves=[qg7])
+        assert score == 100000
+        main.reset_search_state()
+        assert main.iterative_deepening_pvs(board, state, max_time=float('inf'), max_depth=3) == ((7, 6), (1, 6))
+    finally:
+        main.tablebases.clear()
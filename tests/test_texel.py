@@ -0,0 +1,107 @@
+import sys
+import os
+import json
+import random
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+import main
+import texel
+from benchmark import BENCH_POSITIONS
+
+
+@pytest.fixture
+def dataset(tmp_path):
+    """Positions from random games, labeled by who is ahead in material."""
+    rng = random.Random(0)
+    lines = []
+    for _ in range(30):
+        board, state = main.fen_to_board(rng.choice(BENCH_POSITIONS))
+        for _ in range(20):
+            moves = main.generate_legal_moves(board, state)
+            if not moves:
+                break
+            board, state = main.apply_move(board, rng.choice(moves), state)
+            material = sum(main.piece_values[p] for row in board for p in row)
+            result = '1-0' if material > 150 else '0-1' if material < -150 else '1/2-1/2'
+            lines.append(f"{main.board_to_fen(board, state)} {result}")
+    path = tmp_path / 'positions.epd'
+    path.write_text('\n'.join(lines) + '\n')
+    return str(path), lines
+
+
+@pytest.fixture
+def restore_eval_params():
+    saved = {name: [row[:] for row in getattr(main, name)] for name in texel.TABLE_NAMES}
+    values = dict(main.piece_values)
+    yield
+    for name, table in saved.items():
+        getattr(main, name)[:] = table
+    main.piece_values.update(values)
+
+
+@pytest.mark.parametrize("line,result", [
+    ('8/8/8/8/8/8/8/K6k w - - 0 1 1-0', 1.0),
+    ('8/8/8/8/8/8/8/K6k w - - 0 1 [0.5]', 0.5),
+    ('8/8/8/8/8/8/8/K6k b - -; 0-1', 0.0),
+    ('8/8/8/8/8/8/8/K6k b - - c9 "1/2-1/2";', 0.5),
+])
+def test_parse_line_formats(line, result):
+    fen, parsed = texel.parse_line(line)
+    assert fen.startswith('8/8/8/8/8/8/8/K6k')
+    assert parsed == result
+
+
+def test_features_reproduce_advanced_evaluate(dataset):
+    path, lines = dataset
+    data = texel.load_dataset(path)
+    predicted = texel.predict(data, texel.current_weights())
+    expected = []
+    for line in lines:
+        board, state = main.fen_to_board(line.rsplit(' ', 1)[0])
+        sign = 1 if state['side_to_move'] == 'white' else -1
+        expected.append(sign * main.advanced_evaluate(board, state))
+    assert np.allclose(predicted, expected)
+
+
+def test_features_are_cached(dataset, monkeypatch):
+    path, _ = dataset
+    first = texel.load_dataset(path)
+    assert os.path.exists(texel.cache_path_for(path))
+    monkeypatch.setattr(texel, 'extract_features', lambda fens: pytest.fail("cache not used"))
+    second = texel.load_dataset(path)
+    assert np.array_equal(first['offsets'], second['offsets'])
+
+
+def test_cache_is_rebuilt_when_weights_change(dataset, restore_eval_params):
+    path, _ = dataset
+    texel.load_dataset(path)
+    main.pawn_table[3][3] += 7
+    data = texel.load_dataset(path)
+    board, state = main.fen_to_board(open(path).readline().rsplit(' ', 1)[0])
+    sign = 1 if state['side_to_move'] == 'white' else -1
+    assert texel.predict(data, texel.current_weights())[0] == sign * main.advanced_evaluate(board, state)
+
+
+def test_tuning_reduces_error(dataset):
+    data = texel.load_dataset(dataset[0])
+    weights, k, errors = texel.tune(data, epochs=60, lr=2.0)
+    assert 0.1 < k < 3.0
+    assert errors[-1] < errors[0]
+    assert len(errors) == 61
+
+
+def test_params_round_trip_into_engine(dataset, tmp_path, restore_eval_params):
+    data = texel.load_dataset(dataset[0])
+    weights, _, _ = texel.tune(data, epochs=20, lr=5.0)
+    params_path = tmp_path / 'params.json'
+    texel.save_params(weights, str(params_path))
+    params = json.loads(params_path.read_text())
+    assert set(params) == {'piece_values'} | set(texel.TABLE_NAMES)
+    main.load_eval_params(str(params_path))
+    assert np.array_equal(texel.current_weights(), np.rint(weights))
+    assert main.piece_values['n'] == -main.piece_values['N']
@@ -0,0 +1,164 @@
+import sys
+import os
+import io
+import subprocess
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import pytest
+
+import main
+import uci
+from perft import START_FEN
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+KIWIPETE = 'r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1'
+
+
+@pytest.fixture(autouse=True)
+def fresh_table():
+    main.set_hash_size(16)
+    main.reset_search_state()
+    yield
+    main.set_hash_size(16)
+    main.reset_search_state()
+
+
+def search(fen, depth):
+    board, state = main.fen_to_board(fen)
+    main.reset_search_stats()
+    main.iterative_deepening_pvs(board, state, max_time=float('inf'), max_depth=depth)
+    return main.search_stats['nodes']
+
+
+def occupied():
+    """slot -> (entry word without its age bits, score) for every used slot."""
+    age_bits = main.TT_AGE_MASK << 2
+    return {slot: (word & ~age_bits, main.tt_scores[slot])
+            for slot, word in enumerate(main.tt_words) if word & 3}
+
+
+def test_position_key_is_stable_across_processes():
+    code = ("import main; b, s = main.fen_to_board(%r); print(main.position_key(b, s))" % KIWIPETE)
+    keys = set()
+    for seed in ('1', '2'):
+        env = dict(os.environ, PYTHONHASHSEED=seed)
+        out = subprocess.run([sys.executable, '-c', code], cwd=ROOT, env=env,
+                             capture_output=True, text=True, check=True).stdout
+        keys.add(int(out))
+    board, state = main.fen_to_board(KIWIPETE)
+    assert keys == {main.position_key(board, state)}
+    assert 0 <= main.position_key(board, state) < 1 << 64
+
+
+def test_table_persists_and_ages_across_searches():
+    search(KIWIPETE, 2)
+    first = {(slot, word >> 32) for slot, (word, _) in occupied().items()}
+    assert {(main.tt_words[slot] >> 2) & main.TT_AGE_MASK for slot, _ in first} == {1}
+    search(KIWIPETE, 2)
+    assert main.tt_generation == 2
+    # The second search starts from the first one's table
+    assert first <= {(slot, word >> 32) for slot, (word, _) in occupied().items()}
+
+
+def test_size_is_fixed_by_the_memory_budget():
+    assert len(main.tt_words) == len(main.tt_scores) == 16 * 1024 * 1024 // main.TT_ENTRY_BYTES
+    main.set_hash_size(3)  # rounded down to a power-of-two bucket count
+    assert len(main.tt_words) * main.TT_ENTRY_BYTES == 2 * 1024 * 1024
+    search(KIWIPETE, 3)
+    assert len(main.tt_words) * main.TT_ENTRY_BYTES == 2 * 1024 * 1024
+    assert 0 < main.tt_count() <= len(main.tt_words)
+
+
+def test_replacement_prefers_depth_then_age():
+    main.tt_generation = 5
+    main.tt_store(1, 4, 10, main.TT_LOWER, 0)
+    main.tt_store(1, 2, 20, main.TT_LOWER, 0)
+    assert main.tt_probe(1)[:2] == (4, 10)  # deeper entry from this search kept
+    main.tt_store(1, 2, 30, main.TT_EXACT, 0)
+    assert main.tt_probe(1)[:2] == (2, 30)  # exact scores always stored
+    main.tt_store(2, 6, 10, main.TT_UPPER, 77)
+    main.tt_generation = 6
+    main.tt_store(2, 1, 40, main.TT_UPPER, 0)
+    assert main.tt_probe(2) == (1, 40, main.TT_UPPER, 77, 6)  # stale entry replaced
+    assert main.tt_probe(3) is None and main.tt_probe(1 << 32 | 1) is None
+
+
+def test_full_bucket_evicts_shallow_and_stale_entries():
+    key = lambda check: check << 32 | 5  # all in bucket 5
+    main.tt_generation = 1
+    for check, depth in ((1, 9), (2, 3), (3, 5)):
+        main.tt_store(key(check), depth, 0, main.TT_EXACT, 0)
+    main.tt_generation = 2
+    main.tt_store(key(4), 2, 0, main.TT_EXACT, 0)  # the empty slot
+    main.tt_store(key(5), 1, 0, main.TT_EXACT, 0)
+    assert main.tt_probe(key(2)) is None  # stale and shallow
+    main.tt_store(key(6), 1, 0, main.TT_EXACT, 0)
+    assert main.tt_probe(key(3)) is None
+    assert [main.tt_probe(key(c)) is not None for c in (1, 4, 5, 6)] == [True] * 4
+
+
+def test_hashfull_counts_the_current_search():
+    assert main.tt_hashfull() == 0
+    main.set_hash_size(0)  # a single bucket
+    main.tt_generation = 1
+    main.tt_store(1 << 32, 1, 0, main.TT_EXACT, 0)
+    assert main.tt_hashfull() == 250
+    main.tt_generation = 2
+    main.tt_store(2 << 32, 1, 0, main.TT_EXACT, 0)
+    assert main.tt_hashfull() == 250
+
+
+def test_snapshot_round_trip(tmp_path):
+    path = str(tmp_path / 'table.tt')
+    search(START_FEN, 3)
+    saved = occupied()
+    assert main.save_transposition_table(path) == len(saved)
+    main.reset_search_state()
+    main.tt_generation = 7
+    assert main.load_transposition_table(path) == len(saved)
+    assert occupied() == saved
+    assert {(word >> 2) & main.TT_AGE_MASK for word in main.tt_words if word & 3} == {7}
+
+
+def test_snapshot_warm_starts_a_search(tmp_path):
+    path = str(tmp_path / 'table.tt')
+    cold = search(START_FEN, 3)
+    main.save_transposition_table(path)
+    main.reset_search_state()
+    main.load_transposition_table(path)
+    warm = search(START_FEN, 3)
+    assert warm < cold // 2
+
+
+@pytest.mark.parametrize("mb", [1, 64])
+def test_snapshot_from_another_table_size_is_skipped(tmp_path, mb):
+    path = str(tmp_path / 'table.tt')
+    search(START_FEN, 3)
+    assert main.save_transposition_table(path) > 0
+    main.set_hash_size(mb)
+    assert main.load_transposition_table(path) == 0
+    assert main.tt_count() == 0
+
+
+def test_snapshot_rejects_other_files(tmp_path):
+    path = tmp_path / 'book.bin'
+    path.write_bytes(b'\0' * 64)
+    with pytest.raises(ValueError):
+        main.load_transposition_table(str(path))
+
+
+def test_uci_hash_file_buttons(tmp_path):
+    path = str(tmp_path / 'analysis.tt')
+    session = uci.new_session(io.StringIO())
+    search(KIWIPETE, 2)
+    count = main.tt_count()
+    uci.handle_command(session, f'setoption name HashFile value {path}')
+    uci.handle_command(session, 'setoption name SaveHashToFile')
+    uci.handle_command(session, 'ucinewgame')
+    assert main.tt_count() == 0
+    uci.handle_command(session, 'setoption name LoadHashFromFile')
+    assert main.tt_count() == count
+    out = session['out'].getvalue()
+    assert f'info string saved {count} hash entries' in out
+    assert f'info string loaded {count} hash entries' in out
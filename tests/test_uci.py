@@ -0,0 +1,118 @@
+import sys
+import os
+import io
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import pytest
+
+import main
+import uci
+
+@pytest.fixture
+def session():
+    main.reset_search_state()
+    s = uci.new_session(io.StringIO())
+    yield s
+    uci.stop_search(s)
+
+def output_lines(session):
+    return session['out'].getvalue().splitlines()
+
+def test_uci_handshake(session):
+    uci.handle_command(session, 'uci')
+    uci.handle_command(session, 'isready')
+    lines = output_lines(session)
+    assert lines[0].startswith('id name')
+    assert 'uciok' in lines
+    assert lines[-1] == 'readyok'
+
+def test_position_startpos_with_moves(session):
+    uci.handle_command(session, 'position startpos moves e2e4 e7e5 g1f3')
+    board, state = session['board'], session['state']
+    assert board[4][4] == 'P' and board[3][4] == 'p' and board[5][5] == 'N'
+    assert state['side_to_move'] == 'black'
+
+def test_position_fen_with_promotion(session):
+    uci.handle_command(session, 'position fen 8/P6k/8/8/8/8/8/K7 w - - 0 1 moves a7a8q')
+    assert session['board'][0][0] == 'Q'
+
+def test_go_depth_sends_info_and_bestmove(session):
+    uci.handle_command(session, 'position startpos')
+    uci.handle_command(session, 'go depth 2')
+    session['worker'].join(timeout=30)
+    lines = output_lines(session)
+    assert any(line.startswith('info depth 1 ') for line in lines)
+    assert any(line.startswith('info depth 2 ') for line in lines)
+    best = lines[-1].split()
+    assert best[0] == 'bestmove'
+    legal = [main.move_to_uci(m) for m in main.generate_legal_moves(session['board'], session['state'])]
+    assert best[1] in legal
+
+def test_mate_scores_are_sent_in_moves(session):
+    uci.handle_command(session, 'position fen 7k/8/6QK/8/8/8/8/8 w - - 0 1')
+    uci.handle_command(session, 'go depth 2')
+    session['worker'].join(timeout=30)
+    info = [line for line in output_lines(session) if line.startswith('info depth 2 ')]
+    assert ' score mate 1 ' in info[0] and info[0].endswith(' pv g6g7')
+    move = ((0, 0), (1, 1))
+    assert uci.format_score(35, [move]) == 'cp 35'
+    assert uci.format_score(-100000, [move, move]) == 'mate -1'
+    # Tablebase scores count the plies left after the probe that ended the pv
+    assert uci.format_score(main.TB_WIN - 4, [move]) == 'mate 3'
+    assert uci.format_score(-(main.TB_WIN - 4), [move, move]) == 'mate -3'
+
+def test_stop_returns_bestmove_promptly(session):
+    uci.handle_command(session, 'position startpos')
+    uci.handle_command(session, 'go infinite')
+    time.sleep(0.3)
+    start = time.time()
+    uci.handle_command(session, 'stop')
+    assert time.time() - start < 0.5
+    assert output_lines(session)[-1].startswith('bestmove ')
+
+def test_setoption_hash_and_threads(session):
+    uci.handle_command(session, 'setoption name Hash value 1')
+    uci.handle_command(session, 'setoption name Threads value 8')
+    assert session['options']['Hash'] == 1
+    assert session['options']['Threads'] == 1
+    assert len(main.tt_words) * main.TT_ENTRY_BYTES == 1024 * 1024
+    main.set_hash_size(uci.DEFAULT_HASH_MB)
+
+def test_malformed_commands_do_not_end_the_loop():
+    commands = ['go depth x', 'setoption name Hash value big', 'position startpos moves e2e5',
+                'position moves', 'position startpos moves e2e4', 'go depth 1', 'isready', 'quit']
+    out = io.StringIO()
+    uci.uci_loop(io.StringIO('\n'.join(commands) + '\n'), out)
+    lines = out.getvalue().splitlines()
+    assert sum(line.startswith('info string error ') for line in lines) == 4
+    assert 'info string error Illegal move: e2e5' in lines
+    assert 'readyok' in lines
+    best = lines[-1].split()
+    board, state = main.fen_to_board(uci.START_FEN)
+    board, state = main.apply_move(board, main.uci_to_move(board, state, 'e2e4'), state)
+    assert best[0] == 'bestmove'
+    assert best[1] in [main.move_to_uci(m) for m in main.generate_legal_moves(board, state)]
+
+def test_time_allocation():
+    params = uci.parse_go('wtime 60000 btime 1000 winc 1000 binc 0'.split())
+    white = uci.search_limits_for(params, 'white')['max_time']
+    black = uci.search_limits_for(params, 'black')['max_time']
+    assert 1.0 < white < 30.0
+    assert black < 0.5
+    assert uci.search_limits_for(uci.parse_go(['infinite']), 'white')['max_time'] == float('inf')
+
+def test_setoption_evalfile_switches_to_nnue(session):
+    pytest.importorskip("numpy")
+    import nnue
+    try:
+        uci.handle_command(session, f'setoption name EvalFile value {nnue.REFERENCE_NETWORK}')
+        assert main.nnue_network is not None
+        uci.handle_command(session, 'setoption name EvalFile value <empty>')
+        assert main.nnue_network is None and main.evaluate is main.advanced_evaluate
+        uci.handle_command(session, 'setoption name EvalFile value /nonexistent.npz')
+        assert main.nnue_network is None
+        assert 'info string cannot load network' in output_lines(session)[-1]
+    finally:
+        main.set_evaluator('classic')
@@ -0,0 +1,251 @@
+"""
+Texel tuning of piece values and piece-square tables.
+
+Reads a labeled position file (one FEN plus game result per line, e.g.
+"<fen> 1-0", "<fen> [0.5]" or "<fen>; 0-1"), extracts the tunable
+evaluation features once and optimizes the weights by gradient descent
+(Adam) on the mean squared error between the game result and
+
+    sigmoid(K * eval / 400),   eval from white's point of view.
+
+advanced_evaluate is linear in the piece values and piece-square tables,
+so for every position
+
+    eval = features . weights + offset
+
+where features count white minus black pieces per (kind, table square)
+and offset holds the untuned terms (centre, pawn structure, mobility,
+king safety). Features are stored sparsely (row, column, value) and the
+offsets are computed exactly with batch_eval; both are cached on disk next
+to the data file, so repeated runs skip the extraction entirely.
+
+Usage:
+    python texel.py positions.epd -o params.json [--epochs 300] [--lr 1.0]
+    python main.py --params params.json
+"""
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+import main
+from batch_eval import encode_positions, evaluate_batch
+
+KINDS = 'PNBRQK'
+TABLE_NAMES = ['pawn_table', 'knight_table', 'bishop_table', 'rook_table', 'queen_table', 'king_table']
+VALUE_KINDS = 'PNBRQ'  # the king's value cancels out and is not tuned
+NUM_WEIGHTS = len(VALUE_KINDS) + len(KINDS) * 64
+
+RESULTS = {'1-0': 1.0, '0-1': 0.0, '1/2-1/2': 0.5, '1/2': 0.5}
+CACHE_VERSION = 1
+EXTRACT_CHUNK = 100000
+
+
+# ---------- Weights ----------
+
+def current_weights():
+    """The engine's piece values and tables as a flat weight vector."""
+    weights = [main.piece_values[kind] for kind in VALUE_KINDS]
+    for name in TABLE_NAMES:
+        weights.extend(v for row in getattr(main, name) for v in row)
+    return np.array(weights, dtype=np.float64)
+
+def weights_to_params(weights):
+    """Flat weights -> parameter dict (rounded to integers)."""
+    w = np.rint(weights).astype(int).tolist()
+    params = {'piece_values': dict(zip(VALUE_KINDS, w[:len(VALUE_KINDS)]))}
+    for i, name in enumerate(TABLE_NAMES):
+        flat = w[len(VALUE_KINDS) + i * 64:len(VALUE_KINDS) + (i + 1) * 64]
+        params[name] = [flat[r * 8:r * 8 + 8] for r in range(8)]
+    return params
+
+def save_params(weights, path):
+    with open(path, 'w') as f:
+        json.dump(weights_to_params(weights), f, indent=1)
+
+
+# ---------- Data ----------
+
+def parse_line(line):
+    """Return (fen, result) for a labeled line, or None for blanks/comments."""
+    line = line.strip()
+    if not line or line.startswith('#'):
+        return None
+    fields = line.replace(';', ' ').replace(',', ' ').split()
+    fen_len = 6 if len(fields) > 6 and fields[4].isdigit() and fields[5].isdigit() else 4
+    fen = ' '.join(fields[:fen_len])
+    token = ' '.join(fields[fen_len:]).strip('[]"\' ')
+    for prefix in ('c9', 'result'):
+        if token.lower().startswith(prefix):
+            token = token[len(prefix):].strip('[]"\' ;')
+    result = RESULTS.get(token)
+    if result is None:
+        result = float(token)
+    return fen, result
+
+def read_positions(path):
+    fens, results = [], []
+    with open(path) as f:
+        for line in f:
+            parsed = parse_line(line)
+            if parsed is not None:
+                fens.append(parsed[0])
+                results.append(parsed[1])
+    return fens, np.array(results, dtype=np.float64)
+
+
+# ---------- Feature extraction ----------
+
+def _square_columns():
+    """(13, 64) weight column of a piece code on a square, and its sign."""
+    columns = np.zeros((13, 64), dtype=np.int32)
+    value_columns = np.full(13, -1, dtype=np.int32)
+    signs = np.zeros(13, dtype=np.int8)
+    for k, kind in enumerate(KINDS):
+        for code, white in ((k + 1, True), (-(k + 1), False)):
+            signs[code + 6] = 1 if white else -1
+            if kind in VALUE_KINDS:
+                value_columns[code + 6] = VALUE_KINDS.index(kind)
+            for sq in range(64):
+                r, c = divmod(sq, 8)
+                table_sq = sq if white else (7 - r) * 8 + c
+                columns[code + 6, sq] = len(VALUE_KINDS) + k * 64 + table_sq
+    return columns, value_columns, signs
+
+def extract_features(fens):
+    """
+    Sparse features for a list of FENs with the engine's current weights.
+    Returns a dict with rows, cols, vals (COO entries) and offsets (the
+    untuned part of the white-relative eval), all exact.
+    """
+    columns, value_columns, signs = _square_columns()
+    weights = current_weights()
+    parts = {'rows': [], 'cols': [], 'vals': [], 'offsets': []}
+    for start in range(0, len(fens), EXTRACT_CHUNK):
+        chunk = fens[start:start + EXTRACT_CHUNK]
+        enc = encode_positions(main.fen_to_board(fen) for fen in chunk)
+        squares = enc['squares'].astype(np.int64)
+        pos, sq = np.nonzero(squares)
+        codes = squares[pos, sq] + 6
+        rows = np.concatenate([pos, pos[value_columns[codes] >= 0]])
+        cols = np.concatenate([columns[codes, sq], value_columns[codes][value_columns[codes] >= 0]])
+        vals = np.concatenate([signs[codes], signs[codes][value_columns[codes] >= 0]])
+        linear = np.bincount(rows, weights=vals * weights[cols], minlength=len(chunk))
+        white_eval = np.where(enc['white_to_move'], 1, -1) * evaluate_batch(enc)
+        parts['rows'].append(rows + start)
+        parts['cols'].append(cols)
+        parts['vals'].append(vals)
+        parts['offsets'].append(white_eval - linear)
+    return {
+        'rows': np.concatenate(parts['rows']).astype(np.int32) if fens else np.zeros(0, np.int32),
+        'cols': np.concatenate(parts['cols']).astype(np.int16) if fens else np.zeros(0, np.int16),
+        'vals': np.concatenate(parts['vals']).astype(np.int8) if fens else np.zeros(0, np.int8),
+        'offsets': np.concatenate(parts['offsets']) if fens else np.zeros(0),
+    }
+
+def cache_path_for(data_path):
+    return data_path + '.texel.npz'
+
+def load_dataset(path, cache_path=None, verbose=False):
+    """
+    Features, offsets and results for a labeled file, from the cache when
+    it is newer than the data and was built with the same engine weights.
+    """
+    cache_path = cache_path or cache_path_for(path)
+    weights = current_weights()
+    if os.path.exists(cache_path) and os.path.getmtime(cache_path) >= os.path.getmtime(path):
+        with np.load(cache_path) as cached:
+            if int(cached['version']) == CACHE_VERSION and np.array_equal(cached['weights'], weights):
+                if verbose:
+                    print(f"loaded features from {cache_path}")
+                return {key: cached[key] for key in ('rows', 'cols', 'vals', 'offsets', 'results')}
+    start = time.perf_counter()
+    fens, results = read_positions(path)
+    data = extract_features(fens)
+    data['results'] = results
+    np.savez(cache_path, version=CACHE_VERSION, weights=weights, **data)
+    if verbose:
+        print(f"extracted {len(fens)} positions in {time.perf_counter() - start:.1f}s -> {cache_path}")
+    return data
+
+
+# ---------- Optimization ----------
+
+def predict(data, weights):
+    """White-relative evals for every position."""
+    n = len(data['offsets'])
+    linear = np.bincount(data['rows'], weights=data['vals'] * weights[data['cols']], minlength=n)
+    return linear + data['offsets']
+
+def _sigmoid(evals, k):
+    return 1.0 / (1.0 + np.exp(-np.log(10.0) * k / 400.0 * evals))
+
+def mean_error(data, weights, k):
+    return float(np.mean((data['results'] - _sigmoid(predict(data, weights), k)) ** 2))
+
+def fit_scaling(data, weights, lo=0.1, hi=3.0, iterations=40):
+    """Golden-section search for the K that minimizes the error of weights."""
+    golden = (5 ** 0.5 - 1) / 2
+    a, b = lo, hi
+    for _ in range(iterations):
+        c, d = b - golden * (b - a), a + golden * (b - a)
+        if mean_error(data, weights, c) < mean_error(data, weights, d):
+            b = d
+        else:
+            a = c
+    return (a + b) / 2
+
+def tune(data, weights=None, k=None, epochs=300, lr=1.0, verbose=False):
+    """
+    Adam gradient descent on the Texel error. Returns (weights, k, errors)
+    where errors lists the error before and after every epoch.
+    """
+    weights = current_weights() if weights is None else np.array(weights, dtype=np.float64)
+    if k is None:
+        k = fit_scaling(data, weights)
+    n = len(data['offsets'])
+    m = np.zeros_like(weights)
+    v = np.zeros_like(weights)
+    beta1, beta2, eps = 0.9, 0.999, 1e-8
+    scale = np.log(10.0) * k / 400.0
+    vals = data['vals'].astype(np.float64)
+    errors = []
+    for epoch in range(1, epochs + 1):
+        p = _sigmoid(predict(data, weights), k)
+        residual = data['results'] - p
+        errors.append(float(np.mean(residual * residual)))
+        # d/d(eval) of (result - p)^2, averaged over positions
+        d_eval = -2.0 * residual * p * (1.0 - p) * scale / n
+        grad = np.bincount(data['cols'], weights=vals * d_eval[data['rows']], minlength=NUM_WEIGHTS)
+        m = beta1 * m + (1 - beta1) * grad
+        v = beta2 * v + (1 - beta2) * grad * grad
+        weights -= lr * (m / (1 - beta1 ** epoch)) / (np.sqrt(v / (1 - beta2 ** epoch)) + eps)
+        if verbose and epoch % 50 == 0:
+            print(f"epoch {epoch:>5}  error {errors[-1]:.6f}")
+    errors.append(mean_error(data, weights, k))
+    return weights, k, errors
+
+
+def cli():
+    parser = argparse.ArgumentParser(description="Texel tuning of piece values and piece-square tables")
+    parser.add_argument('data', help="labeled positions: one '<fen> <result>' per line")
+    parser.add_argument('-o', '--output', required=True, help="parameter file to write (JSON)")
+    parser.add_argument('--epochs', type=int, default=300)
+    parser.add_argument('--lr', type=float, default=1.0, help="Adam step size in centipawns")
+    parser.add_argument('--k', type=float, help="sigmoid scaling (default: fitted)")
+    parser.add_argument('--cache', help="feature cache path (default: <data>.texel.npz)")
+    args = parser.parse_args()
+
+    data = load_dataset(args.data, args.cache, verbose=True)
+    start = time.perf_counter()
+    weights, k, errors = tune(data, k=args.k, epochs=args.epochs, lr=args.lr, verbose=True)
+    print(f"K {k:.3f}  error {errors[0]:.6f} -> {errors[-1]:.6f}  "
+          f"({len(data['offsets'])} positions, {time.perf_counter() - start:.1f}s)")
+    save_params(weights, args.output)
+    print(f"wrote {args.output}")
+
+
+if __name__ == '__main__':
+    cli()
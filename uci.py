@@ -0,0 +1,320 @@
+"""
+UCI (Universal Chess Interface) front-end, so the engine can run under
+standard GUIs and tournament managers.
+
+Supported commands: uci, isready, ucinewgame, position, go (wtime, btime,
+winc, binc, movestogo, movetime, depth, nodes, mate, infinite), stop, setoption
+(Hash, Threads, MultiPV, OwnBook, BookFile, TablebasePath, EvalFile, HashFile
+and the SaveHashToFile / LoadHashFromFile buttons, plus the Futility,
+ReverseFutility and Razoring switches for A/B matches) and quit. The
+search runs on a background thread so that 'stop' and 'isready' are answered
+while it is thinking; an 'info' line is sent after every completed iteration.
+'go mate N' runs the proof-number mate solver first and only falls back to
+the normal search when it finds no mate.
+
+Usage:
+    python uci.py
+"""
+import struct
+import sys
+import threading
+
+import main
+from mate_solver import solve_mate
+from main import (fen_to_board, uci_to_move, move_to_uci, iterative_deepening_pvs,
+                  extract_pv, reset_search_state, reset_search_stats, search_stop,
+                  set_hash_size, set_opening_book, probe_book, set_tablebase_path,
+                  set_evaluator, save_transposition_table, load_transposition_table,
+                  MATE_BOUND, TB_WIN)
+
+ENGINE_NAME = 'Python Chess Engine'
+ENGINE_AUTHOR = 'Radha Krishna'
+
+START_FEN = 'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1'
+
+DEFAULT_HASH_MB = 16
+MAX_HASH_MB = 4096
+MOVE_OVERHEAD = 0.05  # seconds kept in reserve for I/O and GUI latency
+DEFAULT_MOVES_TO_GO = 30
+MAX_MULTIPV = 64
+# UCI check options for main.pruning
+PRUNING_OPTIONS = {'futility': 'Futility', 'reverse_futility': 'ReverseFutility', 'razoring': 'Razoring'}
+
+
+def new_session(out=None):
+    """Create the state of one UCI connection."""
+    board, state = fen_to_board(START_FEN)
+    return {
+        'board': board,
+        'state': state,
+        'out': out or sys.stdout,
+        'lock': threading.Lock(),
+        'worker': None,
+        'options': {'Hash': DEFAULT_HASH_MB, 'Threads': 1, 'MultiPV': 1, 'OwnBook': False, 'BookFile': '',
+                    'TablebasePath': '', 'EvalFile': '', 'HashFile': ''},
+    }
+
+
+def send(session, line):
+    with session['lock']:
+        session['out'].write(line + '\n')
+        session['out'].flush()
+
+
+def format_score(score, pv):
+    """
+    UCI score for a search score and its pv: 'cp N', or 'mate N' in moves
+    (negative when the side to move is mated) beyond MATE_BOUND. Real mates
+    score a flat 100000, so the pv gives the distance; a tablebase score
+    adds the plies still to go where the pv ends at the probe.
+    """
+    if abs(score) < MATE_BOUND:
+        return f"cp {int(score)}"
+    plies = len(pv)
+    if abs(score) < TB_WIN:
+        plies += TB_WIN - int(abs(score))
+    return f"mate {(plies + 1) // 2}" if score > 0 else f"mate {-(plies // 2)}"
+
+
+def format_info(info, pv, multipv=None, score=None):
+    """Build a UCI 'info' line from an iterative_deepening_pvs info dict."""
+    elapsed = info['time']
+    nps = int(info['nodes'] / elapsed) if elapsed > 0 else 0
+    score = info['score'] if score is None else score
+    rank = f" multipv {multipv}" if multipv is not None else ""
+    return (f"info depth {info['depth']} seldepth {info['seldepth']}{rank} score {format_score(score, pv)} "
+            f"nodes {info['nodes']} nps {nps} hashfull {info['hashfull']} time {int(elapsed * 1000)} "
+            f"pv {' '.join(move_to_uci(m) for m in pv)}")
+
+
+def handle_position(session, tokens):
+    """position [startpos | fen <fen>] [moves <m1> <m2> ...]"""
+    if not tokens:
+        return
+    if 'moves' in tokens:
+        idx = tokens.index('moves')
+        setup, moves = tokens[:idx], tokens[idx + 1:]
+    else:
+        setup, moves = tokens, []
+    if setup[0] == 'startpos':
+        board, state = fen_to_board(START_FEN)
+    elif setup[0] == 'fen':
+        board, state = fen_to_board(' '.join(setup[1:]))
+    else:
+        return
+    for uci in moves:
+        board, state = main.apply_move(board, uci_to_move(board, state, uci), state)
+    session['board'], session['state'] = board, state
+
+
+def parse_go(tokens):
+    """Parse 'go' arguments into a dict of ints (plus 'infinite': bool)."""
+    params = {'infinite': False}
+    numeric = ('wtime', 'btime', 'winc', 'binc', 'movestogo', 'movetime', 'depth', 'nodes', 'mate')
+    i = 0
+    while i < len(tokens):
+        tok = tokens[i]
+        if tok == 'infinite':
+            params['infinite'] = True
+        elif tok in numeric and i + 1 < len(tokens):
+            params[tok] = int(tokens[i + 1])
+            i += 1
+        i += 1
+    return params
+
+
+def search_limits_for(params, side):
+    """Turn 'go' parameters into iterative_deepening_pvs keyword arguments."""
+    limits = {'max_time': float('inf'), 'max_depth': params.get('depth'),
+              'max_nodes': params.get('nodes')}
+    if params['infinite']:
+        return limits
+    if 'movetime' in params:
+        limits['max_time'] = max(0.01, params['movetime'] / 1000 - MOVE_OVERHEAD)
+        return limits
+    time_left = params.get('wtime' if side == 'white' else 'btime')
+    if time_left is not None:
+        inc = params.get('winc' if side == 'white' else 'binc', 0)
+        moves_to_go = params.get('movestogo') or DEFAULT_MOVES_TO_GO
+        budget = time_left / moves_to_go + inc * 0.8
+        budget = min(budget, time_left * 0.5)
+        limits['max_time'] = max(0.01, budget / 1000 - MOVE_OVERHEAD)
+    return limits
+
+
+def _search_worker(session, board, state, limits, mate=None):
+    if mate:
+        result = solve_mate(board, state, 2 * mate - 1, limits['max_time'])
+        if result['result'] == 'mate':
+            send(session, f"info depth {len(result['line'])} score mate {result['mate_in']} "
+                          f"nodes {result['nodes']} time {int(result['time'] * 1000)} "
+                          f"pv {' '.join(move_to_uci(m) for m in result['line'])}")
+            send(session, f"bestmove {move_to_uci(result['line'][0])}")
+            return
+        limits = dict(limits, max_time=max(0.01, limits['max_time'] - result['time']))
+
+    def on_iteration(info):
+        if 'lines' in info:
+            for rank, (score, pv) in enumerate(info['lines'], 1):
+                send(session, format_info(info, pv, rank, score))
+            return
+        pv = extract_pv(board, state, info['depth'])
+        if not pv or pv[0] != info['move']:
+            pv = [info['move']]
+        send(session, format_info(info, pv))
+
+    reset_search_stats()
+    best = iterative_deepening_pvs(board, state, on_iteration=on_iteration,
+                                   multipv=session['options']['MultiPV'], **limits)
+    send(session, f"bestmove {move_to_uci(best) if best else '0000'}")
+
+
+def handle_go(session, tokens):
+    stop_search(session)
+    params = parse_go(tokens)
+    if session['options']['OwnBook'] and not params['infinite']:
+        move = probe_book(session['board'], session['state'])
+        if move is not None:
+            send(session, f"bestmove {move_to_uci(move)}")
+            return
+    limits = search_limits_for(params, session['state']['side_to_move'])
+    search_stop.clear()
+    worker = threading.Thread(target=_search_worker,
+                              args=(session, session['board'], session['state'], limits,
+                                    params.get('mate')),
+                              daemon=True)
+    session['worker'] = worker
+    worker.start()
+
+
+def stop_search(session):
+    """Abort the running search (if any) and wait for it to send bestmove."""
+    worker = session['worker']
+    if worker is not None:
+        search_stop.set()
+        worker.join()
+        session['worker'] = None
+        search_stop.clear()
+
+
+def _update_book(session):
+    options = session['options']
+    try:
+        set_opening_book(options['BookFile'] if options['OwnBook'] and options['BookFile'] else None)
+    except OSError:
+        set_opening_book(None)
+        send(session, f"info string cannot open book {options['BookFile']}")
+
+
+def handle_setoption(session, tokens):
+    """setoption name <id> [value <x>]"""
+    if 'name' not in tokens:
+        return
+    name_end = tokens.index('value') if 'value' in tokens else len(tokens)
+    name = ' '.join(tokens[tokens.index('name') + 1:name_end])
+    value = ' '.join(tokens[name_end + 1:])
+    if name.lower() == 'hash':
+        mb = min(MAX_HASH_MB, max(1, int(value)))
+        session['options']['Hash'] = mb
+        set_hash_size(mb)
+    elif name.lower() == 'multipv':
+        session['options']['MultiPV'] = min(MAX_MULTIPV, max(1, int(value)))
+    elif name.lower() == 'ownbook':
+        session['options']['OwnBook'] = value.lower() == 'true'
+        _update_book(session)
+    elif name.lower() == 'bookfile':
+        session['options']['BookFile'] = '' if value == '<empty>' else value
+        _update_book(session)
+    elif name.lower() == 'tablebasepath':
+        session['options']['TablebasePath'] = '' if value == '<empty>' else value
+        set_tablebase_path(session['options']['TablebasePath'] or None)
+    elif name.lower() == 'evalfile':
+        # An NNUE weights file switches the evaluation to NNUE; empty means classic
+        session['options']['EvalFile'] = '' if value == '<empty>' else value
+        try:
+            if session['options']['EvalFile']:
+                set_evaluator('nnue', session['options']['EvalFile'])
+            else:
+                set_evaluator('classic')
+        except (OSError, ValueError, KeyError):
+            set_evaluator('classic')
+            send(session, f"info string cannot load network {session['options']['EvalFile']}")
+    elif name.lower() == 'hashfile':
+        session['options']['HashFile'] = '' if value == '<empty>' else value
+    elif name.lower() in ('savehashtofile', 'loadhashfromfile'):
+        path = session['options']['HashFile']
+        try:
+            if name.lower() == 'savehashtofile':
+                send(session, f"info string saved {save_transposition_table(path)} hash entries to {path}")
+            else:
+                send(session, f"info string loaded {load_transposition_table(path)} hash entries from {path}")
+        except (OSError, ValueError, struct.error):
+            send(session, f"info string cannot use hash file {path or '<empty>'}")
+    elif name.lower() in (option.lower() for option in PRUNING_OPTIONS.values()):
+        switch = next(key for key, option in PRUNING_OPTIONS.items() if option.lower() == name.lower())
+        main.pruning[switch] = value.lower() == 'true'
+    elif name.lower() == 'threads':
+        # The search is single-threaded (the GIL makes Python threads useless
+        # for it), so the option is accepted but pinned to 1.
+        session['options']['Threads'] = 1
+
+
+def handle_command(session, line):
+    """Process one line of input. Returns False when the engine should quit."""
+    tokens = line.split()
+    if not tokens:
+        return True
+    cmd, args = tokens[0], tokens[1:]
+    if cmd == 'uci':
+        send(session, f"id name {ENGINE_NAME}")
+        send(session, f"id author {ENGINE_AUTHOR}")
+        send(session, f"option name Hash type spin default {DEFAULT_HASH_MB} min 1 max {MAX_HASH_MB}")
+        send(session, "option name Threads type spin default 1 min 1 max 1")
+        send(session, f"option name MultiPV type spin default 1 min 1 max {MAX_MULTIPV}")
+        send(session, "option name OwnBook type check default false")
+        send(session, "option name BookFile type string default <empty>")
+        send(session, "option name TablebasePath type string default <empty>")
+        send(session, "option name EvalFile type string default <empty>")
+        send(session, "option name HashFile type string default <empty>")
+        send(session, "option name SaveHashToFile type button")
+        send(session, "option name LoadHashFromFile type button")
+        for key, option in PRUNING_OPTIONS.items():
+            send(session, f"option name {option} type check default {str(main.pruning[key]).lower()}")
+        send(session, "uciok")
+    elif cmd == 'isready':
+        send(session, "readyok")
+    elif cmd == 'ucinewgame':
+        stop_search(session)
+        reset_search_state()
+    elif cmd == 'position':
+        stop_search(session)
+        handle_position(session, args)
+    elif cmd == 'go':
+        handle_go(session, args)
+    elif cmd == 'stop':
+        stop_search(session)
+    elif cmd == 'setoption':
+        stop_search(session)
+        handle_setoption(session, args)
+    elif cmd == 'quit':
+        stop_search(session)
+        return False
+    return True
+
+
+def uci_loop(inp=None, out=None):
+    session = new_session(out)
+    set_hash_size(session['options']['Hash'])
+    for line in (inp or sys.stdin):
+        # A malformed command (bad number, illegal move, broken FEN) is
+        # reported and skipped rather than ending the engine
+        try:
+            if not handle_command(session, line.strip()):
+                break
+        except (ValueError, KeyError, IndexError) as e:
+            send(session, f"info string error {e}")
+    stop_search(session)
+
+
+if __name__ == '__main__':
+    uci_loop()